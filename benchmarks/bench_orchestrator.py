@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""Measure the overhead oh-my-ralph itself adds to each iteration.
+
+Runs RalphLoop against benchmarks/stub_agent.py, which answers instantly,
+so what is left is the orchestrator's own cost:
+
+- iterations per second at zero delay, against spawning the stub directly
+- spawn latency and spawn-to-first-byte latency
+- peak RSS of the orchestrator against the size of the agent's output
+- cost of a log line through LogSink, unbuffered and buffered
+
+Results go to a JSON file (benchmarks/results/ by default); pass an
+earlier file with --compare to see what changed between releases.
+
+    python benchmarks/bench_orchestrator.py
+    python benchmarks/bench_orchestrator.py --quick --compare benchmarks/results/bench-0.5.0-....json
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from oh_my_ralph import __version__  # noqa: E402
+from oh_my_ralph.delay_policy import FixedDelay  # noqa: E402
+from oh_my_ralph.log_sink import LogSink  # noqa: E402
+from oh_my_ralph.ralph_loop import RalphLoop  # noqa: E402
+
+STUB_AGENT = os.path.join(BENCH_DIR, "stub_agent.py")
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+def stub_command(*stub_args) -> str:
+    return " ".join([f'"{sys.executable}"', f'"{STUB_AGENT}"', *stub_args])
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def summarize(values, scale=1000.0, digits=3):
+    """Median and p95 of ``values``, scaled (seconds to ms by default)."""
+    if not values:
+        return {"median": None, "p95": None}
+    return {
+        "median": round(statistics.median(values) * scale, digits),
+        "p95": round(percentile(values, 0.95) * scale, digits),
+    }
+
+
+@contextlib.contextmanager
+def quiet():
+    """Silence the loop's console output, which is not what is being measured."""
+    with open(os.devnull, "w") as devnull:
+        with contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+            yield
+
+
+def make_loop(work_dir, agent_command, **options):
+    loop = RalphLoop(
+        agent_command=agent_command,
+        working_dir=work_dir,
+        log_file=os.path.join(work_dir, "ralph.log"),
+        install_signal_handlers=False,
+        delay_policy=FixedDelay(0, initial_delay=0),
+        **options,
+    )
+    with quiet():
+        loop.prepare_ralphy_dir()
+    return loop
+
+
+def read_events(loop):
+    loop._close_sinks()
+    with open(loop.events_file, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def bench_direct_spawn(iterations):
+    """Spawning the stub with subprocess.run and nothing else: the floor."""
+    argv = [sys.executable, STUB_AGENT]
+    start = time.perf_counter()
+    for _ in range(iterations):
+        subprocess.run(argv, input="prompt", capture_output=True, text=True)
+    return iterations / (time.perf_counter() - start)
+
+
+def bench_iterations(iterations, stream):
+    """Iterations per second through run_single_iteration, plus latencies from events.jsonl."""
+    work_dir = tempfile.mkdtemp(prefix="ralph-bench-")
+    try:
+        loop = make_loop(work_dir, stub_command(), stream_output=stream)
+        with quiet():
+            start = time.perf_counter()
+            for _ in range(iterations):
+                loop.run_single_iteration()
+            elapsed = time.perf_counter() - start
+        events = read_events(loop)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    spawn = [e["spawn_latency_s"] for e in events if e.get("spawn_latency_s") is not None]
+    first_byte = [
+        e["spawn_latency_s"] + e["first_output_s"]
+        for e in events
+        if e.get("spawn_latency_s") is not None and e.get("first_output_s") is not None
+    ]
+    return {
+        "iterations_per_second": round(iterations / elapsed, 2),
+        "spawn_latency_ms": summarize(spawn),
+        "spawn_to_first_byte_ms": summarize(first_byte),
+    }
+
+
+def rss_probe(output_mb, stream):
+    """Child-process side of bench_peak_rss: one iteration, then report peak RSS."""
+    work_dir = tempfile.mkdtemp(prefix="ralph-bench-")
+    try:
+        loop = make_loop(work_dir, stub_command("--output-mb", str(output_mb)), stream_output=stream)
+        with quiet():
+            loop.run_single_iteration()
+        loop._close_sinks()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux but in bytes on macOS
+    peak_kb = peak // 1024 if sys.platform == "darwin" else peak
+    print(json.dumps({"peak_rss_kb": peak_kb}))
+
+
+def bench_peak_rss(sizes_mb, stream):
+    """Peak RSS of a fresh orchestrator process per output size.
+
+    Each size runs in its own process, because peak RSS only ever grows.
+    """
+    if resource is None:
+        return None
+    results = {}
+    for size in [0] + list(sizes_mb):
+        cmd = [sys.executable, os.path.abspath(__file__), "--rss-probe", str(size)]
+        if stream:
+            cmd.append("--stream")
+        probe = subprocess.run(cmd, capture_output=True, text=True, check=True)
+        results[size] = json.loads(probe.stdout.strip().splitlines()[-1])["peak_rss_kb"]
+    baseline = results.pop(0)
+    return {
+        "baseline_kb": baseline,
+        "by_output_mb": {
+            str(size): {
+                "peak_rss_kb": peak,
+                "growth_kb": peak - baseline,
+                "growth_per_output_mb_kb": round((peak - baseline) / size, 1),
+            }
+            for size, peak in results.items()
+        },
+    }
+
+
+def bench_log_writes(lines):
+    """Microseconds per log line through LogSink."""
+    results = {}
+    work_dir = tempfile.mkdtemp(prefix="ralph-bench-")
+    try:
+        for label, interval in (("unbuffered", 0.0), ("buffered_1s", 1.0)):
+            sink = LogSink(os.path.join(work_dir, f"{label}.log"), flush_interval=interval)
+            message = "[2026-01-01 00:00:00] " + "x" * 80
+            start = time.perf_counter()
+            for _ in range(lines):
+                sink.write(message)
+            sink.close()
+            results[f"{label}_us_per_line"] = round((time.perf_counter() - start) / lines * 1e6, 3)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def flatten(results, prefix=""):
+    """{"a": {"b": 1}} -> {"a.b": 1}, keeping only numbers."""
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(previous_path, results):
+    with open(previous_path, "r", encoding="utf-8") as f:
+        previous = json.load(f)
+    old, new = flatten(previous.get("results", {})), flatten(results["results"])
+    print(f"\nCompared with {previous.get('version')} ({previous.get('timestamp')}):")
+    for name in sorted(old.keys() & new.keys()):
+        before, after = old[name], new[name]
+        change = f"{(after - before) / before * 100:+.1f}%" if before else "n/a"
+        print(f"  {name:60} {before:>12} -> {after:>12}  {change}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark oh-my-ralph's per-iteration overhead")
+    parser.add_argument("--iterations", type=int, default=None, help="Iterations per throughput run (default: 30, 5 with --quick)")
+    parser.add_argument("--output-sizes", type=float, nargs="+", default=None,
+                        help="Agent output sizes in MB for the RSS runs (default: 1 10 50, 1 with --quick)")
+    parser.add_argument("--log-lines", type=int, default=None,
+                        help="Lines written in the log benchmark (default: 100000, 10000 with --quick)")
+    parser.add_argument("--quick", action="store_true", help="Fewer iterations and smaller outputs, for a smoke run")
+    parser.add_argument("--output", type=str, default=None,
+                        help="Where to write the JSON results (default: benchmarks/results/bench-<version>-<time>.json)")
+    parser.add_argument("--compare", type=str, default=None, help="Earlier results file to compare against")
+    parser.add_argument("--rss-probe", type=float, default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--stream", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.rss_probe is not None:
+        rss_probe(args.rss_probe, args.stream)
+        return
+    defaults = (5, [1], 10000) if args.quick else (30, [1, 10, 50], 100000)
+    args.iterations = args.iterations or defaults[0]
+    args.output_sizes = args.output_sizes or defaults[1]
+    args.log_lines = args.log_lines or defaults[2]
+
+    print(f"Benchmarking oh-my-ralph {__version__} with {args.iterations} iterations per run...")
+    direct = bench_direct_spawn(args.iterations)
+    # Both runs capture the agent's output the same way; --stream only adds the echo
+    quiet_run = bench_iterations(args.iterations, stream=False)
+    echo_run = bench_iterations(args.iterations, stream=True)
+    for run in (quiet_run, echo_run):
+        run["overhead_ms_per_iteration"] = round((1 / run["iterations_per_second"] - 1 / direct) * 1000, 3)
+    results = {
+        "version": __version__,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": {"iterations": args.iterations, "output_sizes_mb": args.output_sizes, "log_lines": args.log_lines},
+        "results": {
+            "direct_spawn_iterations_per_second": round(direct, 2),
+            "quiet": quiet_run,
+            "echo": echo_run,
+            "peak_rss_quiet": bench_peak_rss(args.output_sizes, stream=False),
+            "peak_rss_echo": bench_peak_rss(args.output_sizes, stream=True),
+            "log_writes": bench_log_writes(args.log_lines),
+        },
+    }
+
+    output = args.output or os.path.join(
+        BENCH_DIR, "results", f"bench-{__version__}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps(results["results"], indent=2))
+    print(f"\nResults written to {output}")
+    if args.compare:
+        compare(args.compare, results)
+
+
+if __name__ == "__main__":
+    main()
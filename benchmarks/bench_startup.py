@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""Measure how long the oh-my-ralph CLI takes to start and to run once.
+
+Scripted runs (CI jobs calling ``oh-my-ralph --max-iterations 1`` in a
+loop) pay the CLI's startup on every call, so this times, each in a fresh
+interpreter:
+
+- ``import oh_my_ralph.ralph_cli`` against a bare ``python -c pass``
+- a whole ``--max-iterations 1 --quiet --delay 0`` run against
+  benchmarks/stub_agent.py, against spawning the stub directly
+
+Results go to a JSON file (benchmarks/results/ by default); pass an
+earlier file with --compare to see what changed, and --budget-ms to fail
+(exit 1) when a CLI run's median overhead is over budget, e.g. in CI.
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 5 --budget-ms 1000
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from bench_orchestrator import STUB_AGENT, compare, stub_command, summarize  # noqa: E402
+from oh_my_ralph import __version__  # noqa: E402
+
+
+def _env():
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [ROOT, env.get("PYTHONPATH")]))
+    return env
+
+
+def time_command(argv, runs, stdin=None):
+    """Wall-clock seconds for each of ``runs`` runs of ``argv``."""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(argv, env=_env(), input=stdin, capture_output=True, text=True, check=True)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def bench_import(runs):
+    """Time to import the CLI module, over an interpreter that imports nothing."""
+    bare = time_command([sys.executable, "-c", "pass"], runs)
+    cli = time_command([sys.executable, "-c", "import oh_my_ralph.ralph_cli"], runs)
+    return {
+        "python_ms": summarize(bare),
+        "import_cli_ms": summarize(cli),
+        "import_overhead_ms": round(summarize(cli)["median"] - summarize(bare)["median"], 3),
+    }
+
+
+def cli_run_argv(work_dir):
+    return [
+        sys.executable, "-m", "oh_my_ralph.ralph_cli",
+        "--agent", stub_command(), "--model", "stub",
+        "--working-dir", work_dir, "--log", os.path.join(work_dir, "ralph.log"),
+        "--max-iterations", "1", "--delay", "0", "--quiet",
+    ]
+
+
+def bench_cli_run(runs):
+    """A whole one-iteration CLI run, over spawning the stub agent directly."""
+    work_dir = tempfile.mkdtemp(prefix="ralph-bench-")
+    try:
+        # The first run copies the resource files into .ralphy/; time the later ones
+        time_command(cli_run_argv(work_dir), 1)
+        direct = time_command([sys.executable, STUB_AGENT], runs, stdin="prompt")
+        cli = time_command(cli_run_argv(work_dir), runs)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return {
+        "direct_stub_ms": summarize(direct),
+        "cli_run_ms": summarize(cli),
+        "cli_overhead_ms": round(summarize(cli)["median"] - summarize(direct)["median"], 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark oh-my-ralph's CLI startup time")
+    parser.add_argument("--runs", type=int, default=10, help="Runs per measurement (default: 10)")
+    parser.add_argument("--output", type=str, default=None,
+                        help="Where to write the JSON results (default: benchmarks/results/startup-<version>-<time>.json)")
+    parser.add_argument("--compare", type=str, default=None, help="Earlier results file to compare against")
+    parser.add_argument("--budget-ms", type=float, default=None,
+                        help="Exit 1 if a CLI run's median overhead over the bare stub is above this")
+    args = parser.parse_args()
+
+    print(f"Benchmarking oh-my-ralph {__version__} startup with {args.runs} runs per measurement...")
+    results = {
+        "version": __version__,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": {"runs": args.runs},
+        "results": {
+            "import": bench_import(args.runs),
+            "cli_run": bench_cli_run(args.runs),
+        },
+    }
+
+    output = args.output or os.path.join(
+        BENCH_DIR, "results", f"startup-{__version__}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps(results["results"], indent=2))
+    print(f"\nResults written to {output}")
+    if args.compare:
+        compare(args.compare, results)
+    overhead = results["results"]["cli_run"]["cli_overhead_ms"]
+    if args.budget_ms is not None and overhead > args.budget_ms:
+        print(f"\nCLI run overhead {overhead} ms is over the {args.budget_ms} ms budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
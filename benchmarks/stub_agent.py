@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""Stand-in agent for benchmarks: reads the prompt from stdin and then
+behaves as configured, without calling any model."""
+
+import argparse
+import sys
+import time
+
+DONE_MARKER = "<PROMISE>DONE</PROMISE>"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake agent for oh-my-ralph benchmarks")
+    parser.add_argument("--output-mb", type=float, default=0, help="MB of output to write to stdout")
+    parser.add_argument("--line-length", type=int, default=100, help="Length of each output line")
+    parser.add_argument("--stderr-mb", type=float, default=0, help="MB of output to write to stderr")
+    parser.add_argument("--sleep", type=float, default=0, help="Seconds to sleep before exiting")
+    parser.add_argument("--done", action="store_true", help="Print the DONE marker at the end")
+    parser.add_argument("--exit-code", type=int, default=0, help="Exit code to return (non-zero to fail)")
+    args = parser.parse_args()
+
+    if not sys.stdin.isatty():
+        sys.stdin.read()
+    # First byte as early as possible, so spawn-to-first-byte measures the orchestrator
+    sys.stdout.write("stub agent started\n")
+    sys.stdout.flush()
+
+    line = "x" * (args.line_length - 1) + "\n"
+    for stream, megabytes in ((sys.stdout, args.output_mb), (sys.stderr, args.stderr_mb)):
+        remaining = int(megabytes * 1024 * 1024)
+        while remaining > 0:
+            chunk = line[:remaining] if remaining < len(line) else line
+            stream.write(chunk)
+            remaining -= len(chunk)
+        stream.flush()
+    if args.sleep:
+        time.sleep(args.sleep)
+    if args.done:
+        print(DONE_MARKER)
+    sys.exit(args.exit_code)
+
+
+if __name__ == "__main__":
+    main()
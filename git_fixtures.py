@@ -0,0 +1,24 @@
+"""Temporary git repositories for the tests that need a real one"""
+
+import os
+
+from oh_my_ralph.git_workspace import git
+
+
+def make_repo(temp_dir, files):
+    """Create ``temp_dir/repo`` with one commit of ``files`` (name -> text) and return its path.
+
+    Like a project Ralph works on, it has a .ralphy directory and ignores
+    it and the log.
+    """
+    repo = os.path.join(temp_dir, "repo")
+    os.makedirs(os.path.join(repo, ".ralphy"))
+    git(repo, "init", "-q")
+    git(repo, "config", "user.email", "ralph@example.com")
+    git(repo, "config", "user.name", "Ralph")
+    for name, text in {".gitignore": ".ralphy/\nralph.log*\n", **files}.items():
+        with open(os.path.join(repo, name), "w", encoding="utf-8") as f:
+            f.write(text)
+    git(repo, "add", "-A")
+    git(repo, "commit", "-q", "-m", "initial")
+    return repo
@@ -0,0 +1,217 @@
+import os
+import shlex
+
+DONE_MARKER = "<PROMISE>DONE</PROMISE>"
+# Entry point group third-party packages use to add adapters
+ENTRY_POINT_GROUP = "oh_my_ralph.agents"
+# Package runners whose first non-option argument names the real program
+PACKAGE_RUNNERS = {"npx", "bunx", "pnpx", "uvx", "pipx"}
+
+
+def split_command(command: str) -> list[str]:
+    """Split an agent command line into argv the way the platform's shell would."""
+    return shlex.split(command, posix=os.name != "nt")
+
+
+def program_name(argv: list[str]) -> str:
+    """The program an agent command runs, without directory or extension.
+
+    For package runners such as ``npx --yes @sourcegraph/amp`` this is the
+    package that is run, not the runner.
+    """
+    if not argv:
+        return ""
+    name = os.path.splitext(os.path.basename(argv[0]))[0].lower()
+    if name in PACKAGE_RUNNERS:
+        for arg in argv[1:]:
+            if not arg.startswith("-"):
+                return arg.lower()
+    return name
+
+
+class AgentAdapter:
+    """How to drive one agent CLI.
+
+    Subclasses declare how the agent takes its prompt (``prompt_via`` is
+    "arg" or "stdin"), the marker it prints when the work is finished,
+    the flags that switch on streaming JSON output and continue the
+    previous session (empty when unsupported), and build the argv for
+    one iteration. Adapters run without a shell.
+    """
+
+    name = "generic"
+    prompt_via = "stdin"
+    completion_marker = DONE_MARKER
+    stream_json_flags = ()
+    session_flags = ()
+    uses_opencode_server = False
+
+    def __init__(self, argv: list[str], **settings):
+        self.base_argv = list(argv)
+        self.settings = settings
+
+    @classmethod
+    def matches(cls, argv: list[str]) -> bool:
+        return False
+
+    @property
+    def supports_stream_json(self) -> bool:
+        return bool(self.stream_json_flags)
+
+    @property
+    def supports_session_reuse(self) -> bool:
+        return bool(self.session_flags)
+
+    def add_stream_json_flags(self, argv: list[str]) -> list[str]:
+        """argv with the flags that switch on JSON output, ahead of a prompt argument."""
+        if not self.stream_json_flags:
+            return argv
+        if self.prompt_via == "arg":
+            return argv[:-1] + list(self.stream_json_flags) + argv[-1:]
+        return argv + list(self.stream_json_flags)
+
+    def instruction(self, prompt_file) -> str:
+        return f"Read and follow the instructions in the file `{prompt_file}`."
+
+    def build_argv(self, prompt_file, model: str = None, continue_session: bool = False) -> list[str]:
+        argv = list(self.base_argv)
+        if continue_session:
+            argv += self.session_flags
+        return argv
+
+
+class OpenCodeAdapter(AgentAdapter):
+    name = "opencode"
+    prompt_via = "arg"
+    stream_json_flags = ("--format", "json")
+    session_flags = ("--continue",)
+    uses_opencode_server = True
+
+    @classmethod
+    def matches(cls, argv):
+        return program_name(argv) == "opencode" and argv[1:2] == ["run"]
+
+    def build_argv(self, prompt_file, model=None, continue_session=False):
+        argv = list(self.base_argv)
+        if model:
+            argv += ["--model", model]
+        if continue_session:
+            argv += self.session_flags
+        port = self.settings.get("opencode_port")
+        if port:
+            argv += ["--attach", f"http://localhost:{port}"]
+        return argv + [self.instruction(prompt_file)]
+
+
+class ClaudeAdapter(AgentAdapter):
+    name = "claude"
+    prompt_via = "arg"
+    stream_json_flags = ("--output-format", "stream-json", "--verbose")
+    session_flags = ("--continue",)
+
+    @classmethod
+    def matches(cls, argv):
+        return program_name(argv) == "claude"
+
+    def build_argv(self, prompt_file, model=None, continue_session=False):
+        argv = list(self.base_argv)
+        if model:
+            argv += ["--model", model]
+        argv.append("--dangerously-skip-permissions")
+        if continue_session:
+            argv += self.session_flags
+        return argv + [self.instruction(prompt_file)]
+
+
+class CopilotAdapter(AgentAdapter):
+    name = "copilot"
+    prompt_via = "arg"
+    session_flags = ("--continue",)
+
+    @classmethod
+    def matches(cls, argv):
+        return program_name(argv) == "copilot"
+
+    def build_argv(self, prompt_file, model=None, continue_session=False):
+        # copilot [--model X] --yolo [--continue] <user flags, e.g. -p> "prompt"
+        argv = self.base_argv[:1]
+        if model:
+            argv += ["--model", model]
+        argv.append("--yolo")
+        if continue_session:
+            argv += self.session_flags
+        return argv + self.base_argv[1:] + [self.instruction(prompt_file)]
+
+
+class AmpAdapter(AgentAdapter):
+    name = "amp"
+    prompt_via = "arg"
+    stream_json_flags = ("--stream-json",)
+
+    @classmethod
+    def matches(cls, argv):
+        return program_name(argv) in ("amp", "@sourcegraph/amp")
+
+    def build_argv(self, prompt_file, model=None, continue_session=False):
+        argv = list(self.base_argv)
+        if model:
+            argv += ["--model", model]
+        argv.append("--dangerously-allow-all")
+        return argv + [self.instruction(prompt_file)]
+
+
+class AiderAdapter(AgentAdapter):
+    name = "aider"
+    session_flags = ("--restore-chat-history",)
+
+    @classmethod
+    def matches(cls, argv):
+        return program_name(argv) == "aider"
+
+
+# Checked in order; the first adapter whose matches() accepts the command wins
+ADAPTERS = [OpenCodeAdapter, ClaudeAdapter, CopilotAdapter, AmpAdapter, AiderAdapter]
+_entry_points_loaded = False
+
+
+def register_adapter(adapter_class):
+    """Add an adapter ahead of the built-in ones. Usable as a class decorator."""
+    if adapter_class not in ADAPTERS:
+        ADAPTERS.insert(0, adapter_class)
+    return adapter_class
+
+
+def load_entry_point_adapters():
+    """Register adapters that installed packages expose in ENTRY_POINT_GROUP.
+
+    Broken plugins are skipped, so one bad package cannot stop the loop.
+    """
+    global _entry_points_loaded
+    if _entry_points_loaded:
+        return
+    _entry_points_loaded = True
+    from importlib.metadata import entry_points
+    for entry_point in entry_points(group=ENTRY_POINT_GROUP):
+        try:
+            register_adapter(entry_point.load())
+        except Exception as e:
+            print(f"[Ralph] Could not load agent adapter {entry_point.name}: {e}")
+
+
+def resolve_adapter(agent_command: str, **settings) -> AgentAdapter:
+    """Parse an agent command once and pick the adapter that drives it."""
+    load_entry_point_adapters()
+    argv = split_command(agent_command)
+    for adapter_class in ADAPTERS:
+        if adapter_class.matches(argv):
+            return adapter_class(argv, **settings)
+    return AgentAdapter(argv, **settings)
+
+
+def executable_argv(argv: list[str]) -> list[str]:
+    """argv with the program resolved on PATH, so that wrappers such as
+    ``npx.cmd`` on Windows can be started without a shell."""
+    if not argv:
+        return argv
+    import shutil
+    return [shutil.which(argv[0]) or argv[0]] + argv[1:]
@@ -0,0 +1,351 @@
+import asyncio
+import codecs
+import signal
+import sys
+import time
+
+from .output_capture import OutputCapture
+from .process_group import kill_process_tree, new_process_group_kwargs, signal_process_tree, terminate_process_tree
+from .ralph_loop import DONE_GRACE_PERIOD, STREAM_READ_CHARS, RalphLoop
+
+
+class AsyncRalphLoop(RalphLoop):
+    """RalphLoop driven by asyncio instead of blocking subprocess calls.
+
+    ``run_single_iteration`` and ``run`` are coroutines with the same
+    semantics as the blocking versions, so one event loop can supervise
+    many agents, their opencode web servers and the delays between
+    iterations (see ``run_loops``). Agent output always goes through
+    bounded OutputCaptures; ``stream_output`` only controls whether it is
+    echoed to the console and log as it arrives. Hedging is not supported.
+    """
+
+    def __init__(self, *args, scheduler=None, **kwargs):
+        # The Hedger races blocking RalphLoops in threads; rejected here
+        # rather than silently running without backups
+        if kwargs.get("hedge"):
+            raise ValueError("hedge is not supported by the asyncio engine")
+        super().__init__(*args, **kwargs)
+        self._event_loop = None
+        self._wakeup = None
+        # Shared with other loops to cap how many agents run at once (see
+        # daemon.FairScheduler); each iteration waits for a slot from it
+        self.scheduler = scheduler
+
+    def _signal_handler(self, signum, frame):
+        print(f"\n[Ralph] Received shutdown signal. Finishing current iteration...")
+        self.running = False
+        self._log_sink.flush()
+        if self._event_loop is not None:
+            self._event_loop.call_soon_threadsafe(self._on_shutdown, signum)
+
+    def request_stop(self, signum=signal.SIGTERM):
+        """Stop after the current iteration, passing ``signum`` on to a running
+        agent. Call from the event loop's thread."""
+        self.running = False
+        self._log_sink.flush()
+        if self._event_loop is not None:
+            self._on_shutdown(signum)
+
+    def _on_shutdown(self, signum=signal.SIGTERM):
+        if self._wakeup is not None:
+            self._wakeup.set()
+        # The agent runs in its own process group; pass the signal on to all of it
+        if self._agent_proc is not None:
+            signal_process_tree(self._agent_proc, signum)
+        if self.verifier is not None:
+            self.verifier.cancel(signum)
+        asyncio.ensure_future(self._stop_opencode_server_async())
+
+    async def _start_opencode_server_async(self):
+        try:
+            cmd = f"opencode web --port {self.opencode_port}"
+            self._log(f"Starting opencode web server on port {self.opencode_port} (output in {self.opencode_log})...")
+            self._close_opencode_log()
+            log_handle = self._open_opencode_log()
+            self.opencode_proc = await asyncio.create_subprocess_shell(
+                cmd,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=log_handle,
+                stderr=asyncio.subprocess.STDOUT,
+                cwd=self._agent_cwd,
+                **new_process_group_kwargs(),
+            )
+        except Exception as e:
+            self._log(f"Failed to start opencode web server: {e}")
+            self.opencode_proc = None
+            self._close_opencode_log()
+
+    async def _wait_for_opencode_server_async(self) -> bool:
+        from .opencode_server import wait_until_listening_async
+        start = time.monotonic()
+        ready = await wait_until_listening_async(
+            self.opencode_port, self.opencode_ready_timeout, self._opencode_server_alive
+        )
+        self._report_opencode_ready(ready, time.monotonic() - start)
+        return ready
+
+    async def _ensure_opencode_server_async(self):
+        if self._opencode_server_alive():
+            return
+        if self.opencode_proc is None:
+            self._log("opencode web server is not running. Starting it.")
+        else:
+            self._log(f"opencode web server exited with code {self.opencode_proc.returncode}. Restarting it.")
+        await self._start_opencode_server_async()
+        await self._wait_for_opencode_server_async()
+
+    def _opencode_server_alive(self) -> bool:
+        return self.opencode_proc is not None and self.opencode_proc.returncode is None
+
+    async def _stop_opencode_server_async(self):
+        proc = self.opencode_proc
+        if proc and proc.returncode is None:
+            self._log("Stopping opencode web server...")
+            terminate_process_tree(proc)
+            try:
+                await asyncio.wait_for(proc.wait(), timeout=5)
+            except Exception:
+                kill_process_tree(proc)
+        self.opencode_proc = None
+        self._close_opencode_log()
+
+    async def _run_agent(self, prompt: str) -> tuple[int, str, str]:
+        try:
+            argv = self._agent_argv()
+            uses_command_with_prompt_arg = self._uses_prompt_arg()
+            if not self.quiet:
+                print(f"Running command: {self._build_agent_command(prompt)}")
+            spawn_start = time.monotonic()
+            process = await asyncio.create_subprocess_exec(
+                *argv,
+                stdin=None if uses_command_with_prompt_arg else asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                cwd=self._agent_cwd,
+                **new_process_group_kwargs(),
+            )
+            self._note_spawned(spawn_start)
+        except Exception as e:
+            return -1, "", str(e)
+        self._agent_proc = process
+        try:
+            return await self._supervise(
+                process, None if uses_command_with_prompt_arg else prompt, timeout=self._agent_timeout()
+            )
+        finally:
+            self._agent_proc = None
+
+    async def _pump(self, stream, name: str, capture: OutputCapture, marker_event: asyncio.Event, tee_log: bool):
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        pending = ""
+        while True:
+            chunk = await stream.read(STREAM_READ_CHARS)
+            text = decoder.decode(chunk, final=not chunk)
+            if text:
+                self._note_output()
+                capture.write(text)
+                if capture.marker_seen:
+                    marker_event.set()
+                if self.stream_output:
+                    print(text, end="", file=sys.stdout if name == "stdout" else sys.stderr, flush=True)
+                    if tee_log:
+                        pending += text
+                        *lines, pending = pending.split("\n")
+                        if len(pending) > STREAM_READ_CHARS:
+                            lines.append(pending)
+                            pending = ""
+                        for line in lines:
+                            self._append_log(f"  {name}| {line.rstrip()}")
+            if not chunk:
+                break
+        if pending and tee_log:
+            self._append_log(f"  {name}| {pending.rstrip()}")
+
+    @staticmethod
+    async def _exit_code(process) -> int:
+        """Wait for the agent itself to exit.
+
+        Unlike ``process.wait()``, this does not also wait for its pipes to
+        close, which a background child of the agent can hold open.
+        """
+        while process.returncode is None:
+            await asyncio.sleep(0.05)
+        return process.returncode
+
+    async def _supervise(self, process, stdin_text, timeout: float) -> tuple[int, str, str]:
+        transcript = self._open_transcript()
+        captured = {
+            "stdout": self._stdout_capture(transcript),
+            "stderr": OutputCapture(transcript=transcript, transcript_prefix="[stderr] "),
+        }
+        marker_event = asyncio.Event()
+        pumps = [
+            asyncio.ensure_future(self._pump(stream, name, captured[name], marker_event, transcript is None))
+            for name, stream in (("stdout", process.stdout), ("stderr", process.stderr))
+        ]
+        if stdin_text is not None:
+            try:
+                process.stdin.write(stdin_text.encode("utf-8"))
+                await process.stdin.drain()
+                process.stdin.close()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        exited = asyncio.ensure_future(self._exit_code(process))
+        stopped_early = False
+        timed_out = False
+        try:
+            if self.stop_on_done:
+                marker = asyncio.ensure_future(marker_event.wait())
+                await asyncio.wait({exited, marker}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                marker.cancel()
+                if not exited.done() and marker_event.is_set():
+                    try:
+                        await asyncio.wait_for(asyncio.shield(exited), DONE_GRACE_PERIOD)
+                    except asyncio.TimeoutError:
+                        self._log("Agent still running after completion marker. Ending iteration early.")
+                        terminate_process_tree(process)
+                        stopped_early = True
+                        deadline = min(deadline, loop.time() + DONE_GRACE_PERIOD)
+            try:
+                await asyncio.wait_for(asyncio.shield(exited), max(deadline - loop.time(), 0))
+            except asyncio.TimeoutError:
+                kill_process_tree(process)
+                timed_out = not stopped_early
+                await exited
+            # The agent has exited; whatever it left running (a dev server, a
+            # watcher) may still hold the pipes open, and must not stall the
+            # iteration
+            _, pending = await asyncio.wait(pumps, timeout=DONE_GRACE_PERIOD)
+            if pending:
+                self._log("Agent exited but its pipes are still open. Killing what it left running.")
+                kill_process_tree(process)
+                # With the group gone the pipes reach EOF, so the transport
+                # closes them instead of leaving that to garbage collection
+                _, pending = await asyncio.wait(pending, timeout=DONE_GRACE_PERIOD)
+                for pump in pending:
+                    pump.cancel()
+        finally:
+            if transcript is not None:
+                transcript.close()
+                self._log(f"Transcript saved to {transcript.name}")
+        self._last_marker_seen = captured["stdout"].marker_seen
+        self._agent_stats["stdout_bytes"] = captured["stdout"].total_bytes
+        self._agent_stats["stderr_bytes"] = captured["stderr"].total_bytes
+        stdout, stderr = captured["stdout"].getvalue(), captured["stderr"].getvalue()
+        if timed_out:
+            return -1, stdout, f"Process timed out after {timeout:.0f}s"
+        return_code = 0 if stopped_early else process.returncode
+        return return_code, stdout, stderr
+
+    async def run_single_iteration(self) -> tuple[bool, bool]:
+        # The blocking book-keeping (git snapshots, workspace fingerprints,
+        # task leases) runs in a thread so it does not stall other loops
+        success = False
+        start_time = time.time()
+        try:
+            prompt = await asyncio.to_thread(self._begin_iteration)
+            start_time = time.time()
+            return_code, stdout, stderr = await self._run_agent(prompt)
+            success, should_stop = await asyncio.to_thread(
+                self._end_iteration, return_code, stdout, stderr, time.time() - start_time
+            )
+            return (success, should_stop)
+        except FileNotFoundError as e:
+            self._log(f"Error: {e}")
+            await asyncio.to_thread(self._record_iteration_event, None, time.time() - start_time, error=str(e))
+            return (False, False)
+        except Exception as e:
+            self._log(f"Unexpected error: {e}")
+            await asyncio.to_thread(self._record_iteration_event, None, time.time() - start_time, error=str(e))
+            return (False, False)
+        finally:
+            if self.current_task is not None:
+                await asyncio.to_thread(self._finish_task, success)
+
+    async def _acquire_slot(self) -> bool:
+        """Wait for the scheduler to let this loop run an iteration.
+
+        Returns False when the loop should stop instead.
+        """
+        if self.scheduler is None:
+            return True
+        self._set_phase("waiting")
+        granted = await self.scheduler.acquire(self.worker_id)
+        if granted and not self.running:
+            self.scheduler.release(self.worker_id)
+            return False
+        return granted
+
+    def _release_slot(self):
+        if self.scheduler is not None:
+            self.scheduler.release(self.worker_id)
+
+    async def _sleep(self, seconds: float):
+        """Sleep that ends early when the loop is asked to shut down."""
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    async def run(self):
+        self._event_loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._prepare_run()
+        self._start_metrics_server()
+        if self.next_delay > 0:
+            await self._sleep(self.next_delay)
+        if self._uses_opencode_server():
+            await self._start_opencode_server_async()
+            await self._wait_for_opencode_server_async()
+        if not self._check_prerequisites():
+            self._log("Prerequisites check failed. Exiting.")
+            await self._stop_opencode_server_async()
+            self._stop_metrics_server()
+            return
+        try:
+            while self.running:
+                if not self._iteration_allowed():
+                    break
+                if not await self._acquire_slot():
+                    break
+                try:
+                    if self._uses_opencode_server():
+                        await self._ensure_opencode_server_async()
+                    success, should_stop = await self.run_single_iteration()
+                finally:
+                    self._release_slot()
+                if not await asyncio.to_thread(self._after_iteration, success, should_stop):
+                    break
+                if self.running and self.next_delay > 0:
+                    await self._sleep(self.next_delay)
+        finally:
+            if self._uses_opencode_server():
+                await self._stop_opencode_server_async()
+            # Waits for the last verification without blocking other loops
+            await asyncio.to_thread(self._finish_verification)
+            self._set_phase("stopped")
+            self._stop_metrics_server()
+        self._log(f"Ralph Loop stopped after {self.iteration} iterations.")
+        self._close_sinks()
+
+
+async def run_loops(loops):
+    """Run several AsyncRalphLoops concurrently on the current event loop.
+
+    Create the loops with ``install_signal_handlers=False``. Only one
+    handler can be installed per process, so SIGINT and SIGTERM are
+    forwarded to every loop instead. Give each loop its own ``working_dir``
+    and ``change_dir=False``, so that no ``run`` changes the process
+    directory under the others, and pass every other path absolute.
+    """
+    def forward(signum, frame):
+        for loop in loops:
+            loop._signal_handler(signum, frame)
+
+    signal.signal(signal.SIGINT, forward)
+    signal.signal(signal.SIGTERM, forward)
+    return await asyncio.gather(*(loop.run() for loop in loops))
@@ -0,0 +1,47 @@
+import contextlib
+import os
+import stat
+import tempfile
+
+# os.umask can only be read by setting it, which races with other threads;
+# read it once at import, before the loop starts any
+_UMASK = os.umask(0o022)
+os.umask(_UMASK)
+
+
+@contextlib.contextmanager
+def atomic_write(path, mode: str = "w", fsync: bool = False, **open_kwargs):
+    """Open a temporary file next to ``path`` that replaces it on success.
+
+    Yields the open file (its ``name`` is the temporary path). When the
+    block finishes the file is closed and renamed over ``path``, so
+    anything reading ``path`` meanwhile sees either the old file or the
+    new one, never a half-written one. With ``fsync`` the data is flushed
+    to disk first, so a crash leaves one of the two as well. If the block
+    raises, the temporary file is removed and ``path`` is left alone.
+
+    The new file keeps the permissions of the one it replaces, or gets the
+    usual ``0o666 & ~umask`` when ``path`` is new, rather than the 0600
+    that mkstemp gives temporary files.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}-", suffix=".tmp", dir=directory)
+    os.close(fd)
+    try:
+        with open(tmp_path, mode, **open_kwargs) as f:
+            yield f
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        try:
+            permissions = stat.S_IMODE(os.stat(path).st_mode)
+        except OSError:
+            permissions = 0o666 & ~_UMASK
+        os.chmod(tmp_path, permissions)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
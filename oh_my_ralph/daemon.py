@@ -0,0 +1,493 @@
+import asyncio
+import json
+import os
+import signal
+import socket
+from datetime import datetime
+
+from .log_sink import LogSink
+
+# Control socket used on platforms without Unix domain sockets
+DEFAULT_CONTROL_PORT = 8790
+DEFAULT_CONTROL_SOCKET = "ralph-daemon.sock"
+# Manifest project keys that are named differently on RalphLoop
+PROJECT_KEY_ALIASES = {"agent": "agent_command", "delay": "delay_between_loops"}
+# Project options that name files or directories. The daemon never changes
+# directory, so these are made absolute before a loop sees them.
+PATH_OPTIONS = ("task_queue", "hedge_root", "verify_root")
+
+
+def resolve_paths(options: dict, base_dir: str) -> dict:
+    """Make the PATH_OPTIONS in ``options`` absolute, relative to ``base_dir``."""
+    for key in PATH_OPTIONS:
+        if options.get(key):
+            options[key] = os.path.join(base_dir, options[key])
+    return options
+
+
+class FairScheduler:
+    """Hands out a fixed number of iteration slots to many projects.
+
+    A free slot goes to the waiting project that was served least
+    recently (projects never served come first, in arrival order), so a
+    project with fast iterations cannot starve the others. Paused projects
+    keep their place but are skipped until resumed. Must be used from the
+    event loop's thread.
+    """
+
+    def __init__(self, limit: int):
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        self.limit = limit
+        self.active = set()
+        self.paused = set()
+        self._waiters = {}
+        self._last_served = {}
+        self._arrivals = 0
+        self._grants = 0
+        self._closed = False
+
+    def is_waiting(self, name: str) -> bool:
+        return name in self._waiters
+
+    async def acquire(self, name: str) -> bool:
+        """Wait for a slot. Returns False if the project was removed or the
+        scheduler closed while waiting."""
+        if self._closed:
+            return False
+        self._arrivals += 1
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[name] = (self._arrivals, future)
+        self._dispatch()
+        try:
+            return await future
+        except asyncio.CancelledError:
+            if self._waiters.get(name, (None, None))[1] is future:
+                del self._waiters[name]
+            elif future.done() and not future.cancelled() and future.result():
+                self.release(name)
+            raise
+
+    def release(self, name: str):
+        self.active.discard(name)
+        self._dispatch()
+
+    def pause(self, name: str):
+        self.paused.add(name)
+
+    def resume(self, name: str):
+        self.paused.discard(name)
+        self._dispatch()
+
+    def remove(self, name: str):
+        """Forget a project, failing its pending acquire."""
+        self.paused.discard(name)
+        self._last_served.pop(name, None)
+        _, future = self._waiters.pop(name, (None, None))
+        if future is not None and not future.done():
+            future.set_result(False)
+        self._dispatch()
+
+    def close(self):
+        """Fail every pending and future acquire."""
+        self._closed = True
+        for _, future in self._waiters.values():
+            if not future.done():
+                future.set_result(False)
+        self._waiters.clear()
+
+    def _dispatch(self):
+        while len(self.active) < self.limit:
+            eligible = [name for name in self._waiters if name not in self.paused]
+            if not eligible:
+                return
+            name = min(eligible, key=lambda n: (self._last_served.get(n, -1), self._waiters[n][0]))
+            _, future = self._waiters.pop(name)
+            if future.done():
+                continue
+            self._grants += 1
+            self._last_served[name] = self._grants
+            self.active.add(name)
+            future.set_result(True)
+
+
+def parse_control_address(address: str):
+    """``host:port`` (or a bare port) means TCP on that address; anything
+    else is the path of a Unix domain socket."""
+    address = str(address)
+    if address.isdigit():
+        return ("127.0.0.1", int(address))
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit() and "/" not in address and "\\" not in address:
+        return (host or "127.0.0.1", int(port))
+    return os.path.abspath(address)
+
+
+def default_control_address(base_dir: str = None) -> str:
+    if not hasattr(socket, "AF_UNIX"):
+        return f"127.0.0.1:{DEFAULT_CONTROL_PORT}"
+    return os.path.join(base_dir or os.getcwd(), DEFAULT_CONTROL_SOCKET)
+
+
+def send_command(address, request: dict, timeout: float = 10) -> dict:
+    """Send one request to a running daemon's control socket and return its reply."""
+    target = parse_control_address(address)
+    if isinstance(target, tuple):
+        sock = socket.create_connection(target, timeout=timeout)
+    else:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        sock.connect(target)
+    with sock, sock.makefile("rwb") as stream:
+        stream.write(json.dumps(request).encode("utf-8") + b"\n")
+        stream.flush()
+        reply = stream.readline()
+    if not reply:
+        raise ConnectionError("daemon closed the connection without replying")
+    return json.loads(reply)
+
+
+def load_manifest(path) -> dict:
+    """Read a daemon manifest (JSON).
+
+    Relative ``working_dir``, ``log_file``, ``control`` and PATH_OPTIONS
+    paths, in ``defaults`` and in every project, are taken relative to the
+    manifest; a project's ``log_file`` stays relative to its working_dir.
+    Raises ValueError when the manifest is unreadable or malformed.
+    """
+    path = os.path.abspath(path)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        raise ValueError(f"cannot read manifest {path}: {e}") from e
+    if not isinstance(manifest, dict) or not isinstance(manifest.get("projects", []), list):
+        raise ValueError(f"{path}: expected an object with a \"projects\" list")
+    base_dir = os.path.dirname(path)
+    manifest.setdefault("projects", [])
+    manifest["base_dir"] = base_dir
+    for project in manifest["projects"]:
+        if not isinstance(project, dict) or "working_dir" not in project:
+            raise ValueError(f"{path}: every project needs a \"working_dir\"")
+        project["working_dir"] = os.path.join(base_dir, project["working_dir"])
+        resolve_paths(project, base_dir)
+    if not isinstance(manifest.get("defaults", {}), dict):
+        raise ValueError(f"{path}: \"defaults\" must be an object")
+    resolve_paths(manifest.setdefault("defaults", {}), base_dir)
+    if manifest.get("log_file"):
+        manifest["log_file"] = os.path.join(base_dir, manifest["log_file"])
+    control = manifest.get("control")
+    if control and not isinstance(parse_control_address(control), tuple):
+        manifest["control"] = os.path.join(base_dir, control)
+    return manifest
+
+
+class Project:
+    """One working dir supervised by the daemon."""
+
+    def __init__(self, name: str, spec: dict, loop):
+        self.name = name
+        self.spec = spec
+        self.loop = loop
+        self.task = None
+        self.removing = False
+
+    def status(self, scheduler: FairScheduler) -> dict:
+        if self.task is not None and self.task.done():
+            state = "stopped"
+        elif self.removing:
+            state = "removing"
+        elif self.name in scheduler.active:
+            state = "running"
+        elif self.name in scheduler.paused:
+            state = "paused"
+        elif scheduler.is_waiting(self.name):
+            state = "waiting"
+        else:
+            state = "sleeping"
+        return {
+            "name": self.name,
+            "working_dir": self.spec["working_dir"],
+            "agent": self.loop.agent_command,
+            "model": self.loop.model,
+            "state": state,
+            "paused": self.name in scheduler.paused,
+            "iteration": self.loop.iteration,
+            "max_iterations": self.loop.max_iterations,
+            "consecutive_failures": self.loop.consecutive_failures,
+        }
+
+
+class RalphDaemon:
+    """Run the loops of many projects in one process.
+
+    Every project is an AsyncRalphLoop on the same event loop. At most
+    ``max_concurrent`` agents run at any time, shared out by a
+    FairScheduler; projects wait for a slot before each iteration. A
+    control socket (a Unix domain socket, or TCP on localhost where those
+    are not available) takes newline-delimited JSON requests to list,
+    add, pause, resume and remove projects while the others keep running.
+
+    ``manifest`` is a dict as returned by load_manifest. Top-level keys:
+    ``projects``, ``defaults`` (applied under every project),
+    ``max_concurrent``, ``control``, ``log_file``, ``opencode_port`` (the
+    first port handed to projects that do not set one), ``metrics_port``
+    and ``metrics_host``.
+    """
+
+    def __init__(self, manifest: dict, max_concurrent: int = None, control: str = None,
+                 exit_when_done: bool = False, install_signal_handlers: bool = True):
+        self.manifest = manifest
+        self.base_dir = manifest.get("base_dir") or os.getcwd()
+        self.defaults = resolve_paths(dict(manifest.get("defaults", {})), self.base_dir)
+        self.max_concurrent = max_concurrent or manifest.get("max_concurrent") or os.cpu_count() or 1
+        self.scheduler = FairScheduler(self.max_concurrent)
+        self.control = control or manifest.get("control") or default_control_address(self.base_dir)
+        self.exit_when_done = exit_when_done or manifest.get("exit_when_done", False)
+        self.install_signal_handlers = install_signal_handlers
+        self.projects = {}
+        self._next_opencode_port = manifest.get("opencode_port", 8089)
+        self.metrics_port = manifest.get("metrics_port")
+        self.metrics_host = manifest.get("metrics_host", "127.0.0.1")
+        self._metrics_list = []
+        self._metrics_server = None
+        self._control_server = None
+        self._event_loop = None
+        self._stopped = None
+        self._stopping = False
+        self._log_sink = LogSink(manifest.get("log_file") or os.path.join(self.base_dir, "ralph-daemon.log"))
+
+    def _log(self, message: str):
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        log_entry = f"[{timestamp}] [daemon] {message}"
+        print(log_entry)
+        self._log_sink.write(log_entry)
+
+    def _create_loop(self, name: str, spec: dict):
+        from .async_loop import AsyncRalphLoop
+        options = {PROJECT_KEY_ALIASES.get(key, key): value for key, value in {**self.defaults, **spec}.items()}
+        options.pop("name", None)
+        options.pop("paused", None)
+        working_dir = options.pop("working_dir")
+        if not os.path.isdir(working_dir):
+            raise ValueError(f"working_dir {working_dir} does not exist")
+        options["log_file"] = os.path.join(working_dir, options.get("log_file") or "ralph.log")
+        if not options.get("model"):
+            raise ValueError(f"project {name} has no model")
+        if "opencode_port" not in options:
+            options["opencode_port"] = self._next_opencode_port
+            self._next_opencode_port += 1
+        metrics = None
+        if self.metrics_port is not None:
+            from .metrics import LoopMetrics
+            metrics = LoopMetrics(name)
+        try:
+            return AsyncRalphLoop(
+                working_dir=working_dir,
+                change_dir=False,
+                install_signal_handlers=False,
+                log_prefix=f"[{name}] ",
+                worker_id=name,
+                scheduler=self.scheduler,
+                metrics=metrics,
+                **options,
+            )
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"project {name}: {e}") from e
+
+    def add_project(self, spec: dict) -> Project:
+        """Start supervising a project. Raises ValueError for a bad spec or a
+        name that is already running."""
+        if not isinstance(spec, dict) or not spec.get("working_dir"):
+            raise ValueError("a project needs a working_dir")
+        # The process directory is not the project's, so relative paths in a
+        # socket request are taken relative to the manifest (working_dir) or
+        # to the project's working_dir (everything else)
+        spec = dict(spec)
+        spec["working_dir"] = os.path.normpath(os.path.join(self.base_dir, spec["working_dir"]))
+        resolve_paths(spec, spec["working_dir"])
+        name = str(spec.get("name") or os.path.basename(spec["working_dir"].rstrip(os.sep)))
+        existing = self.projects.get(name)
+        if existing is not None and not (existing.task is not None and existing.task.done()):
+            raise ValueError(f"project {name} is already running")
+        project = Project(name, spec, self._create_loop(name, spec))
+        self.projects[name] = project
+        if project.loop.metrics is not None:
+            self._metrics_list.append(project.loop.metrics)
+        if spec.get("paused"):
+            self.scheduler.pause(name)
+        project.task = asyncio.ensure_future(self._run_project(project))
+        self._log(f"Added {name} ({spec['working_dir']}){' paused' if spec.get('paused') else ''}")
+        return project
+
+    def _get(self, name: str) -> Project:
+        project = self.projects.get(name)
+        if project is None:
+            raise ValueError(f"no project named {name}")
+        return project
+
+    def pause_project(self, name: str):
+        """Let the current iteration finish but start no new ones."""
+        self._get(name)
+        self.scheduler.pause(name)
+        self._log(f"Paused {name}")
+
+    def resume_project(self, name: str):
+        self._get(name)
+        self.scheduler.resume(name)
+        self._log(f"Resumed {name}")
+
+    def remove_project(self, name: str):
+        """Stop a project's loop, passing SIGTERM on to a running agent."""
+        project = self._get(name)
+        if project.task is not None and project.task.done():
+            del self.projects[name]
+        else:
+            project.removing = True
+            project.loop.request_stop()
+        self.scheduler.remove(name)
+        self._log(f"Removed {name}")
+
+    async def _run_project(self, project: Project):
+        try:
+            await project.loop.run()
+        except (Exception, SystemExit) as e:
+            self._log(f"{project.name} crashed: {e!r}")
+        finally:
+            self.scheduler.release(project.name)
+            if project.loop.metrics is not None and project.loop.metrics in self._metrics_list:
+                self._metrics_list.remove(project.loop.metrics)
+            if project.removing and self.projects.get(project.name) is project:
+                del self.projects[project.name]
+            self._log(f"{project.name} stopped after {project.loop.iteration} iterations")
+            if self.exit_when_done and all(p.task.done() for p in self.projects.values() if p.task is not project.task):
+                self.shutdown()
+
+    def status(self) -> dict:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "running": len(self.scheduler.active),
+            "projects": [project.status(self.scheduler) for project in self.projects.values()],
+        }
+
+    def handle_request(self, request: dict) -> dict:
+        """Apply one control request and return the reply."""
+        try:
+            command = request.get("command")
+            if command == "status":
+                return {"ok": True, **self.status()}
+            if command == "add":
+                project = self.add_project(request.get("project"))
+                return {"ok": True, "project": project.status(self.scheduler)}
+            if command in ("pause", "resume", "remove"):
+                getattr(self, f"{command}_project")(request.get("name"))
+                return {"ok": True}
+            if command == "shutdown":
+                self.shutdown()
+                return {"ok": True}
+            raise ValueError(f"unknown command {command!r}")
+        except (ValueError, TypeError, AttributeError) as e:
+            return {"ok": False, "error": str(e)}
+
+    async def _handle_client(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                except json.JSONDecodeError as e:
+                    reply = {"ok": False, "error": f"invalid JSON: {e}"}
+                else:
+                    reply = self.handle_request(request if isinstance(request, dict) else {})
+                writer.write(json.dumps(reply).encode("utf-8") + b"\n")
+                await writer.drain()
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            writer.close()
+
+    async def _start_control_server(self):
+        target = parse_control_address(self.control)
+        if isinstance(target, tuple):
+            self._control_server = await asyncio.start_server(self._handle_client, *target)
+        else:
+            if os.path.exists(target):
+                try:
+                    send_command(target, {"command": "status"}, timeout=1)
+                except OSError:
+                    os.remove(target)  # left behind by a daemon that died
+                else:
+                    raise RuntimeError(f"another daemon is already listening on {target}")
+            self._control_server = await asyncio.start_unix_server(self._handle_client, target)
+            os.chmod(target, 0o600)
+        self._log(f"Control socket listening on {self.control}")
+
+    async def _stop_control_server(self):
+        if self._control_server is None:
+            return
+        self._control_server.close()
+        await self._control_server.wait_closed()
+        self._control_server = None
+        target = parse_control_address(self.control)
+        if not isinstance(target, tuple):
+            try:
+                os.remove(target)
+            except OSError:
+                pass
+
+    def _start_metrics_server(self):
+        if self.metrics_port is None:
+            return
+        from .metrics import MetricsServer
+        try:
+            self._metrics_server = MetricsServer(self.metrics_port, self._metrics_list, host=self.metrics_host)
+            self._metrics_server.start()
+            self._log(f"Serving metrics on http://{self.metrics_host}:{self._metrics_server.port}/metrics")
+        except OSError as e:
+            self._log(f"Failed to start metrics server on port {self.metrics_port}: {e}")
+            self._metrics_server = None
+
+    def _signal_handler(self, signum, frame):
+        print(f"\n[Ralph] Received shutdown signal. Finishing current iterations...")
+        self._event_loop.call_soon_threadsafe(self.shutdown, signum)
+
+    def shutdown(self, signum=signal.SIGTERM):
+        """Stop every project after its current iteration and exit."""
+        if self._stopping:
+            return
+        self._stopping = True
+        self._log("Shutting down...")
+        for project in self.projects.values():
+            project.loop.request_stop(signum)
+        self.scheduler.close()
+        if self._stopped is not None:
+            self._stopped.set()
+
+    async def run(self):
+        self._event_loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        if self.install_signal_handlers:
+            signal.signal(signal.SIGINT, self._signal_handler)
+            signal.signal(signal.SIGTERM, self._signal_handler)
+        self._log(f"Starting daemon; up to {self.max_concurrent} agents run at once")
+        try:
+            await self._start_control_server()
+            self._start_metrics_server()
+            for spec in self.manifest.get("projects", []):
+                try:
+                    self.add_project(spec)
+                except ValueError as e:
+                    self._log(f"Skipping project: {e}")
+            if self.exit_when_done and not self.projects:
+                self.shutdown()
+            await self._stopped.wait()
+            tasks = [project.task for project in self.projects.values() if project.task is not None]
+            await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            await self._stop_control_server()
+            if self._metrics_server is not None:
+                self._metrics_server.stop()
+            self._log("Daemon stopped.")
+            self._log_sink.close()
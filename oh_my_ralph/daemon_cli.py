@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+CLI entry point for the Ralph daemon
+"""
+import argparse
+import json
+import os
+import sys
+
+from .daemon import default_control_address, load_manifest, send_command
+
+
+def _control_address(args) -> str:
+    if args.control:
+        return args.control
+    if args.manifest:
+        manifest = load_manifest(args.manifest)
+        return manifest.get("control") or default_control_address(manifest["base_dir"])
+    return default_control_address()
+
+
+def _print_status(reply: dict):
+    print(f"{reply['running']} of {reply['max_concurrent']} agent slots in use")
+    for project in reply["projects"]:
+        limit = project["max_iterations"] or "inf"
+        print(
+            f"  {project['name']:20} {project['state']:9} iteration {project['iteration']}/{limit}  "
+            f"failures {project['consecutive_failures']}  {project['working_dir']}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run Ralph loops for many projects from one process",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  oh-my-ralph-daemon run projects.json --max-concurrent 4
+  oh-my-ralph-daemon status
+  oh-my-ralph-daemon add --working-dir ../api --agent "claude -p" --model sonnet
+  oh-my-ralph-daemon pause api
+  oh-my-ralph-daemon resume api
+  oh-my-ralph-daemon remove api
+  oh-my-ralph-daemon shutdown
+        """,
+    )
+    parser.add_argument(
+        "--control",
+        type=str,
+        default=None,
+        help="Control socket path, or host:port (default: ralph-daemon.sock next to the manifest)",
+    )
+    parser.add_argument(
+        "--manifest",
+        type=str,
+        default=None,
+        help="Manifest to take the control socket from, for commands other than run",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Start the daemon")
+    run_parser.add_argument("manifest_file", help="JSON manifest listing the projects")
+    run_parser.add_argument(
+        "--max-concurrent",
+        type=int,
+        default=None,
+        help="Agents allowed to run at once across all projects (default: manifest value or CPU count)",
+    )
+    run_parser.add_argument(
+        "--exit-when-done",
+        action="store_true",
+        help="Exit once every project's loop has stopped instead of waiting for new ones",
+    )
+
+    commands.add_parser("status", help="List the projects and what they are doing")
+
+    add_parser = commands.add_parser("add", help="Start supervising another project")
+    add_parser.add_argument("--working-dir", required=True, help="The project's directory")
+    add_parser.add_argument("--name", default=None, help="Project name (default: the directory name)")
+    add_parser.add_argument("--agent", default=None, help="The agent command (default: the manifest's default)")
+    add_parser.add_argument("--model", default=None, help="Model name (default: the manifest's default)")
+    add_parser.add_argument("--max-iterations", type=int, default=None, help="Maximum number of iterations, 0 for infinite")
+    add_parser.add_argument("--delay", type=int, default=None, help="Delay in seconds between iterations")
+    add_parser.add_argument("--paused", action="store_true", help="Add the project without starting it")
+
+    for command, help_text in (
+        ("pause", "Finish the current iteration and start no new ones"),
+        ("resume", "Start iterating again"),
+        ("remove", "Stop the project's loop, terminating a running agent"),
+    ):
+        command_parser = commands.add_parser(command, help=help_text)
+        command_parser.add_argument("name", help="Project name")
+
+    commands.add_parser("shutdown", help="Stop every project and exit the daemon")
+
+    args = parser.parse_args()
+
+    if args.command == "run":
+        import asyncio
+        from .daemon import RalphDaemon
+        try:
+            manifest = load_manifest(args.manifest_file)
+        except ValueError as e:
+            parser.error(str(e))
+        daemon = RalphDaemon(
+            manifest,
+            max_concurrent=args.max_concurrent,
+            control=args.control,
+            exit_when_done=args.exit_when_done,
+        )
+        asyncio.run(daemon.run())
+        return
+
+    request = {"command": args.command}
+    if args.command in ("pause", "resume", "remove"):
+        request["name"] = args.name
+    elif args.command == "add":
+        project = {"working_dir": os.path.abspath(args.working_dir)}
+        for key in ("name", "agent", "model", "max_iterations", "delay"):
+            if getattr(args, key) is not None:
+                project[key] = getattr(args, key)
+        if args.paused:
+            project["paused"] = True
+        request["project"] = project
+
+    address = _control_address(args)
+    try:
+        reply = send_command(address, request)
+    except (OSError, ValueError) as e:
+        print(f"Could not reach the daemon at {address}: {e}", file=sys.stderr)
+        sys.exit(1)
+    if not reply.get("ok"):
+        print(f"Error: {reply.get('error')}", file=sys.stderr)
+        sys.exit(1)
+    if args.command == "status":
+        _print_status(reply)
+    elif args.command == "add":
+        print(json.dumps(reply["project"], indent=2))
+
+
+if __name__ == "__main__":
+    main()
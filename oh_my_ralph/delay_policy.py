@@ -0,0 +1,53 @@
+# What a loop does once consecutive failures reach its threshold
+FAILURE_ACTIONS = ("warn", "stop", "cooldown")
+
+
+class FixedDelay:
+    """Wait the same number of seconds after every iteration."""
+
+    def __init__(self, delay: float = 5, initial_delay: float = 0):
+        self.delay = delay
+        self.initial_delay = initial_delay
+
+    def next_delay(self, success: bool, elapsed: float, consecutive_failures: int) -> float:
+        return self.delay
+
+    def describe(self) -> str:
+        return f"{self.delay}s"
+
+
+class AdaptiveDelay:
+    """Skip the wait after fast successes and back off exponentially on failures.
+
+    A successful iteration that took less than ``fast_threshold`` seconds
+    is followed immediately by the next one; a slower success waits
+    ``base_delay`` as usual. After the n-th failure in a row the loop waits
+    ``base_delay * 2**(n-1)`` seconds, capped at ``max_delay``, with the
+    top ``jitter`` fraction of that wait randomised so several loops
+    hitting the same broken backend do not retry in lockstep.
+    """
+
+    initial_delay = 0
+
+    def __init__(self, base_delay: float = 5, max_delay: float = 300, jitter: float = 0.5, rng=None,
+                 fast_threshold: float = 300):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.fast_threshold = fast_threshold
+        self.jitter = min(max(jitter, 0.0), 1.0)
+        if rng is None:
+            import random
+            rng = random.Random()
+        self._random = rng
+
+    def next_delay(self, success: bool, elapsed: float, consecutive_failures: int) -> float:
+        if success or consecutive_failures <= 0:
+            return 0.0 if elapsed < self.fast_threshold else self.base_delay
+        delay = min(self.max_delay, self.base_delay * 2 ** (consecutive_failures - 1))
+        return delay * (1 - self.jitter * self._random.random())
+
+    def describe(self) -> str:
+        return (
+            f"adaptive (0s after success under {self.fast_threshold}s, "
+            f"backoff from {self.base_delay}s up to {self.max_delay}s)"
+        )
@@ -0,0 +1,41 @@
+import json
+import sys
+from datetime import datetime
+
+from .log_sink import LogSink
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+def child_resource_usage():
+    """CPU time and peak RSS of the waited-for children of this process.
+
+    Returns None where ``resource`` is unavailable. CPU times are
+    cumulative, so callers diff two snapshots; ``max_rss_kb`` is the
+    high-water mark of the largest child so far.
+    """
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    # ru_maxrss is in kilobytes on Linux but in bytes on macOS
+    max_rss_kb = usage.ru_maxrss // 1024 if sys.platform == "darwin" else usage.ru_maxrss
+    return {"user_cpu": usage.ru_utime, "system_cpu": usage.ru_stime, "max_rss_kb": max_rss_kb}
+
+
+class EventLog:
+    """Writes one JSON object per line to a .jsonl file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._sink = LogSink(path)
+
+    def emit(self, event: str, **fields):
+        record = {"event": event, "time": datetime.now().isoformat(timespec="milliseconds")}
+        record.update(fields)
+        self._sink.write(json.dumps(record, ensure_ascii=False, default=str))
+
+    def close(self):
+        self._sink.close()
@@ -0,0 +1,100 @@
+import os
+import subprocess
+
+# What a loop does once `stall_limit` iterations in a row changed nothing
+STALL_ACTIONS = ("stop", "backoff", "switch-model")
+# Inputs the agent reads every iteration, hashed by content
+PLAN_FILES = ("requirements.md", ".ralphy/fix_plan.md", ".ralphy/prompt.md")
+# Never part of the workspace fingerprint: the loop's own bookkeeping
+# changes every iteration whether or not the agent did anything
+IGNORED_PREFIXES = (".ralphy/",)
+# Directories not walked when the workspace is not a git repository
+SKIPPED_DIRS = {".git", ".ralphy", "node_modules", "__pycache__", ".venv", "venv"}
+
+
+def _hash_file(h, path):
+    try:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(block)
+    except OSError:
+        h.update(b"<unreadable>")
+
+
+def _git(root, *args):
+    try:
+        result = subprocess.run(["git", *args], cwd=root, capture_output=True)
+    except OSError:  # git not installed
+        return None
+    if result.returncode != 0:
+        return None
+    return result.stdout
+
+
+def _git_state(root, h, ignored) -> bool:
+    """Hash HEAD, the index/worktree status and the content of every dirty file.
+
+    Dirty files are hashed by content because editing an already modified
+    file does not change its status line. Only changes under ``root`` count,
+    which may be a subdirectory of the repository; ``ignored`` is matched
+    against paths relative to ``root``. Returns False outside a git
+    repository.
+    """
+    location = _git(root, "rev-parse", "--show-toplevel", "--show-prefix")
+    # Paths in git status are relative to the top level, not to root
+    status = _git(root, "status", "--porcelain=v1", "-z", "--untracked-files=all", "--", ".")
+    if location is None or status is None:
+        return False
+    top, prefix = (location.decode("utf-8", errors="surrogateescape").split("\n") + [""])[:2]
+    head = _git(root, "rev-parse", "HEAD")
+    h.update(head or b"<no commits>")
+    entries = status.split(b"\0")
+    index = 0
+    while index < len(entries):
+        entry = entries[index]
+        index += 1
+        if len(entry) < 4:
+            continue
+        code, path = entry[:2], entry[3:].decode("utf-8", errors="surrogateescape")
+        if code[:1] in (b"R", b"C"):
+            index += 1  # skip the rename/copy source
+        if path.startswith(prefix) and path[len(prefix):].startswith(ignored):
+            continue
+        h.update(entry + b"\0")
+        _hash_file(h, os.path.join(top, path))
+    return True
+
+
+def _mtime_state(root, h, ignored):
+    """Hash the path, size and mtime of every file under root."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if d not in SKIPPED_DIRS)
+        for name in sorted(filenames):
+            path = os.path.join(dirpath, name)
+            rel = os.path.relpath(path, root).replace(os.sep, "/")
+            if rel.startswith(ignored):
+                continue
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            h.update(f"{rel}\0{st.st_size}\0{st.st_mtime_ns}\n".encode("utf-8", errors="surrogateescape"))
+
+
+def workspace_fingerprint(root, ignore=()) -> str:
+    """A cheap digest of everything an iteration could have changed.
+
+    Covers git HEAD plus uncommitted changes (or file sizes and mtimes
+    outside a git repository) and the content of requirements.md and the
+    .ralphy plan and prompt. Paths under ``.ralphy/`` and the relative
+    paths in ``ignore`` (e.g. the log file) are left out.
+    """
+    ignored = IGNORED_PREFIXES + tuple(ignore)
+    import hashlib
+    h = hashlib.sha1()
+    if not _git_state(root, h, ignored):
+        _mtime_state(root, h, ignored)
+    for name in PLAN_FILES:
+        h.update(f"\0{name}\0".encode("utf-8"))
+        _hash_file(h, os.path.join(root, name))
+    return h.hexdigest()
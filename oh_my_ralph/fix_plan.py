@@ -0,0 +1,318 @@
+import hashlib
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from .atomic_file import atomic_write
+
+PRIORITY_EMOJIS = {"🔴": 0, "🟠": 1, "🟡": 2, "🟢": 3}
+PRIORITY_NAMES = {0: "critical", 1: "high", 2: "medium", 3: "low"}
+
+TODO = "todo"
+IN_PROGRESS = "in_progress"
+DONE = "done"
+
+_LIST_ITEM = re.compile(r"^(\s*)(?:[-*+]|\d+[.)])\s+(.*)$")
+_CHECKBOX = re.compile(r"^\[( |x|X)\]\s*")
+
+
+def _section_status(heading: str):
+    heading = heading.lower()
+    if "to do" in heading or "todo" in heading:
+        return TODO
+    if "in progress" in heading:
+        return IN_PROGRESS
+    if "completed" in heading or "done" in heading:
+        return DONE
+    return None
+
+
+def _task_id(text: str) -> str:
+    normalized = text
+    for emoji in PRIORITY_EMOJIS:
+        normalized = normalized.replace(emoji, "")
+    normalized = " ".join(normalized.lower().split())
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:12]
+
+
+@dataclass
+class Task:
+    """One top-level list item from fix_plan.md."""
+
+    id: str
+    text: str
+    status: str
+    priority: int = None  # 0 = critical ... 3 = low, None = unknown
+    line: int = 0
+    details: list = field(default_factory=list)
+
+    @property
+    def is_open(self) -> bool:
+        return self.status != DONE
+
+    def describe(self) -> str:
+        label = PRIORITY_NAMES.get(self.priority)
+        head = f"[{label}] {self.text}" if label else self.text
+        return "\n".join([head] + self.details)
+
+
+def parse_fix_plan(text: str) -> list:
+    """Turn fix_plan.md into Tasks.
+
+    Items are the top-level list entries under the "To Do", "In Progress"
+    and "Completed" sections; priority comes from the 🔴/🟠/🟡/🟢 sub-headings
+    or an emoji in the item itself, and ``[x]`` marks an item done anywhere.
+    Indented lines are kept as details of the item above them. Other
+    sections (bugs, notes, blocked items) are ignored.
+    """
+    tasks = []
+    status = None
+    priority = None
+    current = None
+    in_comment = False
+    for number, raw in enumerate(text.splitlines(), start=1):
+        stripped = raw.strip()
+        if in_comment:
+            if "-->" in stripped:
+                in_comment = False
+            continue
+        if stripped.startswith("<!--"):
+            in_comment = "-->" not in stripped
+            continue
+        if stripped.startswith("## "):
+            status = _section_status(stripped[3:])
+            priority = None
+            current = None
+            continue
+        if stripped.startswith("### "):
+            priority = next((rank for emoji, rank in PRIORITY_EMOJIS.items() if emoji in stripped), None)
+            current = None
+            continue
+        if status is None:
+            continue
+        match = _LIST_ITEM.match(raw)
+        if match and not match.group(1):
+            body = match.group(2).strip()
+            item_status = status
+            checkbox = _CHECKBOX.match(body)
+            if checkbox:
+                if checkbox.group(1).lower() == "x":
+                    item_status = DONE
+                body = body[checkbox.end():]
+            if not body:
+                continue
+            item_priority = next((rank for emoji, rank in PRIORITY_EMOJIS.items() if emoji in body), priority)
+            current = Task(
+                id=_task_id(body),
+                text=body,
+                status=item_status,
+                priority=item_priority,
+                line=number,
+            )
+            tasks.append(current)
+        elif current is not None and stripped and raw[:1].isspace():
+            current.details.append(raw.rstrip())
+        elif not stripped:
+            continue
+        else:
+            current = None
+    return tasks
+
+
+class TaskIndex:
+    """In-memory index of fix_plan.md, re-parsed only when the file changes."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.tasks = []
+        self._signature = None
+        self._lock = threading.Lock()
+
+    def refresh(self) -> bool:
+        """Re-parse the plan if its mtime or size changed. Returns True if it did."""
+        try:
+            stat = os.stat(self.path)
+            signature = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            signature = None
+        with self._lock:
+            if signature == self._signature:
+                return False
+            self._signature = signature
+            if signature is None:
+                self.tasks = []
+            else:
+                self.tasks = parse_fix_plan(self.path.read_text(encoding="utf-8"))
+            return True
+
+    def open_tasks(self) -> list:
+        """Open tasks, most urgent first: in-progress items, then by priority."""
+        self.refresh()
+        ranked = [task for task in self.tasks if task.is_open]
+        return sorted(
+            ranked,
+            key=lambda task: (
+                task.status != IN_PROGRESS,
+                task.priority if task.priority is not None else len(PRIORITY_EMOJIS),
+                task.line,
+            ),
+        )
+
+    def is_open(self, task_id: str) -> bool:
+        return any(task.id == task_id for task in self.open_tasks())
+
+    def find(self, task_id: str):
+        """The task with ``task_id`` as the plan lists it now, or None."""
+        self.refresh()
+        return next((task for task in self.tasks if task.id == task_id), None)
+
+
+class TaskScheduler:
+    """Hands out one open fix_plan task per iteration.
+
+    A task claimed by one worker is not handed to another until it is
+    finished, and tasks reported completed are never handed out again in
+    this run, even while the plan file still lists them.
+    """
+
+    def __init__(self, index: TaskIndex):
+        self.index = index
+        self._claims = {}  # worker id -> Task
+        self._completed = set()
+        self._lock = threading.Lock()
+
+    def describe(self) -> str:
+        return str(self.index.path)
+
+    def claim(self, worker_id: str):
+        with self._lock:
+            taken = {task.id for owner, task in self._claims.items() if owner != worker_id}
+            for task in self.index.open_tasks():
+                if task.id in taken or task.id in self._completed:
+                    continue
+                self._claims[worker_id] = task
+                return task
+            self._claims.pop(worker_id, None)
+            return None
+
+    def finish(self, worker_id: str, completed: bool):
+        with self._lock:
+            task = self._claims.pop(worker_id, None)
+            if task is not None and completed:
+                self._completed.add(task.id)
+            return task
+
+
+ARCHIVE_SUMMARY = "_{count} completed item{s} archived in `{name}`. Read it only when you need the history._"
+_SUMMARY_LINE = re.compile(r"^_(\d+) completed items? archived in `[^`]*`\..*_\s*$")
+
+
+def _item_end(lines: list, start: int) -> int:
+    """Index just past the list item at ``lines[start]`` and its indented details."""
+    end = start + 1
+    for index in range(start + 1, len(lines)):
+        raw = lines[index]
+        if not raw.strip():
+            continue
+        if not raw[:1].isspace():
+            break
+        end = index + 1
+    return end
+
+
+def archive_tasks(plan_path, archive_path, task_ids, heading: str) -> int:
+    """Move the completed items in ``task_ids`` from the plan to the archive.
+
+    The items, with their details, are appended to the archive under
+    ``heading``; the plan keeps a one-line count of archived items (after
+    the "Completed" heading, or at the end). Returns how many items moved.
+
+    Both files are replaced atomically, the archive first. If the plan
+    cannot be written after that, the next call finds the items already
+    in the archive and only removes them from the plan, so nothing is
+    archived twice or lost.
+    """
+    plan_path, archive_path = Path(plan_path), Path(archive_path)
+    text = plan_path.read_text(encoding="utf-8")
+    lines = text.splitlines(keepends=True)
+    spans = [
+        (task.line - 1, _item_end(lines, task.line - 1))
+        for task in parse_fix_plan(text)
+        if task.id in task_ids and task.status == DONE
+    ]
+    if not spans:
+        return 0
+    try:
+        archive = archive_path.read_text(encoding="utf-8")
+    except FileNotFoundError:
+        archive = ""
+    moved = []
+    for start, end in sorted(spans, reverse=True):
+        item = "".join(line if line.endswith("\n") else line + "\n" for line in lines[start:end])
+        if item not in archive:
+            moved.insert(0, item)
+        del lines[start:end]
+    archived = len(spans)
+    summary_at = next((i for i, line in enumerate(lines) if _SUMMARY_LINE.match(line)), None)
+    if summary_at is not None:
+        archived += int(_SUMMARY_LINE.match(lines[summary_at]).group(1))
+        del lines[summary_at]
+    else:
+        summary_at = next(
+            (i + 1 for i, line in enumerate(lines)
+             if line.startswith("## ") and _section_status(line[3:]) == DONE),
+            None,
+        )
+        if summary_at is None:
+            if lines and not lines[-1].endswith("\n"):
+                lines[-1] += "\n"
+            lines.append("\n")
+            summary_at = len(lines)
+        else:
+            lines.insert(summary_at, "\n")
+            summary_at += 1
+    summary = ARCHIVE_SUMMARY.format(count=archived, s="" if archived == 1 else "s", name=archive_path.name)
+    lines.insert(summary_at, summary + "\n")
+    if moved:
+        if not archive:
+            archive = "# Fix Plan Archive\n\nCompleted items moved out of fix_plan.md.\n"
+        with atomic_write(archive_path, "w", encoding="utf-8") as f:
+            f.write(archive + f"\n## {heading}\n\n" + "".join(moved))
+    with atomic_write(plan_path, "w", encoding="utf-8") as f:
+        f.write("".join(lines))
+    return len(spans)
+
+
+class PlanArchiver:
+    """Moves items that have been complete for ``after`` iterations out of fix_plan.md.
+
+    An item counts as complete from the first compaction that sees it done,
+    so ``completed_at`` (task id -> iteration) has to survive restarts for
+    the count to carry on; a reopened item starts over.
+    """
+
+    def __init__(self, plan_path, archive_path, after: int):
+        self.plan_path = Path(plan_path)
+        self.archive_path = Path(archive_path)
+        self.after = after
+        self.completed_at = {}
+
+    def compact(self, iteration: int) -> int:
+        """Archive the items that are due after ``iteration``. Returns how many moved."""
+        try:
+            tasks = parse_fix_plan(self.plan_path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return 0
+        done = {task.id for task in tasks if task.status == DONE}
+        self.completed_at = {task_id: self.completed_at.get(task_id, iteration) for task_id in done}
+        due = {task_id for task_id, since in self.completed_at.items() if iteration - since >= self.after}
+        if not due:
+            return 0
+        from datetime import datetime
+        heading = f"Archived after iteration {iteration} ({datetime.now().strftime('%Y-%m-%d %H:%M')})"
+        moved = archive_tasks(self.plan_path, self.archive_path, due, heading)
+        for task_id in due:
+            self.completed_at.pop(task_id, None)
+        return moved
@@ -0,0 +1,94 @@
+import os
+import shutil
+import subprocess
+import tempfile
+
+
+def git(cwd, *args, env=None, input=None) -> str:
+    """Run git in ``cwd`` and return its stripped stdout; raises CalledProcessError on failure."""
+    result = subprocess.run(
+        ["git", *args], cwd=cwd, env=env, input=input, capture_output=True, text=True, check=True
+    )
+    return result.stdout.strip()
+
+
+def pathspec(exclude) -> list[str]:
+    """``-- . :(exclude)...``: everything but the paths matching ``exclude``."""
+    return ["--", "."] + [f":(exclude){pattern}" for pattern in exclude]
+
+
+def loop_excludes(loop) -> tuple:
+    """Paths of the loop's own files, which stay out of snapshots: .ralphy and the log."""
+    return (".ralphy",) + tuple(f"{path}*" for path in loop._fingerprint_ignore)
+
+
+def find_repo(work_dir) -> tuple[str, str]:
+    """(top level, prefix of ``work_dir``) of the repository holding ``work_dir``.
+
+    Raises CalledProcessError when there is none or it has no commit yet.
+    """
+    top = git(work_dir, "rev-parse", "--show-toplevel")
+    prefix = git(work_dir, "rev-parse", "--show-prefix")
+    git(top, "rev-parse", "--verify", "HEAD")
+    return top, prefix
+
+
+def check_repo(loop, message: str):
+    """``find_repo`` for the loop's working dir, or False after logging
+    ``message`` with the reason."""
+    try:
+        return find_repo(loop._workspace_root)
+    except (subprocess.CalledProcessError, OSError) as e:
+        details = getattr(e, "stderr", None) or e
+        loop._log(f"{message} ({details})")
+        return False
+
+
+def snapshot_tree(work_dir, exclude=()) -> str:
+    """The id of a git tree holding ``work_dir`` as ``git add -A`` would see it.
+
+    The repository's index and HEAD are left alone: the files are added to
+    a copy of the index, so only files changed since the last ``git add``
+    are hashed again. Paths matching ``exclude`` keep their indexed state.
+    """
+    index = git(work_dir, "rev-parse", "--git-path", "index")
+    index = os.path.join(work_dir, index)
+    fd, temp_index = tempfile.mkstemp(prefix="ralph-index-")
+    os.close(fd)
+    try:
+        if os.path.exists(index):
+            shutil.copyfile(index, temp_index)
+        else:
+            os.remove(temp_index)  # git refuses an empty index file
+        env = dict(os.environ, GIT_INDEX_FILE=temp_index)
+        # git add fails on an exclusion naming an ignored path; it skips those anyway
+        ignored = subprocess.run(
+            ["git", "check-ignore", "--", *(pattern.rstrip("*") for pattern in exclude)],
+            cwd=work_dir, capture_output=True, text=True,
+        ).stdout.split()
+        exclude = [pattern for pattern in exclude if pattern.rstrip("*") not in ignored]
+        git(work_dir, "add", "-A", *pathspec(exclude), env=env)
+        return git(work_dir, "write-tree", env=env)
+    finally:
+        if os.path.exists(temp_index):
+            os.remove(temp_index)
+
+
+def commit_snapshot(work_dir, tree: str, message: str) -> str:
+    """A throwaway commit of ``tree`` on top of HEAD, to check a snapshot out from.
+
+    No ref points at it, so git collects it again in time.
+    """
+    env = dict(os.environ, GIT_AUTHOR_NAME="oh-my-ralph", GIT_AUTHOR_EMAIL="ralph@localhost",
+               GIT_COMMITTER_NAME="oh-my-ralph", GIT_COMMITTER_EMAIL="ralph@localhost")
+    return git(work_dir, "commit-tree", tree, "-p", "HEAD", "-m", message, env=env)
+
+
+def create_detached_worktree(repo_dir: str, path: str):
+    """Create a detached git worktree at ``path``; an existing one is reused."""
+    if os.path.exists(os.path.join(path, ".git")):
+        return
+    subprocess.run(
+        ["git", "worktree", "add", "--detach", path, "HEAD"],
+        cwd=repo_dir, check=True, capture_output=True, text=True,
+    )
@@ -0,0 +1,433 @@
+import math
+import os
+import queue
+import shutil
+import subprocess
+import threading
+import time
+from pathlib import Path
+
+from .git_workspace import check_repo, commit_snapshot, create_detached_worktree, git, loop_excludes, pathspec, snapshot_tree
+from .process_group import kill_process_tree
+
+# Separates the agent command from the model in a hedge spec
+SPEC_SEPARATOR = "::"
+# Wins an agent/model needs before the hedge delay follows its latencies
+HEDGE_MIN_SAMPLES = 5
+# Latencies kept per agent/model
+HEDGE_HISTORY = 50
+# .ralphy files copied into a backup's worktree before it starts
+RALPHY_INPUTS = ("prompt.md", "agent.md", "fix_plan.md", "iteration_prompt.md")
+# The ones an agent updates, copied back from a backup that wins
+RALPHY_OUTPUTS = ("agent.md", "fix_plan.md")
+
+WON = "won"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+def parse_hedge_spec(spec: str, default_agent: str) -> tuple[str, str]:
+    """``AGENT::MODEL`` -> (agent, model).
+
+    A spec without ``::`` is a model for the loop's own agent; ``AGENT::``
+    runs another agent with its default model.
+    """
+    if SPEC_SEPARATOR not in spec:
+        return default_agent, spec.strip() or None
+    agent, _, model = spec.partition(SPEC_SEPARATOR)
+    return agent.strip() or default_agent, model.strip() or None
+
+
+def spec_label(agent: str, model: str = None) -> str:
+    return f"{agent}{SPEC_SEPARATOR}{model}" if model else agent
+
+
+class HedgeStats:
+    """Runs, wins and winning latencies per agent/model, kept across runs in a JSON file."""
+
+    def __init__(self, path):
+        from .state import load_state
+        self.path = Path(path)
+        self.entries = {}
+        try:
+            state = load_state(self.path)
+        except ValueError:
+            state = None
+        if state is not None:
+            self.entries = state.get("racers", {})
+
+    def _entry(self, label: str) -> dict:
+        return self.entries.setdefault(label, {"runs": 0, "wins": 0, "failures": 0, "cancelled": 0, "latencies": []})
+
+    def record(self, label: str, outcome: str, elapsed: float):
+        entry = self._entry(label)
+        entry["runs"] += 1
+        if outcome == WON:
+            entry["wins"] += 1
+            entry["latencies"].append(round(elapsed, 3))
+            del entry["latencies"][:-HEDGE_HISTORY]
+        elif outcome == FAILED:
+            entry["failures"] += 1
+        else:
+            entry["cancelled"] += 1
+
+    def percentile(self, label: str, pct: float):
+        """The ``pct``-th percentile of ``label``'s winning latencies, or None
+        until it has HEDGE_MIN_SAMPLES of them."""
+        latencies = sorted(self.entries.get(label, {}).get("latencies", []))
+        if len(latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        rank = min(max(math.ceil(pct / 100 * len(latencies)) - 1, 0), len(latencies) - 1)
+        return latencies[rank]
+
+    def describe(self, label: str) -> str:
+        entry = self._entry(label)
+        text = f"{label}: won {entry['wins']}/{entry['runs']}"
+        if entry["runs"]:
+            text += f" ({entry['wins'] / entry['runs']:.0%})"
+        for pct in (50, 90):
+            latencies = sorted(entry["latencies"])
+            if latencies:
+                rank = min(max(math.ceil(pct / 100 * len(latencies)) - 1, 0), len(latencies) - 1)
+                text += f", p{pct} {latencies[rank]:.0f}s"
+        return text
+
+    def save(self):
+        from .state import save_state
+        save_state(self.path, {"racers": self.entries})
+
+
+class _Attempt:
+    """One agent run in a race: the loop's own, or a backup in a worktree."""
+
+    def __init__(self, label: str, loop, backup: int = None):
+        self.label = label
+        self.loop = loop
+        self.backup = backup
+        self.started = time.monotonic()
+        self.elapsed = None
+        self.result = None
+        self.cancelled = False
+        self.thread = None
+
+
+class Hedger:
+    """Races backup agents or models against a RalphLoop's own agent.
+
+    Each iteration the loop's agent starts as usual in the working dir.
+    If it has not finished after the hedge delay, the first backup starts
+    in its own git worktree, which is first set to the exact state the
+    working dir had when the iteration began (committed or not); each
+    further backup starts one more delay later, and a backup also starts
+    straight away once everything running has failed. The first agent to
+    exit with code 0 wins and the others are killed. A winning backup's
+    commits and uncommitted changes are carried over to the working dir,
+    replacing whatever the loop's own agent had done, along with its
+    agent.md and fix_plan.md.
+
+    The hedge delay is ``delay`` seconds until the loop's own agent/model
+    has won HEDGE_MIN_SAMPLES times, and then the ``percentile``-th
+    percentile of those winning latencies (0 keeps ``delay``). Wins,
+    failures and latencies per agent/model are kept in
+    ``.ralphy/hedge_stats.json``. Backups never continue a session and
+    run opencode without the shared web server, which serves the working
+    dir only.
+    """
+
+    def __init__(self, loop, backups: list[str], delay: float = 300, percentile: float = 90, worktree_root=None):
+        self.loop = loop
+        self.backups = [parse_hedge_spec(spec, loop.agent_command) for spec in backups]
+        self.delay = delay
+        self.percentile = percentile
+        self.worktree_root = Path(
+            worktree_root if worktree_root else f"{loop._workspace_root.rstrip(os.sep)}-hedge"
+        ).resolve()
+        self.stats = HedgeStats(os.path.join(loop.ralphy_dir, "hedge_stats.json"))
+        # The loop's own files stay out of snapshots and carried-over changes
+        self.exclude = loop_excludes(loop)
+        self.last_race = None
+        self._racers = {}  # backup index -> RalphLoop in its worktree
+        self._attempts = []
+        self._cancelled = False
+        self._repo = None  # (top level, prefix of the working dir), once checked
+
+    def describe(self) -> str:
+        backups = ", ".join(spec_label(agent, model) for agent, model in self.backups)
+        timing = f"after {self.delay:.0f}s"
+        if self.percentile > 0:
+            timing += f", then at the p{self.percentile:g} latency of {self._primary_label()}"
+        return f"{backups} ({timing})"
+
+    def _primary_label(self) -> str:
+        return spec_label(self.loop.agent_command, self.loop.model)
+
+    def hedge_delay(self) -> float:
+        if self.percentile > 0:
+            latency = self.stats.percentile(self._primary_label(), self.percentile)
+            if latency is not None:
+                return latency
+        return self.delay
+
+    def _check_repo(self) -> bool:
+        if self._repo is None:
+            self._repo = check_repo(
+                self.loop, "Hedging needs a git repository with at least one commit; running without it"
+            )
+        return bool(self._repo)
+
+    def _racer(self, index: int):
+        """The RalphLoop that runs backup ``index`` in its worktree, created on first use."""
+        if index in self._racers:
+            return self._racers[index]
+        from .ralph_loop import RalphLoop
+        top, prefix = self._repo
+        worktree = self.worktree_root / f"hedge-{index + 1}"
+        self.worktree_root.mkdir(parents=True, exist_ok=True)
+        create_detached_worktree(top, str(worktree))
+        agent, model = self.backups[index]
+        loop = self.loop
+        racer = RalphLoop(
+            agent_command=agent,
+            model=model,
+            working_dir=os.path.join(str(worktree), prefix),
+            log_file=loop.log_file.name,
+            opencode_port=None,
+            stream_output=loop.stream_output,
+            stop_on_done=loop.stop_on_done,
+            keep_transcripts=loop.keep_transcripts,
+            install_signal_handlers=False,
+            log_prefix=f"{loop.log_prefix}[hedge-{index + 1}] ",
+            record_events=False,
+            track_usage=loop.track_usage,
+            usage_regex=loop.usage_regex,
+        )
+        # Log to the loop's own file rather than into the worktree
+        racer._log_sink = loop._log_sink
+        self._racers[index] = racer
+        return racer
+
+    def _read_inputs(self) -> dict:
+        inputs = {}
+        for name in RALPHY_INPUTS:
+            path = os.path.join(self.loop.ralphy_dir, name)
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    inputs[name] = f.read()
+        return inputs
+
+    def _prepare_backup(self, racer, base: str, snapshot: str, inputs: dict):
+        """Set the worktree to the working dir's state at the start of the iteration."""
+        top = git(racer._agent_cwd, "rev-parse", "--show-toplevel")
+        git(top, "reset", "-q", "--hard", snapshot)
+        git(top, "clean", "-fdq", "-e", ".ralphy")
+        # Back on the working dir's commit, with its changes unstaged and new
+        # files untracked
+        git(top, "reset", "-q", base)
+        os.makedirs(racer.ralphy_dir, exist_ok=True)
+        for name in RALPHY_INPUTS:
+            path = os.path.join(racer.ralphy_dir, name)
+            if name in inputs:
+                with open(path, "wb") as f:
+                    f.write(inputs[name])
+            elif os.path.exists(path):
+                os.remove(path)
+
+    def _reset_racer(self, racer, timeout: float):
+        """Per-iteration state RalphLoop._begin_iteration would set."""
+        loop = self.loop
+        racer.iteration = loop.iteration
+        racer.iteration_timeout = timeout
+        racer.current_prompt_file = Path(racer.ralphy_dir) / loop.current_prompt_file.name
+        racer.continuing_session = False
+        racer._last_marker_seen = False
+        racer._agent_stats = {}
+        racer._usage_meter = None
+        if racer.track_usage:
+            from .usage import UsageMeter
+            racer._usage_meter = UsageMeter(
+                racer.usage_regex, marker=racer.agent.completion_marker if racer._json_output else None
+            )
+
+    def _start(self, attempt: _Attempt, prompt: str, done: queue.Queue, prepare=None):
+        def run():
+            try:
+                if prepare is not None:
+                    prepare()
+                if attempt.cancelled:
+                    attempt.result = (-1, "", "Cancelled before it started")
+                else:
+                    attempt.result = attempt.loop._spawn_agent(prompt)
+            except Exception as e:
+                details = getattr(e, "stderr", None) or e
+                attempt.result = (-1, "", f"Could not start {attempt.label}: {details}")
+            finally:
+                attempt.elapsed = time.monotonic() - attempt.started
+                done.put(attempt)
+
+        attempt.thread = threading.Thread(target=run, name=f"ralph-hedge-{attempt.label}", daemon=True)
+        self._attempts.append(attempt)
+        attempt.thread.start()
+
+    def _launch_backup(self, index: int, prompt: str, done: queue.Queue, base: str, snapshot: str, inputs: dict,
+                       timeout: float) -> _Attempt:
+        racer = self._racer(index)
+        self._reset_racer(racer, timeout)
+        attempt = _Attempt(spec_label(*self.backups[index]), racer, backup=index)
+        self.loop._log(f"Starting backup {attempt.label} in {racer._agent_cwd}")
+        self._start(attempt, prompt, done, prepare=lambda: self._prepare_backup(racer, base, snapshot, inputs))
+        return attempt
+
+    def cancel(self, signum=None):
+        """Stop the race: no more backups start, and running ones are killed."""
+        self._cancelled = True
+        for attempt in list(self._attempts):
+            if attempt.backup is not None:
+                attempt.cancelled = True
+                if attempt.loop._agent_proc is not None:
+                    kill_process_tree(attempt.loop._agent_proc)
+
+    def _stop(self, attempts: list, winner):
+        for attempt in attempts:
+            if attempt is winner or attempt.result is not None:
+                continue
+            attempt.cancelled = True
+            # Kill until the thread is gone, in case the agent starts meanwhile
+            while attempt.thread.is_alive():
+                if attempt.loop._agent_proc is not None:
+                    kill_process_tree(attempt.loop._agent_proc)
+                attempt.thread.join(timeout=0.1)
+
+    def run(self, prompt: str) -> tuple[int, str, str]:
+        """Run one iteration's agent with hedging; returns what RalphLoop._spawn_agent would."""
+        loop = self.loop
+        self.last_race = None
+        if not self._check_repo():
+            return loop._spawn_agent(prompt)
+        try:
+            base = git(loop._workspace_root, "rev-parse", "HEAD")
+            tree = snapshot_tree(loop._workspace_root, self.exclude)
+            snapshot = commit_snapshot(loop._workspace_root, tree, "ralph hedge snapshot")
+            inputs = self._read_inputs()
+        except (subprocess.CalledProcessError, OSError) as e:
+            details = getattr(e, "stderr", None) or e
+            loop._log(f"Could not snapshot the workspace for hedging; running without backups ({details})")
+            return loop._spawn_agent(prompt)
+        self._cancelled = False
+        self._attempts = []
+        delay = self.hedge_delay()
+        deadline = time.monotonic() + loop._agent_timeout()
+        done = queue.Queue()
+        primary = _Attempt(self._primary_label(), loop)
+        self._start(primary, prompt, done)
+        attempts = [primary]
+        pending = list(range(len(self.backups)))
+        running = 1
+        winner = None
+
+        def launch_next():
+            attempts.append(self._launch_backup(
+                pending.pop(0), prompt, done, base, snapshot, inputs, max(deadline - time.monotonic(), 0)
+            ))
+
+        while running:
+            can_launch = pending and not self._cancelled and deadline > time.monotonic()
+            wait = 0.5
+            if can_launch:
+                # Backup k starts k hedge delays after the iteration began
+                wait = min(primary.started + delay * len(attempts) - time.monotonic(), wait)
+                if wait <= 0:
+                    launch_next()
+                    running += 1
+                    continue
+            try:
+                attempt = done.get(timeout=wait)
+            except queue.Empty:
+                continue
+            running -= 1
+            if attempt.result[0] == 0 and not attempt.cancelled:
+                winner = attempt
+                break
+            loop._log(f"{attempt.label} failed after {attempt.elapsed:.1f}s with return code {attempt.result[0]}")
+            if not running and can_launch:
+                loop._log("Every attempt so far has failed; starting the next backup now.")
+                launch_next()
+                running += 1
+        self._stop(attempts, winner)
+        return self._finish_race(attempts, winner, delay)
+
+    def _finish_race(self, attempts: list, winner, delay: float) -> tuple[int, str, str]:
+        loop = self.loop
+        outcomes = []
+        for attempt in attempts:
+            if attempt is winner:
+                outcome = WON
+            elif attempt.cancelled or attempt.result[0] == 0:
+                outcome = CANCELLED
+            else:
+                outcome = FAILED
+            self.stats.record(attempt.label, outcome, attempt.elapsed)
+            outcomes.append({
+                "label": attempt.label,
+                "outcome": outcome,
+                "exit_code": attempt.result[0],
+                "wall_time_s": round(attempt.elapsed, 3),
+            })
+        self.last_race = {"delay_s": round(delay, 3), "winner": winner.label if winner else None, "attempts": outcomes}
+        result = attempts[0].result
+        own_meter = loop._usage_meter
+        if winner is not None and winner.backup is not None:
+            loop._log(f"Backup {winner.label} won after {winner.elapsed:.1f}s; taking over its changes.")
+            try:
+                self._adopt(winner.loop)
+                result = winner.result
+            except (subprocess.CalledProcessError, OSError) as e:
+                details = getattr(e, "stderr", None) or e
+                loop._log(f"Could not carry over the changes of {winner.label}: {details}")
+                result = (-1, winner.result[1], f"Could not carry over the changes of {winner.label}: {details}")
+            loop._last_marker_seen = winner.loop._last_marker_seen
+            loop._agent_stats = winner.loop._agent_stats
+            if winner.loop._usage_meter is not None:
+                loop._usage_meter = winner.loop._usage_meter
+        elif len(attempts) > 1 and winner is not None:
+            loop._log(f"{winner.label} won after {winner.elapsed:.1f}s; discarding the backups.")
+        # Losing runs were paid for too
+        if loop._usage_meter is not None:
+            for meter in [own_meter] + [attempt.loop._usage_meter for attempt in attempts[1:]]:
+                if meter is not None and meter is not loop._usage_meter:
+                    meter.close()
+                    if meter.reported:
+                        loop._usage_meter.add(meter.usage())
+        try:
+            self.stats.save()
+        except OSError as e:
+            loop._log(f"Could not save hedging stats to {self.stats.path}: {e}")
+        for attempt in attempts:
+            loop._log(f"Hedging stats: {self.stats.describe(attempt.label)}")
+        return result
+
+    def _adopt(self, racer):
+        """Make the working dir match a winning backup's worktree.
+
+        Its uncommitted changes are applied as a patch against what the
+        loop's own agent left behind, and its commits by moving the working
+        dir's branch to them, so only the loop's own files are left as
+        they are.
+        """
+        work_dir = self.loop._workspace_root
+        top = self._repo[0]
+        ours = snapshot_tree(work_dir, self.exclude)
+        theirs = snapshot_tree(racer._agent_cwd, self.exclude)
+        patch = subprocess.run(
+            ["git", "diff", "--binary", ours, theirs, *pathspec(self.exclude)],
+            cwd=work_dir, capture_output=True, check=True,
+        ).stdout
+        if patch:
+            subprocess.run(["git", "apply", "--whitespace=nowarn", "-"], cwd=top, input=patch,
+                           capture_output=True, check=True)
+        head = git(racer._agent_cwd, "rev-parse", "HEAD")
+        if head != git(work_dir, "rev-parse", "HEAD"):
+            git(top, "reset", "-q", head)
+        for name in RALPHY_OUTPUTS:
+            source = os.path.join(racer.ralphy_dir, name)
+            if os.path.exists(source):
+                shutil.copyfile(source, os.path.join(self.loop.ralphy_dir, name))
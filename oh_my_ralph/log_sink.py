@@ -0,0 +1,116 @@
+import gzip
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+
+
+class LogSink:
+    """Append-only log file that stays open between writes.
+
+    With ``flush_interval`` > 0, lines are buffered and a background thread
+    flushes them every ``flush_interval`` seconds (and ``flush``/``close``
+    flush at once); with 0 every line is flushed as it is written. The file
+    is rotated to ``<name>.1`` ... ``<name>.<backups>`` once it grows past
+    ``max_bytes`` or its segment is older than ``max_age`` seconds (0
+    disables either check), gzipping rotated segments when ``compress`` is
+    set. Safe to share between threads.
+    """
+
+    def __init__(
+        self,
+        path,
+        flush_interval: float = 0.0,
+        max_bytes: int = 0,
+        max_age: float = 0,
+        backups: int = 5,
+        compress: bool = False,
+    ):
+        self.path = Path(path)
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.backups = backups
+        self.compress = compress
+        self._file = None
+        self._size = 0
+        self._opened_at = 0.0
+        self._dirty = False
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._flusher = None
+
+    def _open(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._size = self._file.tell()
+        self._opened_at = time.time()
+        if self.flush_interval > 0 and (self._flusher is None or not self._flusher.is_alive()):
+            self._stop.clear()
+            self._flusher = threading.Thread(target=self._flush_periodically, name="ralph-log-flush", daemon=True)
+            self._flusher.start()
+
+    def _flush_periodically(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def _needs_rotation(self, incoming: int) -> bool:
+        if self.max_bytes > 0 and self._size > 0 and self._size + incoming > self.max_bytes:
+            return True
+        return self.max_age > 0 and time.time() - self._opened_at >= self.max_age
+
+    def _segment(self, number: int) -> Path:
+        suffix = f".{number}.gz" if self.compress else f".{number}"
+        return self.path.with_name(self.path.name + suffix)
+
+    def _rotate(self):
+        self._file.close()
+        self._file = None
+        if self.backups <= 0:
+            os.remove(self.path)
+            return
+        oldest = self._segment(self.backups)
+        if oldest.exists():
+            oldest.unlink()
+        for number in range(self.backups - 1, 0, -1):
+            segment = self._segment(number)
+            if segment.exists():
+                segment.rename(self._segment(number + 1))
+        if self.compress:
+            with open(self.path, "rb") as src, gzip.open(self._segment(1), "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(self.path)
+        else:
+            self.path.rename(self._segment(1))
+
+    def write(self, line: str):
+        data = line + "\n"
+        with self._lock:
+            if self._file is None:
+                self._open()
+            incoming = len(data.encode("utf-8", errors="replace"))
+            if self._needs_rotation(incoming):
+                self._rotate()
+                self._open()
+            self._file.write(data)
+            self._size += incoming
+            if self.flush_interval > 0:
+                self._dirty = True
+            else:
+                self._file.flush()
+
+    def flush(self):
+        with self._lock:
+            if self._file is not None and self._dirty:
+                self._file.flush()
+                self._dirty = False
+
+    def close(self):
+        self._stop.set()
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+                self._file.close()
+                self._file = None
+                self._dirty = False
@@ -0,0 +1,166 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PHASES = ("starting", "running_agent", "waiting", "stopped")
+# Iteration duration histogram buckets, in seconds
+DURATION_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1200, 1800, 3600)
+
+_HELP = {
+    "ralph_iterations_total": ("counter", "Iterations started."),
+    "ralph_iteration_successes_total": ("counter", "Iterations whose agent exited with code 0."),
+    "ralph_iteration_failures_total": ("counter", "Iterations that failed or could not run the agent."),
+    "ralph_consecutive_failures": ("gauge", "Failed iterations in a row."),
+    "ralph_agent_exit_code_total": ("counter", "Agent exit codes seen, by code."),
+    "ralph_iteration_duration_seconds": ("histogram", "Wall time of each iteration's agent run."),
+    "ralph_last_iteration_end_timestamp_seconds": ("gauge", "Unix time the last iteration finished."),
+    "ralph_phase": ("gauge", "1 for the loop's current phase, 0 for the others."),
+    "ralph_opencode_server_up": ("gauge", "1 if the loop's opencode web server process is running."),
+}
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels.items():
+        escaped = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{key}="{escaped}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+class LoopMetrics:
+    """Counters and gauges for one RalphLoop, labelled by worker."""
+
+    def __init__(self, worker: str = "main"):
+        self.labels = {"worker": worker}
+        self.iterations = 0
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.exit_codes = {}
+        self.bucket_counts = [0] * len(DURATION_BUCKETS)
+        self.duration_sum = 0.0
+        self.duration_count = 0
+        self.last_iteration_end = 0.0
+        self.phase = "starting"
+        # Set by the loop; returns whether its opencode server is alive
+        self.server_alive = None
+        self._lock = threading.Lock()
+
+    def set_phase(self, phase: str):
+        with self._lock:
+            self.phase = phase
+
+    def iteration_started(self):
+        with self._lock:
+            self.iterations += 1
+            self.phase = "running_agent"
+
+    def iteration_finished(self, return_code, duration: float):
+        with self._lock:
+            if return_code == 0:
+                self.successes += 1
+            else:
+                self.failures += 1
+            if return_code is not None:
+                self.exit_codes[return_code] = self.exit_codes.get(return_code, 0) + 1
+                for index, bound in enumerate(DURATION_BUCKETS):
+                    if duration <= bound:
+                        self.bucket_counts[index] += 1
+                self.duration_sum += duration
+                self.duration_count += 1
+            self.last_iteration_end = time.time()
+
+    def set_consecutive_failures(self, count: int):
+        with self._lock:
+            self.consecutive_failures = count
+
+    def samples(self):
+        """Yield (metric name, extra labels, value) for every current sample."""
+        with self._lock:
+            yield "ralph_iterations_total", {}, self.iterations
+            yield "ralph_iteration_successes_total", {}, self.successes
+            yield "ralph_iteration_failures_total", {}, self.failures
+            yield "ralph_consecutive_failures", {}, self.consecutive_failures
+            for code, count in sorted(self.exit_codes.items()):
+                yield "ralph_agent_exit_code_total", {"code": code}, count
+            for bound, count in zip(DURATION_BUCKETS, self.bucket_counts):
+                yield "ralph_iteration_duration_seconds_bucket", {"le": bound}, count
+            yield "ralph_iteration_duration_seconds_bucket", {"le": "+Inf"}, self.duration_count
+            yield "ralph_iteration_duration_seconds_sum", {}, round(self.duration_sum, 3)
+            yield "ralph_iteration_duration_seconds_count", {}, self.duration_count
+            yield "ralph_last_iteration_end_timestamp_seconds", {}, round(self.last_iteration_end, 3)
+            for phase in PHASES:
+                yield "ralph_phase", {"phase": phase}, 1 if phase == self.phase else 0
+        if self.server_alive is not None:
+            yield "ralph_opencode_server_up", {}, 1 if self.server_alive() else 0
+
+
+def render(metrics_list) -> str:
+    """Render LoopMetrics in the Prometheus text exposition format."""
+    grouped = {}
+    for metrics in metrics_list:
+        for name, labels, value in metrics.samples():
+            family = name
+            for suffix in ("_bucket", "_sum", "_count"):
+                if name.endswith(suffix) and name[: -len(suffix)] in _HELP:
+                    family = name[: -len(suffix)]
+            line = f"{name}{_format_labels({**metrics.labels, **labels})} {_format_value(value)}"
+            grouped.setdefault(family, []).append(line)
+    out = []
+    for family, lines in grouped.items():
+        kind, help_text = _HELP[family]
+        out.append(f"# HELP {family} {help_text}")
+        out.append(f"# TYPE {family} {kind}")
+        out.extend(lines)
+    return "\n".join(out) + "\n"
+
+
+class MetricsServer:
+    """Serves ``/metrics`` for one or more LoopMetrics from a daemon thread."""
+
+    def __init__(self, port: int, metrics_list, host: str = "127.0.0.1"):
+        self.port = port
+        self.host = host
+        self.metrics_list = metrics_list
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        metrics_list = self.metrics_list
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = render(metrics_list).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="ralph-metrics", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -0,0 +1,52 @@
+import asyncio
+import socket
+import time
+
+# `opencode run --attach` talks to the web server over http://localhost:<port>
+OPENCODE_HOST = "localhost"
+# Seconds between readiness probes
+PROBE_INTERVAL = 0.2
+
+
+def port_open(port: int, host: str = OPENCODE_HOST, timeout: float = 0.5) -> bool:
+    """Return whether something accepts TCP connections on ``host:port``."""
+    try:
+        with socket.create_connection((host, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+def wait_until_listening(port: int, timeout: float, is_alive=None, host: str = OPENCODE_HOST) -> bool:
+    """Poll ``host:port`` until it accepts connections or ``timeout`` expires.
+
+    ``is_alive`` is called between probes; when it returns False the server
+    process has exited and there is no point in waiting any longer.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        if port_open(port, host):
+            return True
+        if is_alive is not None and not is_alive():
+            return False
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(PROBE_INTERVAL)
+
+
+async def wait_until_listening_async(port: int, timeout: float, is_alive=None, host: str = OPENCODE_HOST) -> bool:
+    """asyncio version of wait_until_listening."""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout=0.5)
+            writer.close()
+            await writer.wait_closed()
+            return True
+        except (OSError, asyncio.TimeoutError):
+            pass
+        if is_alive is not None and not is_alive():
+            return False
+        if time.monotonic() >= deadline:
+            return False
+        await asyncio.sleep(PROBE_INTERVAL)
@@ -0,0 +1,89 @@
+from collections import deque
+
+# How much of each stream is kept in memory for previews and marker checks
+HEAD_CHARS = 64 * 1024
+TAIL_CHARS = 64 * 1024
+
+
+class OutputCapture:
+    """Bounded in-memory capture of one agent output stream.
+
+    Only the first ``head_chars`` and last ``tail_chars`` characters are kept,
+    so memory stays flat however much the agent prints. Everything written is
+    also copied to ``transcript`` (an open text file) when one is given,
+    and fed to ``observer`` (e.g. a UsageMeter), whose ``marker_seen``
+    counts as well.
+    """
+
+    def __init__(
+        self,
+        head_chars: int = HEAD_CHARS,
+        tail_chars: int = TAIL_CHARS,
+        marker: str = None,
+        transcript=None,
+        transcript_prefix: str = "",
+        observer=None,
+    ):
+        self.head_chars = head_chars
+        self.tail_chars = tail_chars
+        self.marker = marker
+        self.transcript = transcript
+        self.transcript_prefix = transcript_prefix
+        self.observer = observer
+        self._marker_seen = False
+        self.total_chars = 0
+        self.total_bytes = 0
+        self._head = []
+        self._head_len = 0
+        self._tail = deque()
+        self._tail_len = 0
+        # Last few characters, so a marker split across writes is still found
+        self._carry = ""
+
+    def write(self, text: str):
+        if not text:
+            return
+        self.total_chars += len(text)
+        self.total_bytes += len(text.encode("utf-8", errors="replace"))
+        if self.transcript is not None:
+            self.transcript.write(self.transcript_prefix + text if self.transcript_prefix else text)
+        if self.observer is not None:
+            self.observer.feed(text)
+        if self.marker and not self._marker_seen:
+            window = self._carry + text
+            if self.marker in window:
+                self._marker_seen = True
+            self._carry = window[-(len(self.marker) - 1):] if len(self.marker) > 1 else ""
+        if self._head_len < self.head_chars:
+            take = text[:self.head_chars - self._head_len]
+            self._head.append(take)
+            self._head_len += len(take)
+            text = text[len(take):]
+        if text and self.tail_chars > 0:
+            self._tail.append(text)
+            self._tail_len += len(text)
+            while self._tail_len > self.tail_chars:
+                excess = self._tail_len - self.tail_chars
+                first = self._tail[0]
+                if len(first) <= excess:
+                    self._tail.popleft()
+                    self._tail_len -= len(first)
+                else:
+                    self._tail[0] = first[excess:]
+                    self._tail_len -= excess
+
+    @property
+    def marker_seen(self) -> bool:
+        return self._marker_seen or (self.observer is not None and self.observer.marker_seen)
+
+    @property
+    def truncated(self) -> bool:
+        return self.total_chars > self._head_len + self._tail_len
+
+    def getvalue(self) -> str:
+        head = "".join(self._head)
+        tail = "".join(self._tail)
+        if self.truncated:
+            omitted = self.total_chars - self._head_len - self._tail_len
+            return f"{head}\n... [{omitted} characters omitted] ...\n{tail}"
+        return head + tail
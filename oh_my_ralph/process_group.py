@@ -0,0 +1,70 @@
+import os
+import signal
+import subprocess
+import sys
+
+IS_WINDOWS = sys.platform == "win32"
+
+
+def new_process_group_kwargs() -> dict:
+    """Popen keyword arguments that start the child in its own process group.
+
+    On POSIX the child gets a new session, so its whole tree (the shell, the
+    agent and anything the agent spawns) can be signalled at once with
+    killpg. It also stops a Ctrl+C in the terminal from reaching the agent
+    directly; the loop forwards it instead (see signal_process_tree).
+    """
+    if IS_WINDOWS:
+        return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {"start_new_session": True}
+
+
+def _group_pid(process):
+    # The child leads its own group, so its pid is also the group id
+    pid = getattr(process, "pid", None)
+    return pid if isinstance(pid, int) else None
+
+
+def signal_process_tree(process, signum) -> bool:
+    """Send ``signum`` to every process in ``process``'s group.
+
+    Returns False when the group could not be signalled (already gone, or
+    not a real process).
+    """
+    pid = _group_pid(process)
+    if pid is None:
+        return False
+    try:
+        if IS_WINDOWS:
+            process.send_signal(signal.CTRL_BREAK_EVENT)
+        else:
+            os.killpg(pid, signum)
+        return True
+    except (OSError, ValueError):
+        return False
+
+
+def terminate_process_tree(process):
+    """Ask the process and all of its descendants to exit."""
+    if not signal_process_tree(process, signal.SIGTERM):
+        try:
+            process.terminate()
+        except ProcessLookupError:
+            pass
+
+
+def kill_process_tree(process):
+    """Forcefully kill the process and all of its descendants."""
+    pid = _group_pid(process)
+    if pid is not None:
+        if IS_WINDOWS:
+            subprocess.run(["taskkill", "/F", "/T", "/PID", str(pid)], capture_output=True)
+        else:
+            try:
+                os.killpg(pid, signal.SIGKILL)
+            except OSError:
+                pass
+    try:
+        process.kill()
+    except ProcessLookupError:
+        pass
@@ -3,7 +3,6 @@
 CLI entry point for Ralph Loop
 """
 import argparse
-from .ralph_loop import RalphLoop
 
 def main():
     parser = argparse.ArgumentParser(
@@ -18,6 +17,7 @@ Examples:
   oh-my-ralph --agent "aider --yes-always" 
   
   oh-my-ralph --max-iterations 10  # Run only 10 iterations
+  oh-my-ralph --workers 4          # Run 4 loops at once in separate git worktrees
 
 The Ralph Wiggum technique works best when:
   - requirements.md contains clear specifications
@@ -69,9 +69,373 @@ The Ralph Wiggum technique works best when:
         default=8089,
         help="Port for opencode web server (default: 8089)",
     )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Echo agent output to the console and log line by line while it runs (without it only a preview is logged when the agent exits; memory is bounded either way)",
+    )
+    parser.add_argument(
+        "--stop-on-done",
+        action="store_true",
+        help="End the iteration as soon as the agent prints <PROMISE>DONE</PROMISE> (implies --stream)",
+    )
+    parser.add_argument(
+        "--transcripts",
+        action="store_true",
+        help="Save each iteration's full agent output under .ralphy/transcripts/ (implies --stream)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Run N agent loops at once, each in its own git worktree (default: 1)",
+    )
+    parser.add_argument(
+        "--worktree-root",
+        type=str,
+        default=None,
+        help="Directory for the worker worktrees (default: <working-dir>-worktrees)",
+    )
+    parser.add_argument(
+        "--assign-tasks",
+        action="store_true",
+        help="Pick the next item from .ralphy/fix_plan.md for the agent each iteration",
+    )
+    parser.add_argument(
+        "--async",
+        dest="use_async",
+        action="store_true",
+        help="Supervise the agent with the asyncio engine instead of blocking calls",
+    )
+    parser.add_argument(
+        "--log-flush-interval",
+        type=float,
+        default=1.0,
+        help="Seconds between log file flushes, 0 to flush every line (default: 1.0)",
+    )
+    parser.add_argument(
+        "--log-max-mb",
+        type=float,
+        default=0,
+        help="Rotate the log file once it reaches this many MB, 0 to disable (default: 0)",
+    )
+    parser.add_argument(
+        "--log-max-age-hours",
+        type=float,
+        default=0,
+        help="Rotate the log file after this many hours, 0 to disable (default: 0)",
+    )
+    parser.add_argument(
+        "--log-backups",
+        type=int,
+        default=5,
+        help="Number of rotated log files to keep (default: 5)",
+    )
+    parser.add_argument(
+        "--log-compress",
+        action="store_true",
+        help="Gzip rotated log files",
+    )
+    parser.add_argument(
+        "--no-events",
+        action="store_true",
+        help="Do not write per-iteration events to .ralphy/events.jsonl",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=None,
+        help="Serve Prometheus metrics on this port at /metrics (default: off)",
+    )
+    parser.add_argument(
+        "--metrics-host",
+        type=str,
+        default="127.0.0.1",
+        help="Address the metrics server binds to (default: 127.0.0.1)",
+    )
+    parser.add_argument(
+        "--adaptive-delay",
+        action="store_true",
+        help="Skip the delay after fast successful iterations and back off exponentially after failures",
+    )
+    parser.add_argument(
+        "--fast-threshold",
+        type=float,
+        default=300,
+        help="With --adaptive-delay, successful iterations shorter than this many seconds skip the delay (default: 300)",
+    )
+    parser.add_argument(
+        "--max-delay",
+        type=float,
+        default=300,
+        help="Longest backoff between failed iterations with --adaptive-delay (default: 300)",
+    )
+    parser.add_argument(
+        "--max-consecutive-failures",
+        type=int,
+        default=5,
+        help="Consecutive failed iterations before --on-failure-threshold applies (default: 5)",
+    )
+    parser.add_argument(
+        "--on-failure-threshold",
+        choices=["warn", "stop", "cooldown"],
+        default="warn",
+        help="What to do after --max-consecutive-failures: warn and continue, stop, or pause for --cooldown seconds (default: warn)",
+    )
+    parser.add_argument(
+        "--cooldown",
+        type=float,
+        default=900,
+        help="Seconds to pause with --on-failure-threshold cooldown (default: 900)",
+    )
+    parser.add_argument(
+        "--opencode-ready-timeout",
+        type=float,
+        default=30,
+        help="Seconds to wait for the opencode web server to accept connections (default: 30)",
+    )
+    parser.add_argument(
+        "--reuse-session",
+        action="store_true",
+        help="Continue the agent's previous conversation each iteration, where the agent supports it",
+    )
+    parser.add_argument(
+        "--session-refresh-every",
+        type=int,
+        default=0,
+        help="With --reuse-session, start a fresh session every N iterations, 0 for never (default: 0)",
+    )
+    parser.add_argument(
+        "--iteration-timeout",
+        type=float,
+        default=3600,
+        help="Seconds an agent run may take before it and its child processes are killed (default: 3600)",
+    )
+    parser.add_argument(
+        "--total-budget",
+        type=float,
+        default=0,
+        help="Stop after this many seconds of wall-clock time in total, 0 for no limit (default: 0)",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue from the checkpoint in .ralphy/state.json (iteration count, failure streak, budget)",
+    )
+    parser.add_argument(
+        "--stall-limit",
+        type=int,
+        default=0,
+        help="Act after this many iterations in a row leave the workspace and plan unchanged, 0 to disable (default: 0)",
+    )
+    parser.add_argument(
+        "--on-stall",
+        choices=["stop", "backoff", "switch-model"],
+        default="stop",
+        help="What to do after --stall-limit idle iterations: stop, pause for --cooldown seconds, or switch to --stall-model (default: stop)",
+    )
+    parser.add_argument(
+        "--stall-model",
+        type=str,
+        default=None,
+        help="Model to switch to with --on-stall switch-model",
+    )
+    parser.add_argument(
+        "--task-queue",
+        type=str,
+        default=None,
+        help="SQLite file, e.g. on a shared volume, to lease fix_plan tasks from with loops on other hosts (implies --assign-tasks)",
+    )
+    parser.add_argument(
+        "--lease-timeout",
+        type=float,
+        default=600,
+        help="Seconds a leased task stays reserved without a heartbeat before other loops may take it (default: 600)",
+    )
+    parser.add_argument(
+        "--track-usage",
+        action="store_true",
+        help="Record the tokens and cost each iteration reports, switching the agent to JSON output where it has one",
+    )
+    parser.add_argument(
+        "--usage-regex",
+        type=str,
+        default=None,
+        help="Regex with named groups (input_tokens, output_tokens, tokens, cost_usd, ...) to read usage from agent output (implies --track-usage)",
+    )
+    parser.add_argument(
+        "--max-tokens",
+        type=int,
+        default=0,
+        help="Stop before the run's total tokens would pass this, 0 for no limit (implies --track-usage) (default: 0)",
+    )
+    parser.add_argument(
+        "--max-cost",
+        type=float,
+        default=0,
+        help="Stop before the run's total cost in USD would pass this, 0 for no limit (implies --track-usage) (default: 0)",
+    )
+    parser.add_argument(
+        "--archive-after",
+        type=int,
+        default=0,
+        help="Move fix_plan items to .ralphy/fix_plan.archive.md N iterations after they are completed, 0 to keep them (default: 0)",
+    )
+    parser.add_argument(
+        "--hedge",
+        action="append",
+        default=None,
+        metavar="[AGENT::]MODEL",
+        help="Race a backup model (or AGENT::MODEL) against the agent in a git worktree; repeat for more backups",
+    )
+    parser.add_argument(
+        "--hedge-delay",
+        type=float,
+        default=300,
+        help="Seconds before the first backup starts, until enough latencies are recorded (default: 300)",
+    )
+    parser.add_argument(
+        "--hedge-percentile",
+        type=float,
+        default=90,
+        help="Start backups at this percentile of the agent's recorded latencies, 0 to always use --hedge-delay (default: 90)",
+    )
+    parser.add_argument(
+        "--hedge-root",
+        type=str,
+        default=None,
+        help="Directory for the backups' worktrees (default: <working-dir>-hedge)",
+    )
+    parser.add_argument(
+        "--verify-command",
+        type=str,
+        default=None,
+        help='Test command (e.g. "pytest -q") run on each iteration\'s result in a git worktree while the next iteration runs; the result goes into the following prompt',
+    )
+    parser.add_argument(
+        "--verify-timeout",
+        type=float,
+        default=1800,
+        help="Seconds a --verify-command run may take (default: 1800)",
+    )
+    parser.add_argument(
+        "--verify-root",
+        type=str,
+        default=None,
+        help="Directory for the verification worktree (default: <working-dir>-verify)",
+    )
+    parser.add_argument(
+        "--snapshots",
+        choices=["off", "keep", "rollback"],
+        default="off",
+        help="Snapshot the workspace to refs/ralph/ before each iteration; rollback undoes failed or timed-out iterations, keep leaves their changes (default: off)",
+    )
+    parser.add_argument(
+        "--snapshot-history",
+        type=int,
+        default=20,
+        help="Iterations whose snapshot refs are kept, 0 to keep all (default: 20)",
+    )
+    parser.add_argument(
+        "--quiet",
+        action="store_true",
+        help="Keep Ralph's own messages off the console; they still go to the log file (implies --no-banner)",
+    )
+    parser.add_argument(
+        "--no-banner",
+        action="store_true",
+        help="Skip the ASCII art at startup",
+    )
     args = parser.parse_args()
+    if args.on_stall == "switch-model" and not args.stall_model:
+        parser.error("--on-stall switch-model requires --stall-model")
+    if args.usage_regex:
+        import re
+        try:
+            re.compile(args.usage_regex)
+        except re.error as e:
+            parser.error(f"--usage-regex is not a valid regular expression: {e}")
+    if args.hedge and (args.workers > 1 or args.use_async):
+        parser.error("--hedge cannot be combined with --workers or --async")
+    if args.workers > 1 and args.use_async:
+        parser.error("--async cannot be combined with --workers")
+    loop_options = dict(
+        log_flush_interval=args.log_flush_interval,
+        log_max_bytes=int(args.log_max_mb * 1024 * 1024),
+        log_max_age=args.log_max_age_hours * 3600,
+        log_backups=args.log_backups,
+        log_compress=args.log_compress,
+        record_events=not args.no_events,
+        metrics_port=args.metrics_port,
+        metrics_host=args.metrics_host,
+        max_consecutive_failures=args.max_consecutive_failures,
+        failure_action=args.on_failure_threshold,
+        cooldown=args.cooldown,
+        opencode_ready_timeout=args.opencode_ready_timeout,
+        reuse_session=args.reuse_session,
+        session_refresh_every=args.session_refresh_every,
+        iteration_timeout=args.iteration_timeout,
+        total_budget=args.total_budget,
+        resume=args.resume,
+        stall_limit=args.stall_limit,
+        stall_action=args.on_stall,
+        stall_model=args.stall_model,
+        task_queue=args.task_queue,
+        lease_timeout=args.lease_timeout,
+        track_usage=args.track_usage,
+        usage_regex=args.usage_regex,
+        max_tokens=args.max_tokens,
+        max_cost=args.max_cost,
+        archive_after=args.archive_after,
+        quiet=args.quiet,
+        show_banner=not args.no_banner,
+        verify_command=args.verify_command,
+        verify_timeout=args.verify_timeout,
+        verify_root=args.verify_root,
+        snapshots=args.snapshots,
+        snapshot_history=args.snapshot_history,
+    )
+    if args.hedge:
+        loop_options.update(
+            hedge=args.hedge,
+            hedge_delay=args.hedge_delay,
+            hedge_percentile=args.hedge_percentile,
+            hedge_root=args.hedge_root,
+        )
+    if args.adaptive_delay:
+        from .delay_policy import AdaptiveDelay
+        loop_options["delay_policy"] = AdaptiveDelay(
+            base_delay=args.delay, max_delay=args.max_delay, fast_threshold=args.fast_threshold
+        )
+
+    if args.workers > 1:
+        from .worker_pool import WorkerPool
+        pool = WorkerPool(
+            workers=args.workers,
+            working_dir=args.working_dir,
+            worktree_root=args.worktree_root,
+            log_file=args.log,
+            max_iterations=args.max_iterations,
+            delay_between_loops=args.delay,
+            opencode_port=args.start_opencode_web_at_port,
+            agent_command=args.agent,
+            model=args.model,
+            stream_output=args.stream,
+            stop_on_done=args.stop_on_done,
+            keep_transcripts=args.transcripts,
+            assign_tasks=args.assign_tasks,
+            **loop_options,
+        )
+        pool.run()
+        return
 
-    ralph = RalphLoop(
+    # Imported only now, so --help and argument errors skip loading the loop
+    from .ralph_loop import RalphLoop
+    loop_class = RalphLoop
+    if args.use_async:
+        from .async_loop import AsyncRalphLoop
+        loop_class = AsyncRalphLoop
+    ralph = loop_class(
         agent_command=args.agent,
         delay_between_loops=args.delay,
         max_iterations=args.max_iterations,
@@ -79,8 +443,17 @@ The Ralph Wiggum technique works best when:
         model=args.model,
         opencode_port=args.start_opencode_web_at_port,
         working_dir=args.working_dir,
+        stream_output=args.stream,
+        stop_on_done=args.stop_on_done,
+        keep_transcripts=args.transcripts,
+        assign_tasks=args.assign_tasks,
+        **loop_options,
     )
-    ralph.run()
+    if args.use_async:
+        import asyncio
+        asyncio.run(ralph.run())
+    else:
+        ralph.run()
 
 if __name__ == "__main__":
     main()
@@ -1,3 +1,4 @@
+import shlex
 import subprocess
 import signal
 import time
@@ -5,6 +6,31 @@ import sys
 from pathlib import Path
 from datetime import datetime
 
+from .agents import executable_argv, resolve_adapter
+from .atomic_file import atomic_write
+from .delay_policy import FAILURE_ACTIONS, FixedDelay
+from .fingerprint import STALL_ACTIONS
+from .process_group import kill_process_tree, new_process_group_kwargs, signal_process_tree, terminate_process_tree
+
+# Seconds an agent gets to exit on its own after printing its completion marker
+# before the iteration is ended for it (only with stop_on_done).
+DONE_GRACE_PERIOD = 5
+# Longest piece of a line read from an agent pipe in one go while streaming
+STREAM_READ_CHARS = 64 * 1024
+# Lines read ahead of the main loop while streaming; once that many are
+# waiting, the readers block and the agent blocks on its full pipe
+STREAM_QUEUE_LINES = 256
+
+ASSIGNED_TASK_SECTION = """
+
+## Assigned Task
+
+The orchestrator picked this item from `.ralphy/fix_plan.md` for this iteration.
+Work on it instead of choosing an item yourself:
+
+{task}
+"""
+
 class RalphLoop:
     """The Ralph autonomous coding loop."""
 
@@ -18,8 +44,60 @@ class RalphLoop:
         # attach: str = None,
         opencode_port: int = 8089,
         working_dir: str = None,
+        stream_output: bool = False,
+        stop_on_done: bool = False,
+        keep_transcripts: bool = False,
+        install_signal_handlers: bool = True,
+        log_prefix: str = "",
+        assign_tasks: bool = False,
+        task_scheduler=None,
+        worker_id: str = "main",
+        log_flush_interval: float = 0.0,
+        log_max_bytes: int = 0,
+        log_max_age: float = 0,
+        log_backups: int = 5,
+        log_compress: bool = False,
+        record_events: bool = True,
+        metrics_port: int = None,
+        metrics_host: str = "127.0.0.1",
+        metrics=None,
+        delay_policy=None,
+        max_consecutive_failures: int = 5,
+        failure_action: str = "warn",
+        cooldown: float = 900,
+        opencode_ready_timeout: float = 30,
+        reuse_session: bool = False,
+        session_refresh_every: int = 0,
+        iteration_timeout: float = 3600,
+        total_budget: float = 0,  # 0 = unlimited
+        resume: bool = False,
+        stall_limit: int = 0,
+        stall_action: str = "stop",
+        stall_model: str = None,
+        task_queue: str = None,
+        lease_timeout: float = 600,
+        track_usage: bool = False,
+        usage_regex: str = None,
+        max_tokens: int = 0,  # 0 = unlimited
+        max_cost: float = 0,  # 0 = unlimited
+        hedge: list = None,
+        hedge_delay: float = 300,
+        hedge_percentile: float = 90,
+        hedge_root: str = None,
+        archive_after: int = 0,  # 0 = never archive
+        quiet: bool = False,
+        show_banner: bool = True,
+        verify_command: str = None,
+        verify_timeout: float = 1800,
+        verify_root: str = None,
+        snapshots: str = "off",
+        snapshot_history: int = 20,
+        change_dir: bool = True,
     ):
         self.agent_command = agent_command
+        # Parsed and classified once; each iteration only adds its own flags
+        self.agent = resolve_adapter(agent_command, opencode_port=opencode_port)
+        self._agent_program = executable_argv(self.agent.base_argv[:1])[0] if self.agent.base_argv else None
         self.delay = delay_between_loops
         self.max_iterations = max_iterations
         self.log_file = Path(log_file)
@@ -30,127 +108,603 @@ class RalphLoop:
         self.opencode_port = opencode_port
         self.opencode_proc = None
         self.working_dir = working_dir
+        # run() changes the process directory to working_dir unless this is
+        # off; the agent and every helper get working_dir as an explicit cwd
+        # either way, so several loops can share one process
+        self.change_dir = change_dir
+        # stop_on_done needs to see output as it arrives, so it implies streaming
+        self.stream_output = stream_output or stop_on_done or keep_transcripts
+        self.stop_on_done = stop_on_done
+        self.keep_transcripts = keep_transcripts
+        # Continue the agent's previous conversation instead of starting cold,
+        # for agents with a continue flag; a fresh session is started on the
+        # first iteration, after a failure and every session_refresh_every runs
+        self.reuse_session = reuse_session
+        self.session_refresh_every = session_refresh_every
+        self._session_runs = 0
+        self.continuing_session = False
+        self.log_prefix = log_prefix
+        # quiet keeps the loop's own messages out of the console (they still
+        # go to the log file); the banner is skipped with it too
+        self.quiet = quiet
+        self.show_banner = show_banner and not quiet
+        self.consecutive_failures = 0
+        self.max_consecutive_failures = max_consecutive_failures
+        # Wall-clock limits, in seconds: per agent run, and for the whole run
+        self.iteration_timeout = iteration_timeout
+        self.total_budget = total_budget
+        self.budget_started = None
+        # The running agent, so timeouts and shutdown can kill its whole tree
+        self._agent_proc = None
+        # Token and cost accounting, from the usage the agent reports in its
+        # output. Agents with a JSON output mode are switched to it for this.
+        from .usage import Usage
+        self.usage_regex = usage_regex
+        self.max_tokens = max_tokens
+        self.max_cost = max_cost
+        self.track_usage = bool(track_usage or usage_regex or max_tokens > 0 or max_cost > 0)
+        self._json_output = self.track_usage and self.agent.supports_stream_json
+        self.usage_total = Usage()
+        self.usage_iterations = 0
+        self.last_usage = None
+        self._usage_meter = None
+        # What to do once max_consecutive_failures is reached: "warn" and
+        # carry on, "stop" the loop, or "cooldown" for `cooldown` seconds
+        if failure_action not in FAILURE_ACTIONS:
+            raise ValueError(f"failure_action must be one of {', '.join(FAILURE_ACTIONS)}")
+        self.failure_action = failure_action
+        self.cooldown = cooldown
+        self.delay_policy = delay_policy or FixedDelay(delay_between_loops)
+        self.next_delay = self.delay_policy.initial_delay
+        self.last_iteration_elapsed = 0.0
+        # Set by streaming runs; the returned stdout may be truncated, so the
+        # marker has to be tracked separately.
+        self._last_marker_seen = False
         # Set .ralphy directory and resource file paths
         import os
-        base_dir = self.working_dir if self.working_dir else os.getcwd()
+        # Absolute, so paths stay valid after run() changes directory and so
+        # several loops in one process can each pass their own cwd to Popen
+        self._agent_cwd = os.path.abspath(self.working_dir) if self.working_dir else None
+        base_dir = self._agent_cwd if self._agent_cwd else os.getcwd()
         self.ralphy_dir = os.path.join(base_dir, ".ralphy")
+        # The log file stays open, so a relative path is pinned to the
+        # directory the loop runs in rather than wherever it was started
+        from .log_sink import LogSink
+        # Iterations that leave the workspace and plan untouched; after
+        # stall_limit of them in a row, stall_action applies (0 disables)
+        if stall_action not in STALL_ACTIONS:
+            raise ValueError(f"stall_action must be one of {', '.join(STALL_ACTIONS)}")
+        self.stall_limit = stall_limit
+        self.stall_action = stall_action
+        self.stall_model = stall_model
+        self.idle_iterations = 0
+        self._fingerprint_before = None
+        self._workspace_root = base_dir
+        log_rel = os.path.relpath(os.path.join(base_dir, self.log_file), base_dir).replace(os.sep, "/")
+        # Rotated logs share the prefix, so one entry covers them too
+        self._fingerprint_ignore = () if log_rel.startswith("..") else (log_rel,)
+        self._log_sink = LogSink(
+            os.path.join(base_dir, self.log_file),
+            flush_interval=log_flush_interval,
+            max_bytes=log_max_bytes,
+            max_age=log_max_age,
+            backups=log_backups,
+            compress=log_compress,
+        )
         self.agent_md = Path(os.path.join(self.ralphy_dir, "agent.md"))
         self.fix_plan_md = Path(os.path.join(self.ralphy_dir, "fix_plan.md"))
         self.prompt_md = Path(os.path.join(self.ralphy_dir, "prompt.md"))
+        self.transcripts_dir = Path(os.path.join(self.ralphy_dir, "transcripts"))
+        self.events_file = Path(os.path.join(self.ralphy_dir, "events.jsonl"))
+        # The opencode web server writes here instead of into unread pipes
+        self.opencode_log = Path(os.path.join(self.ralphy_dir, "opencode-web.log"))
+        # Checkpoint written after every iteration, read back with resume
+        self.state_file = Path(os.path.join(self.ralphy_dir, "state.json"))
+        self.resume = resume
+        self.history = []
+        self.opencode_ready_timeout = opencode_ready_timeout
+        self._opencode_log_handle = None
+        self._event_log = None
+        if record_events:
+            from .events import EventLog
+            self._event_log = EventLog(self.events_file)
+        # Prometheus metrics: served by this loop when metrics_port is set,
+        # or passed in by a WorkerPool that serves all its workers at once
+        self.metrics_port = metrics_port
+        self.metrics_host = metrics_host
+        self.metrics = metrics
+        self._metrics_server = None
+        if self.metrics is None and metrics_port is not None:
+            from .metrics import LoopMetrics
+            self.metrics = LoopMetrics(worker_id)
+        if self.metrics is not None:
+            self.metrics.server_alive = self._opencode_server_alive
+        # Timings and byte counts of the current agent run, for events.jsonl
+        self._agent_stats = {}
+        self._usage_before = None
         # Use prompt_md as the prompt file
         self.prompt_file = self.prompt_md
-        # Handle graceful shutdown
-        signal.signal(signal.SIGINT, self._signal_handler)
-        signal.signal(signal.SIGTERM, self._signal_handler)
+        # What the agent is pointed at this iteration: prompt_file, or a copy
+        # of it with the assigned task appended
+        self.current_prompt_file = self.prompt_file
+        self.iteration_prompt_md = Path(os.path.join(self.ralphy_dir, "iteration_prompt.md"))
+        # Completed fix_plan items move here after archive_after iterations,
+        # so the plan the agent reads every iteration stays short
+        self.fix_plan_archive_md = Path(os.path.join(self.ralphy_dir, "fix_plan.archive.md"))
+        self.plan_archiver = None
+        if archive_after > 0:
+            from .fix_plan import PlanArchiver
+            self.plan_archiver = PlanArchiver(self.fix_plan_md, self.fix_plan_archive_md, archive_after)
+        self._context_bytes = {}
+        self.worker_id = worker_id
+        self.current_task = None
+        self.task_scheduler = task_scheduler
+        self._own_task_index = None
+        if task_queue and task_scheduler is None:
+            # Tasks leased from a SQLite backlog shared with other hosts
+            from .fix_plan import TaskIndex
+            from .task_queue import SQLiteTaskQueue
+            self.task_scheduler = SQLiteTaskQueue(task_queue, TaskIndex(self.fix_plan_md), lease_timeout=lease_timeout)
+        elif assign_tasks and task_scheduler is None:
+            from .fix_plan import TaskIndex, TaskScheduler
+            self.task_scheduler = TaskScheduler(TaskIndex(self.fix_plan_md))
+        # Backup agents/models raced against this one in git worktrees
+        self.hedger = None
+        if hedge:
+            from .hedging import Hedger
+            self.hedger = Hedger(self, hedge, delay=hedge_delay, percentile=hedge_percentile, worktree_root=hedge_root)
+        # Tests run on each iteration's result in a worktree while the next
+        # iteration runs; the outcome goes into the prompt after that
+        self.verifier = None
+        if verify_command:
+            from .verification import Verifier
+            self.verifier = Verifier(self, verify_command, timeout=verify_timeout, worktree_root=verify_root)
+        # The working dir is snapshotted to a git ref before each iteration,
+        # and a failed iteration is rolled back to it with "rollback"
+        from .snapshots import SNAPSHOT_POLICIES
+        if snapshots not in SNAPSHOT_POLICIES:
+            raise ValueError(f"snapshots must be one of {', '.join(SNAPSHOT_POLICIES)}")
+        self.snapshots = None
+        if snapshots != "off":
+            from .snapshots import IterationSnapshots
+            self.snapshots = IterationSnapshots(self, snapshots, history=snapshot_history)
+        # Handle graceful shutdown. Loops run from a WorkerPool thread leave
+        # this to the pool, as handlers can only be set from the main thread.
+        if install_signal_handlers:
+            signal.signal(signal.SIGINT, self._signal_handler)
+            signal.signal(signal.SIGTERM, self._signal_handler)
 
     def _signal_handler(self, signum, frame):
         print(f"\n[Ralph] Received shutdown signal. Finishing current iteration...")
         self.running = False
+        # The agent runs in its own process group, so pass the signal on to
+        # all of it as the terminal would have
+        if self._agent_proc is not None:
+            signal_process_tree(self._agent_proc, signum)
+        if self.hedger is not None:
+            self.hedger.cancel(signum)
+        if self.verifier is not None:
+            self.verifier.cancel(signum)
         self._stop_opencode_server()
+        self._log_sink.flush()
+
+    def _open_opencode_log(self):
+        self.opencode_log.parent.mkdir(parents=True, exist_ok=True)
+        self._opencode_log_handle = open(self.opencode_log, "ab")
+        return self._opencode_log_handle
+
+    def _close_opencode_log(self):
+        if self._opencode_log_handle is not None:
+            self._opencode_log_handle.close()
+            self._opencode_log_handle = None
 
     def start_opencode_web_at_port(self):
         try:
             cmd = f"opencode web --port {self.opencode_port}"
-            self._log(f"Starting opencode web server on port {self.opencode_port}...")
+            self._log(f"Starting opencode web server on port {self.opencode_port} (output in {self.opencode_log})...")
+            self._close_opencode_log()
+            log_handle = self._open_opencode_log()
             self.opencode_proc = subprocess.Popen(
                 cmd,
                 shell=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                encoding='utf-8',
+                stdin=subprocess.DEVNULL,
+                stdout=log_handle,
+                stderr=subprocess.STDOUT,
+                cwd=self._agent_cwd,
+                **new_process_group_kwargs(),
             )
         except Exception as e:
             self._log(f"Failed to start opencode web server: {e}")
             self.opencode_proc = None
+            self._close_opencode_log()
+
+    def wait_for_opencode_server(self) -> bool:
+        """Wait until the opencode web server accepts connections.
+
+        Gives up after ``opencode_ready_timeout`` seconds, or as soon as the
+        server process exits.
+        """
+        from .opencode_server import wait_until_listening
+        start = time.monotonic()
+        ready = wait_until_listening(self.opencode_port, self.opencode_ready_timeout, self._opencode_server_alive)
+        self._report_opencode_ready(ready, time.monotonic() - start)
+        return ready
+
+    def _report_opencode_ready(self, ready: bool, elapsed: float):
+        if ready:
+            self._log(f"opencode web server ready on port {self.opencode_port} after {elapsed:.1f}s")
+        elif self._opencode_server_alive():
+            self._log(
+                f"opencode web server not listening on port {self.opencode_port} "
+                f"after {self.opencode_ready_timeout}s; continuing anyway"
+            )
+        else:
+            self._log(f"opencode web server exited during startup; see {self.opencode_log}")
+
+    def ensure_opencode_server(self):
+        """Restart the opencode web server if it has died since the last iteration."""
+        if self._opencode_server_alive():
+            return
+        if self.opencode_proc is None:
+            self._log("opencode web server is not running. Starting it.")
+        else:
+            self._log(f"opencode web server exited with code {self.opencode_proc.poll()}. Restarting it.")
+        self.start_opencode_web_at_port()
+        self.wait_for_opencode_server()
+
+    def _opencode_server_alive(self) -> bool:
+        return self.opencode_proc is not None and self.opencode_proc.poll() is None
+
+    def _set_phase(self, phase: str):
+        if self.metrics is not None:
+            self.metrics.set_phase(phase)
+
+    def _start_metrics_server(self):
+        if self.metrics_port is None:
+            return
+        from .metrics import MetricsServer
+        try:
+            self._metrics_server = MetricsServer(self.metrics_port, [self.metrics], host=self.metrics_host)
+            self._metrics_server.start()
+            self._log(f"Serving metrics on http://{self.metrics_host}:{self._metrics_server.port}/metrics")
+        except OSError as e:
+            self._log(f"Failed to start metrics server on port {self.metrics_port}: {e}")
+            self._metrics_server = None
+
+    def _stop_metrics_server(self):
+        if self._metrics_server is not None:
+            self._metrics_server.stop()
+            self._metrics_server = None
 
     def _stop_opencode_server(self):
         if self.opencode_proc and self.opencode_proc.poll() is None:
             self._log("Stopping opencode web server...")
-            self.opencode_proc.terminate()
+            terminate_process_tree(self.opencode_proc)
             try:
                 self.opencode_proc.wait(timeout=5)
             except Exception:
-                self.opencode_proc.kill()
+                kill_process_tree(self.opencode_proc)
             self.opencode_proc = None
+        self._close_opencode_log()
 
     def _log(self, message: str):
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        log_entry = f"[{timestamp}] {message}"
-        print(log_entry)
-        with open(self.log_file, "a", encoding="utf-8") as f:
-            f.write(log_entry + "\n")
+        log_entry = f"[{timestamp}] {self.log_prefix}{message}"
+        if not self.quiet:
+            print(log_entry)
+        self._append_log(log_entry)
+
+    def _append_log(self, entry: str):
+        self._log_sink.write(entry)
 
     def _read_prompt(self) -> str:
         if not self.prompt_file.exists():
             raise FileNotFoundError(f"Prompt file not found: {self.prompt_file}")
         return self.prompt_file.read_text(encoding="utf-8")
 
+    def _next_session_continues(self) -> bool:
+        if not self.reuse_session or self._session_runs == 0:
+            return False
+        return self.session_refresh_every <= 0 or self._session_runs % self.session_refresh_every != 0
+
+    def _iteration_argv(self) -> list[str]:
+        argv = self.agent.build_argv(self.current_prompt_file, model=self.model, continue_session=self.continuing_session)
+        if self._json_output:
+            argv = self.agent.add_stream_json_flags(argv)
+        return argv
+
+    def _agent_argv(self) -> list[str]:
+        argv = self._iteration_argv()
+        if argv:
+            argv[0] = self._agent_program
+        return argv
+
     def _build_agent_command(self, prompt: str) -> str:
-        agent_cmd = self.agent_command
-        uses_opencode = agent_cmd.strip().startswith("opencode run")
-        uses_copilot = "copilot" in agent_cmd
-        uses_claude = "claude" in agent_cmd
-        uses_amp = "@sourcegraph/amp" in agent_cmd or "amp" in agent_cmd and "--yes" in agent_cmd
-        if uses_opencode:
-            if self.model:
-                agent_cmd += f" --model {self.model}"
-            if self.opencode_port:
-                agent_cmd += f" --attach http://localhost:{self.opencode_port}"
-            agent_cmd += f' "Read and follow the instructions in the file `{self.prompt_file}`."'
-        elif uses_copilot or uses_claude or uses_amp:
-            if uses_copilot:
-                # For copilot, restructure: copilot --model X --yolo -p "prompt"
-                base_cmd = agent_cmd.split()[0]  # "copilot"
-                flags_part = ""
-                if self.model:
-                    flags_part += f" --model {self.model}"
-                flags_part += " --yolo"
-                # Extract any additional flags from original command (like -p)
-                additional_flags = " ".join(agent_cmd.split()[1:])  # "-p"
-                agent_cmd = f"{base_cmd}{flags_part} {additional_flags}"
-            else:
-                # For claude and amp, keep the original logic
-                if self.model:
-                    agent_cmd += f" --model {self.model}"
-                if uses_claude:
-                    agent_cmd += " --dangerously-skip-permissions"
-                elif uses_amp:
-                    agent_cmd += " --dangerously-allow-all"
-            # For copilot -p, claude -p, and amp, instruct to read the file
-            agent_cmd += f' "Read and follow the instructions in the file `{self.prompt_file}`."'
-        return agent_cmd
+        """The agent command line for this iteration, for display and logs."""
+        return shlex.join(self._iteration_argv())
+
+    def _stdout_capture(self, transcript):
+        """Bounded capture of the agent's stdout that also feeds the usage meter.
+
+        In JSON output mode the meter looks for the completion marker, so
+        that tool output echoing the prompt does not count.
+        """
+        from .output_capture import OutputCapture
+        marker = None if self._json_output else self.agent.completion_marker
+        return OutputCapture(marker=marker, transcript=transcript, observer=self._usage_meter)
+
+    def _uses_prompt_arg(self) -> bool:
+        """Whether the agent gets the prompt on its command line rather than stdin."""
+        return self.agent.prompt_via == "arg"
+
+    def _start_budget(self):
+        if self.budget_started is None:
+            self.budget_started = time.monotonic()
+
+    def _budget_remaining(self):
+        """Seconds left of total_budget, or None without a budget."""
+        if self.total_budget <= 0:
+            return None
+        self._start_budget()
+        return max(self.total_budget - (time.monotonic() - self.budget_started), 0.0)
+
+    def _agent_timeout(self) -> float:
+        """How long the next agent run may take: the iteration timeout, cut
+        short by whatever is left of the total budget."""
+        remaining = self._budget_remaining()
+        return self.iteration_timeout if remaining is None else min(self.iteration_timeout, remaining)
+
+    def _report_budget(self, elapsed: float):
+        remaining = self._budget_remaining()
+        if remaining is None:
+            return
+        used = elapsed / self.total_budget * 100
+        self._log(f"Iteration used {elapsed:.1f}s ({used:.1f}% of the {self.total_budget:.0f}s budget, {remaining:.0f}s left)")
+
+    def _account_usage(self):
+        """Add the finished iteration's reported usage to the run's totals.
+
+        Returns the iteration's Usage, or None when the agent reported none.
+        """
+        meter = self._usage_meter
+        self.last_usage = None
+        if meter is None:
+            return None
+        meter.close()
+        if not meter.reported:
+            self._log("The agent reported no token usage for this iteration.")
+            return None
+        self.last_usage = meter.usage()
+        self.usage_total = self.usage_total + self.last_usage
+        self.usage_iterations += 1
+        self._log(f"Iteration usage: {self.last_usage.describe()}. Run total: {self.usage_total.describe()}")
+        return self.last_usage
+
+    def _usage_limit_reached(self) -> bool:
+        """Whether max_tokens or max_cost leaves no room for another iteration.
+
+        An iteration is expected to use as much as the average one so far,
+        so the loop stops before it would go over the limit rather than after.
+        """
+        runs = self.usage_iterations
+        if self.max_tokens > 0:
+            used = self.usage_total.total_tokens
+            expected = used / runs if runs else 0
+            if used + expected > self.max_tokens:
+                self._log(
+                    f"Used {used:,} of the {self.max_tokens:,} token limit "
+                    f"(about {expected:,.0f} per iteration). Stopping."
+                )
+                return True
+        if self.max_cost > 0:
+            used = self.usage_total.cost_usd
+            expected = used / runs if runs else 0
+            if used + expected > self.max_cost:
+                self._log(
+                    f"Used ${used:.4f} of the ${self.max_cost:.2f} cost limit "
+                    f"(about ${expected:.4f} per iteration). Stopping."
+                )
+                return True
+        return False
 
     def _run_agent(self, prompt: str) -> tuple[int, str, str]:
+        if self.hedger is not None:
+            return self.hedger.run(prompt)
+        return self._spawn_agent(prompt)
+
+    def _spawn_agent(self, prompt: str) -> tuple[int, str, str]:
         try:
-            agent_cmd = self._build_agent_command(prompt)
-            uses_opencode = self.agent_command.strip().startswith("opencode run")
-            uses_command_with_prompt_arg = uses_opencode or "copilot" in self.agent_command or "claude" in self.agent_command or "@sourcegraph/amp" in self.agent_command or ("amp" in self.agent_command and "--yes" in self.agent_command)
-            print(f"Running command: {agent_cmd}")
+            argv = self._agent_argv()
+            uses_command_with_prompt_arg = self._uses_prompt_arg()
+            timeout = self._agent_timeout()
+            if not self.quiet:
+                print(f"Running command: {self._build_agent_command(prompt)}")
+            spawn_start = time.monotonic()
             if uses_command_with_prompt_arg:
                 process = subprocess.Popen(
-                    agent_cmd,
-                    shell=True,
+                    argv,
                     stdout=subprocess.PIPE,
                     stderr=subprocess.PIPE,
                     encoding='utf-8',
+                    errors='replace',
+                    cwd=self._agent_cwd,
+                    **new_process_group_kwargs(),
                 )
-                stdout, stderr = process.communicate(timeout=3600)
+                stdin_text = None
             else:
                 process = subprocess.Popen(
-                    agent_cmd,
-                    shell=True,
+                    argv,
                     stdin=subprocess.PIPE,
                     stdout=subprocess.PIPE,
                     stderr=subprocess.PIPE,
                     encoding='utf-8',
+                    errors='replace',
+                    cwd=self._agent_cwd,
+                    **new_process_group_kwargs(),
                 )
-                stdout, stderr = process.communicate(input=prompt, timeout=3600)
-            return process.returncode, stdout, stderr
-        except subprocess.TimeoutExpired:
-            process.kill()
-            return -1, "", "Process timed out after 1 hour"
+                stdin_text = prompt
+            self._agent_proc = process
+            self._note_spawned(spawn_start)
+            return self._collect_agent_output(process, stdin_text, timeout=timeout)
         except Exception as e:
             return -1, "", str(e)
+        finally:
+            self._agent_proc = None
+
+    def _note_spawned(self, spawn_start: float):
+        self._agent_stats["spawned_at"] = time.monotonic()
+        self._agent_stats["spawn_latency"] = self._agent_stats["spawned_at"] - spawn_start
+
+    def _note_output(self):
+        if "first_output_latency" not in self._agent_stats and "spawned_at" in self._agent_stats:
+            self._agent_stats["first_output_latency"] = time.monotonic() - self._agent_stats["spawned_at"]
+
+    def _collect_agent_output(self, process, stdin_text, timeout: float) -> tuple[int, str, str]:
+        """Read the agent's stdout/stderr as it arrives while the agent runs.
+
+        Output is kept in bounded OutputCaptures (head and tail only), so
+        memory stays flat however much the agent prints. With stream_output
+        it is also echoed to the console and the log; with keep_transcripts
+        the full output goes to .ralphy/transcripts/ instead of being copied
+        line by line into the log. With stop_on_done the agent gets
+        DONE_GRACE_PERIOD seconds to exit after its completion marker before
+        it is terminated and the iteration is counted as successful. Once the
+        agent itself exits, its pipes are read for DONE_GRACE_PERIOD more
+        seconds; anything it left running is then killed and the agent's
+        own exit code is returned.
+        """
+        import queue
+        import threading
+        from .output_capture import OutputCapture
+
+        lines = queue.Queue(maxsize=STREAM_QUEUE_LINES)
+        finished = threading.Event()
+
+        def put(item):
+            # Blocks while the queue is full, unless the main loop has given up on the agent
+            while not finished.is_set():
+                try:
+                    lines.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+
+        def pump(name, stream):
+            try:
+                for line in iter(lambda: stream.readline(STREAM_READ_CHARS), ""):
+                    put((name, line))
+                    if finished.is_set():
+                        break
+            except (OSError, ValueError):
+                pass
+            finally:
+                put((name, None))
+
+        transcript = self._open_transcript()
+        captured = {
+            "stdout": self._stdout_capture(transcript),
+            "stderr": OutputCapture(transcript=transcript, transcript_prefix="[stderr] "),
+        }
+        readers = [
+            threading.Thread(target=pump, args=(name, stream), daemon=True)
+            for name, stream in (("stdout", process.stdout), ("stderr", process.stderr))
+        ]
+        for reader in readers:
+            reader.start()
+        if stdin_text is not None:
+            def feed():
+                try:
+                    process.stdin.write(stdin_text)
+                    process.stdin.close()
+                except (BrokenPipeError, OSError, ValueError):
+                    pass
+
+            # In its own thread: an agent that prints before reading a long
+            # prompt must not block on the full queue while we block on stdin
+            threading.Thread(target=feed, daemon=True).start()
+
+        open_streams = len(readers)
+        deadline = time.monotonic() + timeout
+        done_at = None
+        exited_at = None
+        stopped_early = False
+        timed_out = False
+        try:
+            while open_streams:
+                now = time.monotonic()
+                if now >= deadline:
+                    kill_process_tree(process)
+                    timed_out = True
+                    break
+                if exited_at is not None and now - exited_at >= DONE_GRACE_PERIOD:
+                    # The agent is gone but something it started (a dev server,
+                    # a watcher) still holds the pipes open
+                    self._log("Agent exited but its pipes are still open. Killing what it left running.")
+                    kill_process_tree(process)
+                    break
+                if done_at is not None and now - done_at >= DONE_GRACE_PERIOD:
+                    if stopped_early:
+                        # Something still holds the pipes open after terminate()
+                        kill_process_tree(process)
+                        break
+                    if process.poll() is None:
+                        self._log("Agent still running after completion marker. Ending iteration early.")
+                        terminate_process_tree(process)
+                        stopped_early = True
+                        done_at = now
+                    else:
+                        done_at = None
+                try:
+                    name, line = lines.get(timeout=0.1)
+                except queue.Empty:
+                    if exited_at is None and process.poll() is not None:
+                        exited_at = now
+                    continue
+                if line is None:
+                    open_streams -= 1
+                    continue
+                self._note_output()
+                capture = captured[name]
+                seen_before = capture.marker_seen
+                capture.write(line)
+                if self.stream_output:
+                    print(line, end="", file=sys.stdout if name == "stdout" else sys.stderr, flush=True)
+                    if transcript is None:
+                        self._append_log(f"  {name}| {line.rstrip()}")
+                if self.stop_on_done and capture.marker_seen and not seen_before:
+                    done_at = time.monotonic()
+            if not timed_out:
+                try:
+                    process.wait(timeout=max(deadline - time.monotonic(), 0))
+                except subprocess.TimeoutExpired:
+                    kill_process_tree(process)
+                    timed_out = True
+            # Reap a killed agent, so it does not linger as a zombie
+            process.wait()
+        finally:
+            finished.set()
+            if transcript is not None:
+                transcript.close()
+                self._log(f"Transcript saved to {transcript.name}")
+        self._last_marker_seen = captured["stdout"].marker_seen
+        self._agent_stats["stdout_bytes"] = captured["stdout"].total_bytes
+        self._agent_stats["stderr_bytes"] = captured["stderr"].total_bytes
+        stdout, stderr = captured["stdout"].getvalue(), captured["stderr"].getvalue()
+        if timed_out:
+            return -1, stdout, f"Process timed out after {timeout:.0f}s"
+        return_code = 0 if stopped_early else process.returncode
+        return return_code, stdout, stderr
+
+    def _open_transcript(self):
+        if not self.keep_transcripts:
+            return None
+        try:
+            self.transcripts_dir.mkdir(parents=True, exist_ok=True)
+            path = self.transcripts_dir / f"iteration-{self.iteration:04d}.log"
+            return open(path, "w", encoding="utf-8")
+        except OSError as e:
+            self._log(f"Could not open transcript file: {e}")
+            return None
 
     def _print_ascii_art(self):
         try:
@@ -172,55 +726,272 @@ class RalphLoop:
                 return False
         return True
 
-    def run_single_iteration(self) -> tuple[bool, bool]:
+    def _assign_task(self, prompt: str) -> str:
+        self.current_prompt_file = self.prompt_file
+        self.current_task = None
+        if self.task_scheduler is None:
+            return prompt
+        task = self.task_scheduler.claim(self.worker_id)
+        if task is None:
+            self._log("No open tasks in fix_plan.md to assign.")
+            return prompt
+        self.current_task = task
+        self._log(f"Assigned task: {task.text}")
+        prompt += ASSIGNED_TASK_SECTION.format(task=task.describe())
+        self._write_iteration_prompt(prompt)
+        return prompt
+
+    def _write_iteration_prompt(self, prompt: str):
+        # Atomic, so an agent or hedge racer never reads a half-written prompt
+        with atomic_write(self.iteration_prompt_md, "w", encoding="utf-8") as f:
+            f.write(prompt)
+        self.current_prompt_file = self.iteration_prompt_md
+
+    def _add_verification(self, prompt: str) -> str:
+        """Append the latest verification result that the agent has not seen yet."""
+        results = self._report_verification()
+        if not results:
+            return prompt
+        prompt += self.verifier.prompt_section(results[-1])
+        self._write_iteration_prompt(prompt)
+        return prompt
+
+    def _report_verification(self) -> list:
+        """Log the verifications finished since the last call and record them in events.jsonl."""
+        if self.verifier is None:
+            return []
+        from .verification import describe_result
+        results = self.verifier.take_results()
+        for result in results:
+            self._log(
+                f"Verification of iteration {result['iteration']} finished in {result['duration_s']:.1f}s. "
+                f"{describe_result(result)} Output in {self.verifier.output_file}"
+            )
+            if self._event_log is not None:
+                fields = {key: value for key, value in result.items() if key != "output"}
+                self._event_log.emit("verification", worker=self.worker_id, **fields)
+        return results
+
+    def _finish_verification(self):
+        """Wait for the last iteration's verification, or stop it on shutdown, and report it."""
+        if self.verifier is None:
+            return
+        if not self.running:
+            self.verifier.cancel()
+        self.verifier.wait()
+        self._report_verification()
+
+    def _finish_task(self, success: bool):
+        task = self.current_task
+        if task is None:
+            return
+        self.current_task = None
+        # A task counts as done once this loop's own plan no longer lists it
+        # as open; in a worker pool that is the worktree's copy of the plan.
+        if self.task_scheduler.index.path == self.fix_plan_md:
+            own_index = self.task_scheduler.index
+        else:
+            if self._own_task_index is None:
+                from .fix_plan import TaskIndex
+                self._own_task_index = TaskIndex(self.fix_plan_md)
+            own_index = self._own_task_index
+        # A task the plan no longer lists was either removed once finished
+        # (as the prompt asks) or came from another host's plan through a
+        # shared queue; a successful iteration on it counts as done, or it
+        # would be handed straight back to this worker forever
+        listed = own_index.find(task.id)
+        if listed is None:
+            outcome = "counting it as done" if success else "leaving it open"
+            self._log(f"Warning: the assigned task is not in {own_index.path}; {outcome}: {task.text}")
+        completed = success and (listed is None or not listed.is_open)
+        try:
+            self.task_scheduler.finish(self.worker_id, completed)
+        except Exception as e:
+            # A shared queue re-queues the task once its lease runs out
+            self._log(f"Could not report task result: {e}")
+        self._log(f"Task {'completed' if completed else 'still open'}: {task.text}")
+
+    def _begin_iteration(self) -> str:
+        # Before anything that can raise, so a failed start does not count the last iteration again
+        self._agent_stats = {}
+        self._usage_meter = None
         self.iteration += 1
         self._log(f"=== Ralph Loop Iteration {self.iteration} ===")
+        if self.metrics is not None:
+            self.metrics.iteration_started()
+        prompt = self._read_prompt()
+        self._log(f"Read prompt from {self.prompt_file} ({len(prompt)} chars)")
+        self._report_context()
+        prompt = self._assign_task(prompt)
+        prompt = self._add_verification(prompt)
+        self.continuing_session = self._next_session_continues()
+        self._session_runs += 1
+        if self.reuse_session:
+            self._log("Continuing the agent's previous session" if self.continuing_session else "Starting a fresh agent session")
+        self._log(f"Running agent: {self.agent_command}")
+        self._last_marker_seen = False
+        if self.track_usage:
+            from .usage import UsageMeter
+            self._usage_meter = UsageMeter(
+                self.usage_regex, marker=self.agent.completion_marker if self._json_output else None
+            )
+        if self._event_log is not None:
+            from .events import child_resource_usage
+            self._usage_before = child_resource_usage()
+        if self.stall_limit > 0:
+            self._fingerprint_before = self._fingerprint()
+        if self.snapshots is not None:
+            self.snapshots.begin(self.iteration)
+        return prompt
+
+    def _report_context(self):
+        """Log the size of the files the agent is told to read every iteration."""
+        sizes = {}
+        for path in (self.prompt_md, self.agent_md, self.fix_plan_md):
+            try:
+                sizes[path.name] = path.stat().st_size
+            except OSError:
+                continue
+        self._context_bytes = sizes
+        if sizes:
+            listing = ", ".join(f"{name} {size / 1024:.1f} KB" for name, size in sizes.items())
+            self._log(f"Context files: {listing} ({sum(sizes.values()) / 1024:.1f} KB in total)")
+
+    def _compact_plan(self):
+        """Archive fix_plan items completed more than archive_after iterations ago."""
+        if self.plan_archiver is None:
+            return
+        try:
+            moved = self.plan_archiver.compact(self.iteration)
+        except OSError as e:
+            self._log(f"Could not archive completed fix_plan items: {e}")
+            return
+        if moved:
+            self._log(f"Archived {moved} completed fix_plan item{'s' if moved != 1 else ''} to {self.fix_plan_archive_md}")
+
+    def _count_changes(self):
+        """Files and lines the finished iteration changed, against its snapshot."""
+        if self.snapshots is None:
+            return None
+        diff = self.snapshots.finish()
+        if diff is not None and "files_changed" in diff:
+            self._log(
+                f"Iteration changed {diff['files_changed']} file{'s' if diff['files_changed'] != 1 else ''} "
+                f"(+{diff['insertions']} -{diff['deletions']}); snapshot before it: {diff['snapshot'][:12]}"
+            )
+        return diff
+
+    def _fingerprint(self) -> str:
+        from .fingerprint import workspace_fingerprint
+        return workspace_fingerprint(self._workspace_root, ignore=self._fingerprint_ignore)
+
+    def _record_iteration_event(self, return_code, elapsed, stdout="", stderr="", done=False, error=None):
+        from .state import HISTORY_LENGTH
+        self.last_iteration_elapsed = elapsed
+        usage = self._account_usage()
+        diff = self._count_changes()
+        entry = {
+            "iteration": self.iteration,
+            "exit_code": return_code,
+            "wall_time_s": round(elapsed, 3),
+            "finished_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        if usage is not None:
+            entry["tokens"] = usage.total_tokens
+            entry["cost_usd"] = round(usage.cost_usd, 6)
+        self.history.append(entry)
+        del self.history[:-HISTORY_LENGTH]
+        self._report_budget(elapsed)
+        if self.metrics is not None:
+            self.metrics.iteration_finished(return_code, elapsed)
+        if self._event_log is None:
+            return
+        from .events import child_resource_usage
+        stats = self._agent_stats
+        event = {
+            "iteration": self.iteration,
+            "worker": self.worker_id,
+            "agent_command": self.agent_command,
+            "model": self.model,
+            "task": self.current_task.text if self.current_task is not None else None,
+            "spawn_latency_s": stats.get("spawn_latency"),
+            "first_output_s": stats.get("first_output_latency"),
+            "wall_time_s": elapsed,
+            "exit_code": return_code,
+            "stdout_bytes": stats.get("stdout_bytes", len((stdout or "").encode("utf-8", errors="replace"))),
+            "stderr_bytes": stats.get("stderr_bytes", len((stderr or "").encode("utf-8", errors="replace"))),
+            "done_marker": done,
+            "continued_session": self.continuing_session,
+            "context_bytes": self._context_bytes,
+        }
+        if usage is not None:
+            event.update(usage.as_dict())
+        if diff is not None:
+            event.update(diff)
+        if self.hedger is not None and self.hedger.last_race is not None:
+            event["hedge"] = self.hedger.last_race
+        usage_after = child_resource_usage()
+        if usage_after is not None and self._usage_before is not None:
+            event["child_user_cpu_s"] = round(usage_after["user_cpu"] - self._usage_before["user_cpu"], 3)
+            event["child_system_cpu_s"] = round(usage_after["system_cpu"] - self._usage_before["system_cpu"], 3)
+            event["child_peak_rss_kb"] = usage_after["max_rss_kb"]
+        if error is not None:
+            event["error"] = error
+        try:
+            self._event_log.emit("iteration", **event)
+        except OSError as e:
+            self._log(f"Could not write event to {self.events_file}: {e}")
+
+    def _end_iteration(self, return_code: int, stdout: str, stderr: str, elapsed: float) -> tuple[bool, bool]:
+        self._log(f"Agent finished in {elapsed:.1f}s with return code {return_code}")
+        should_stop = False
+        if self._usage_meter is not None:
+            self._usage_meter.close()
+        if self._json_output:
+            marker_found = self._usage_meter.marker_seen
+        else:
+            marker_found = self._last_marker_seen or (stdout and self.agent.completion_marker in stdout)
+        if marker_found:
+            self._log(f"=== DETECTED COMPLETION MARKER: {self.agent.completion_marker} ===")
+            self._log("Agent has indicated work is complete. Stopping Ralph Loop.")
+            should_stop = True
+        if stdout:
+            output_preview =  stdout[-500:] if len(stdout) > 500 else stdout
+            self._log(f"Output preview: ...{output_preview}")
+        if stderr and return_code != 0:
+            self._log(f"Stderr: {stderr[:500]}")
+        self._record_iteration_event(return_code, elapsed, stdout, stderr, done=should_stop)
+        return (return_code == 0, should_stop)
+
+    def run_single_iteration(self) -> tuple[bool, bool]:
+        success = False
+        start_time = time.time()
         try:
-            prompt = self._read_prompt()
-            self._log(f"Read prompt from {self.prompt_file} ({len(prompt)} chars)")
-            self._log(f"Running agent: {self.agent_command}")
+            prompt = self._begin_iteration()
             start_time = time.time()
             return_code, stdout, stderr = self._run_agent(prompt)
-            elapsed = time.time() - start_time
-            self._log(f"Agent finished in {elapsed:.1f}s with return code {return_code}")
-            should_stop = False
-            if stdout and "<PROMISE>DONE</PROMISE>" in stdout:
-                self._log("=== DETECTED COMPLETION MARKER: <PROMISE>DONE</PROMISE> ===")
-                self._log("Agent has indicated work is complete. Stopping Ralph Loop.")
-                should_stop = True
-            if stdout:
-                output_preview =  stdout[-500:] if len(stdout) > 500 else stdout
-                self._log(f"Output preview: ...{output_preview}")
-            if stderr and return_code != 0:
-                self._log(f"Stderr: {stderr[:500]}")
-            return (return_code == 0, should_stop)
+            success, should_stop = self._end_iteration(return_code, stdout, stderr, time.time() - start_time)
+            return (success, should_stop)
         except FileNotFoundError as e:
             self._log(f"Error: {e}")
+            self._record_iteration_event(None, time.time() - start_time, error=str(e))
             return (False, False)
         except Exception as e:
             self._log(f"Unexpected error: {e}")
+            self._record_iteration_event(None, time.time() - start_time, error=str(e))
             return (False, False)
+        finally:
+            if self.current_task is not None:
+                self._finish_task(success)
 
-    def run(self):
-        self._print_ascii_art()
+    def prepare_ralphy_dir(self):
         import os
         import shutil
-        base_dir = self.working_dir if self.working_dir else os.getcwd()
+        base_dir = self._agent_cwd if self._agent_cwd else os.getcwd()
         ralphy_dir = os.path.join(base_dir, ".ralphy")
-        import importlib.resources
-        resource_files = ["agent.md", "fix_plan.md", "prompt.md"]
-        resource_paths = []
-        for fname in resource_files:
-            try:
-                files = importlib.resources.files("oh_my_ralph")
-                resource_path = files.joinpath(fname)
-                if resource_path.is_file():
-                    with importlib.resources.as_file(resource_path) as res_path:
-                        resource_paths.append(str(res_path))
-                else:
-                    raise FileNotFoundError(f"{fname} not found in package")
-            except (FileNotFoundError, ModuleNotFoundError):
-                resource_paths.append(os.path.join(base_dir, fname))
+        from .resources import RESOURCE_FILES, resource_path
+        resource_files = list(RESOURCE_FILES)
+        resource_paths = [resource_path(fname) or os.path.join(base_dir, fname) for fname in resource_files]
         if not os.path.exists(ralphy_dir):
             os.makedirs(ralphy_dir, exist_ok=True)
             self.copy_resource_files(os, shutil, base_dir, ralphy_dir, resource_files, resource_paths)
@@ -232,7 +1003,90 @@ class RalphLoop:
                                          [os.path.join(base_dir, fname) for fname in missing])
             prompt_idx = resource_files.index("prompt.md")
             self.copy_resource_files(os, shutil, base_dir, ralphy_dir, ["prompt.md"], [resource_paths[prompt_idx]])
-        if self.working_dir:
+
+    def _record_result(self, success: bool):
+        if success:
+            self.consecutive_failures = 0
+        else:
+            self.consecutive_failures += 1
+            # Do not keep continuing a conversation that just failed
+            self._session_runs = 0
+            if self.consecutive_failures >= self.max_consecutive_failures:
+                self._log(
+                    f"Too many consecutive failures ({self.consecutive_failures}). "
+                    "Consider checking the prompt or agent configuration."
+                )
+        if self.metrics is not None:
+            self.metrics.set_consecutive_failures(self.consecutive_failures)
+
+    def _schedule_next(self, success: bool) -> bool:
+        """Record the result and pick the wait before the next iteration.
+
+        Sets ``next_delay``. Returns False when the failure threshold is hit
+        and ``failure_action`` is "stop".
+        """
+        self._record_result(success)
+        self.next_delay = self.delay_policy.next_delay(
+            success, self.last_iteration_elapsed, self.consecutive_failures
+        )
+        # After the stall check, so that archiving is not taken for progress
+        keep_going = self._check_stall()
+        self._compact_plan()
+        if not keep_going:
+            return False
+        if success or self.consecutive_failures < self.max_consecutive_failures:
+            return True
+        if self.failure_action == "stop":
+            self._log(f"Stopping after {self.consecutive_failures} consecutive failures.")
+            return False
+        if self.failure_action == "cooldown":
+            self._log(f"Cooling down for {self.cooldown}s after {self.consecutive_failures} consecutive failures.")
+            self.next_delay = self.cooldown
+            # Back off from scratch once the cool-down is over
+            self.consecutive_failures = 0
+        return True
+
+    def _check_stall(self) -> bool:
+        """Count iterations that changed nothing and escalate after stall_limit.
+
+        Returns False when the loop should stop.
+        """
+        if self.stall_limit <= 0 or self._fingerprint_before is None:
+            return True
+        if self._fingerprint() != self._fingerprint_before:
+            self.idle_iterations = 0
+            return True
+        self.idle_iterations += 1
+        self._log(f"Iteration changed nothing in the workspace or plan ({self.idle_iterations} in a row)")
+        if self.idle_iterations < self.stall_limit:
+            return True
+        if self.stall_action == "switch-model" and self.stall_model and self.model != self.stall_model:
+            self._log(f"Switching model from {self.model or 'the default'} to {self.stall_model} after {self.idle_iterations} idle iterations.")
+            self.model = self.stall_model
+            self.idle_iterations = 0
+            return True
+        if self.stall_action == "backoff":
+            self._log(f"Backing off for {self.cooldown}s after {self.idle_iterations} idle iterations.")
+            self.next_delay = max(self.next_delay, self.cooldown)
+            self.idle_iterations = 0
+            return True
+        self._log(f"Stopping: the last {self.idle_iterations} iterations changed nothing.")
+        return False
+
+    def _close_sinks(self):
+        if self._event_log is not None:
+            self._event_log.close()
+        self._log_sink.close()
+
+    def _uses_opencode_server(self) -> bool:
+        return self.agent.uses_opencode_server
+
+    def _prepare_run(self):
+        if self.show_banner:
+            self._print_ascii_art()
+        import os
+        self.prepare_ralphy_dir()
+        if self.working_dir and self.change_dir:
             try:
                 os.chdir(self.working_dir)
                 self._log(f"Changed working directory to: {self.working_dir}")
@@ -242,50 +1096,169 @@ class RalphLoop:
         
         self._log("Starting Ralph Loop...")
         self._log(f"Agent command: {self.agent_command}")
+        self._log(f"Agent adapter: {self.agent.name} (prompt via {self.agent.prompt_via})")
         self._log(f"Prompt file: {self.prompt_file}")
-        self._log(f"Delay between loops: {self.delay}s")
-        time.sleep(5)
-        if(self.agent_command.strip().startswith("opencode")):
+        if self.resume:
+            self.restore_checkpoint()
+        self._log(f"Delay between loops: {self.delay_policy.describe()}")
+        self._log(f"Iteration timeout: {self.iteration_timeout:.0f}s")
+        if self.total_budget > 0:
+            self._log(f"Total budget: {self.total_budget:.0f}s")
+        self._start_budget()
+        if self.stream_output:
+            self._log(f"Streaming agent output{' (stop on completion marker)' if self.stop_on_done else ''}")
+        if self.task_scheduler is not None:
+            self._log(f"Assigning one task per iteration from {self.task_scheduler.describe()}")
+        if self.plan_archiver is not None:
+            self._log(f"Archiving fix_plan items {self.plan_archiver.after} iterations after they are completed")
+        if self.track_usage:
+            limits = []
+            if self.max_tokens > 0:
+                limits.append(f"{self.max_tokens:,} tokens")
+            if self.max_cost > 0:
+                limits.append(f"${self.max_cost:.2f}")
+            self._log("Tracking token usage" + (f" (limit: {' and '.join(limits)})" if limits else ""))
+            if not self._json_output and not self.usage_regex:
+                self._log("This agent has no JSON output mode; pass --usage-regex to read usage from its output.")
+        if self.hedger is not None:
+            self._log(f"Hedging with backups {self.hedger.describe()}")
+        if self.verifier is not None:
+            self._log(f"Verifying each iteration with: {self.verifier.command}")
+        if self.snapshots is not None:
+            action = "rolling back" if self.snapshots.policy == "rollback" else "keeping"
+            self._log(f"Snapshotting the workspace to {self.snapshots.ref_prefix}/ before each iteration, {action} failed ones")
+        if self.reuse_session and not self.agent.supports_session_reuse:
+            self._log("This agent has no way to continue a session; every iteration starts a fresh one.")
+
+    def _iteration_allowed(self) -> bool:
+        if self.max_iterations > 0 and self.iteration >= self.max_iterations:
+            self._log(f"Reached max iterations ({self.max_iterations}). Stopping.")
+            return False
+        if self._budget_remaining() == 0:
+            self._log(f"Used up the total budget of {self.total_budget:.0f}s. Stopping.")
+            return False
+        if self._usage_limit_reached():
+            return False
+        return True
+
+    def _save_checkpoint(self):
+        from .state import save_state
+        budget_used = time.monotonic() - self.budget_started if self.budget_started is not None else 0.0
+        state = {
+            "worker": self.worker_id,
+            "agent_command": self.agent_command,
+            "model": self.model,
+            "iteration": self.iteration,
+            "consecutive_failures": self.consecutive_failures,
+            "session_runs": self._session_runs,
+            "idle_iterations": self.idle_iterations,
+            "budget_used_s": round(budget_used, 3),
+            "next_iteration_at": time.time() + self.next_delay,
+            "usage": self.usage_total.as_dict(),
+            "usage_iterations": self.usage_iterations,
+            "plan_completed_at": self.plan_archiver.completed_at if self.plan_archiver is not None else {},
+            "saved_at": datetime.now().isoformat(timespec="seconds"),
+            "history": self.history,
+        }
+        try:
+            save_state(self.state_file, state)
+        except OSError as e:
+            self._log(f"Could not save checkpoint to {self.state_file}: {e}")
+
+    def restore_checkpoint(self) -> bool:
+        """Pick up iteration count, failure streak and budget from state.json.
+
+        Returns False, leaving the loop as it is, when there is no usable
+        checkpoint.
+        """
+        from .state import load_state
+        try:
+            state = load_state(self.state_file)
+        except ValueError as e:
+            self._log(f"Ignoring checkpoint: {e}")
+            return False
+        if state is None:
+            self._log(f"No checkpoint at {self.state_file}. Starting from the beginning.")
+            return False
+        self.iteration = state.get("iteration", 0)
+        self.consecutive_failures = state.get("consecutive_failures", 0)
+        self._session_runs = state.get("session_runs", 0)
+        self.idle_iterations = state.get("idle_iterations", 0)
+        self.history = state.get("history", [])
+        from .usage import Usage
+        self.usage_total = Usage.from_dict(state.get("usage", {}))
+        self.usage_iterations = state.get("usage_iterations", 0)
+        if self.plan_archiver is not None:
+            self.plan_archiver.completed_at = state.get("plan_completed_at", {})
+        self.budget_started = time.monotonic() - state.get("budget_used_s", 0.0)
+        # Honour a backoff or cool-down that was still running, but skip the
+        # usual start-up wait
+        self.next_delay = max(state.get("next_iteration_at", 0) - time.time(), 0.0)
+        self._log(
+            f"Resuming after iteration {self.iteration} "
+            f"({self.consecutive_failures} consecutive failures, "
+            f"{state.get('budget_used_s', 0.0):.0f}s of budget used, saved {state.get('saved_at')})"
+        )
+        return True
+
+    def _after_iteration(self, success: bool, should_stop: bool) -> bool:
+        """Book-keeping after an iteration. Returns False when the loop should end."""
+        if self.snapshots is not None:
+            self.snapshots.end(success)
+        if self.verifier is not None and self.running:
+            self.verifier.start(self.iteration)
+        if should_stop:
+            self._log("Agent signaled completion. Exiting Ralph Loop.")
+            self._save_checkpoint()
+            return False
+        keep_going = self._schedule_next(success)
+        self._save_checkpoint()
+        if not keep_going:
+            return False
+        if self.running and self.next_delay > 0:
+            self._set_phase("waiting")
+            self._log(f"Waiting {self.next_delay:.1f}s before next iteration...")
+        return True
+
+    def run(self):
+        self._prepare_run()
+        self._start_metrics_server()
+        if self.next_delay > 0:
+            time.sleep(self.next_delay)
+        if self._uses_opencode_server():
             self.start_opencode_web_at_port()
+            self.wait_for_opencode_server()
         if not self._check_prerequisites():
             self._log("Prerequisites check failed. Exiting.")
             self._stop_opencode_server()
+            self._stop_metrics_server()
             return
-        consecutive_failures = 0
-        max_consecutive_failures = 5
         try:
             while self.running:
-                if self.max_iterations > 0 and self.iteration >= self.max_iterations:
-                    self._log(f"Reached max iterations ({self.max_iterations}). Stopping.")
+                if not self._iteration_allowed():
                     break
+                if self._uses_opencode_server():
+                    self.ensure_opencode_server()
                 success, should_stop = self.run_single_iteration()
-                if should_stop:
-                    self._log("Agent signaled completion. Exiting Ralph Loop.")
+                if not self._after_iteration(success, should_stop):
                     break
-                if success:
-                    consecutive_failures = 0
-                else:
-                    consecutive_failures += 1
-                    if consecutive_failures >= max_consecutive_failures:
-                        self._log(
-                            f"Too many consecutive failures ({consecutive_failures}). "
-                            "Consider checking the prompt or agent configuration."
-                        )
-                if self.running:
-                    self._log(f"Waiting {self.delay}s before next iteration...")
-                    time.sleep(self.delay)
+                if self.running and self.next_delay > 0:
+                    time.sleep(self.next_delay)
         finally:
-            if(self.agent_command.strip().startswith("opencode")):
+            if self._uses_opencode_server():
                 self._stop_opencode_server()
+            self._finish_verification()
+            self._set_phase("stopped")
+            self._stop_metrics_server()
         self._log(f"Ralph Loop stopped after {self.iteration} iterations.")
+        self._close_sinks()
 
     def copy_resource_files(self, os, shutil, base_dir, ralphy_dir, resource_files, resource_paths):
+        """Copy each resource into ralphy_dir, skipping those whose content is unchanged."""
+        from .resources import copy_if_changed
         for fname, src_path in zip(resource_files, resource_paths):
             dst_path = os.path.join(ralphy_dir, fname)
-            print("src_path:", src_path)
-            print("dst_path:", dst_path)
-            if os.path.exists(src_path):
-                shutil.copy2(src_path, dst_path)
-                self._log(f"Copied {fname} to {ralphy_dir}")
-            else:
+            if not os.path.exists(src_path):
                 self._log(f"Warning: {fname} not found in {base_dir}, not copied.")
+            elif copy_if_changed(src_path, dst_path):
+                self._log(f"Copied {fname} to {ralphy_dir}")
@@ -0,0 +1,78 @@
+import os
+
+# Files copied from the package into .ralphy/ by RalphLoop.prepare_ralphy_dir
+RESOURCE_FILES = ("agent.md", "fix_plan.md", "prompt.md")
+_CHUNK_SIZE = 1024 * 1024
+
+_paths = {}  # resource name -> resolved filesystem path
+_extracted = None  # ExitStack for files extracted from a zipped install
+
+
+def _extraction_stack():
+    global _extracted
+    if _extracted is None:
+        import atexit
+        import contextlib
+        _extracted = contextlib.ExitStack()
+        atexit.register(_extracted.close)
+    return _extracted
+
+
+def resource_path(name: str):
+    """Filesystem path of a file shipped in the package, or None if it is not there.
+
+    Resolved once per process. From a zipped install the file is extracted
+    to a temporary file, which is kept until the process exits.
+    """
+    path = _paths.get(name)
+    if path is not None:
+        return path
+    import importlib.resources
+    try:
+        resource = importlib.resources.files("oh_my_ralph").joinpath(name)
+        if not resource.is_file():
+            return None
+        if isinstance(resource, os.PathLike):
+            path = os.fspath(resource)
+        else:
+            path = str(_extraction_stack().enter_context(importlib.resources.as_file(resource)))
+    except (FileNotFoundError, ModuleNotFoundError):
+        return None
+    _paths[name] = path
+    return path
+
+
+def file_digest(path) -> str:
+    """SHA-256 of the file at ``path``, or None if it cannot be read."""
+    import hashlib
+    h = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+                h.update(chunk)
+    except OSError:
+        return None
+    return h.hexdigest()
+
+
+def copy_if_changed(src, dst) -> bool:
+    """Copy ``src`` over ``dst`` unless their contents are already the same.
+
+    The copy goes to a temporary file next to ``dst``, which is then
+    renamed over it, so anything reading ``dst`` at the same time sees
+    either the old file or the new one, never a half-written one.
+    Returns True if ``dst`` was written.
+    """
+    try:
+        same_size = os.path.getsize(src) == os.path.getsize(dst)
+    except OSError:
+        same_size = False
+    if same_size and file_digest(src) == file_digest(dst):
+        return False
+    import shutil
+    from .atomic_file import atomic_write
+    with atomic_write(dst, "wb") as out, open(src, "rb") as f:
+        shutil.copyfileobj(f, out, _CHUNK_SIZE)
+    # After the rename: the final flush on close would bump the mtime again
+    shutil.copystat(src, dst)
+    return True
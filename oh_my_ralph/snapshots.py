@@ -0,0 +1,157 @@
+import subprocess
+
+from .git_workspace import check_repo, commit_snapshot, git, loop_excludes, pathspec, snapshot_tree
+
+# What happens to the changes of an iteration that failed or timed out:
+# "off" takes no snapshots, "keep" snapshots but leaves the changes in
+# place, "rollback" puts the working dir back as it was before the iteration
+SNAPSHOT_POLICIES = ("off", "keep", "rollback")
+SNAPSHOT_REF_PREFIX = "refs/ralph"
+
+
+class IterationSnapshots:
+    """Snapshots the working dir before each iteration and rolls failed ones back.
+
+    Before every iteration the working dir, committed or not, is committed
+    to ``refs/ralph/<worker>/iterations/<N>`` (a throwaway commit, the same
+    kind Hedger and Verifier use; HEAD, the branch and the index are left
+    alone). After the iteration, its diff against that snapshot is counted
+    for events.jsonl. With the "rollback" policy a failed iteration is
+    undone: its end state is kept under ``refs/ralph/<worker>/failed/<N>``,
+    with any commits the agent made as its history, and then files, HEAD
+    and the index go back to where they were. ``.ralphy`` and the log file
+    are never touched, so what the agent wrote to agent.md and fix_plan.md
+    survives. Refs are kept for the last ``history`` iterations.
+    """
+
+    def __init__(self, loop, policy: str = "rollback", history: int = 20):
+        if policy not in SNAPSHOT_POLICIES:
+            raise ValueError(f"snapshot policy must be one of {', '.join(SNAPSHOT_POLICIES)}")
+        self.loop = loop
+        self.policy = policy
+        self.history = history
+        self.ref_prefix = f"{SNAPSHOT_REF_PREFIX}/{loop.worker_id}"
+        # The loop's own files stay out of snapshots and rollbacks
+        self.exclude = loop_excludes(loop)
+        self.before = None  # the snapshot taken before the current iteration
+        self.after_tree = None  # the end state of the current iteration, once counted
+        self._repo = None
+
+    def _check_repo(self) -> bool:
+        if self._repo is None:
+            self._repo = check_repo(
+                self.loop, "Iteration snapshots need a git repository with at least one commit; running without them"
+            )
+        return bool(self._repo)
+
+    def _ref(self, kind: str, iteration: int) -> str:
+        return f"{self.ref_prefix}/{kind}/{iteration}"
+
+    def begin(self, iteration: int):
+        """Snapshot the working dir before iteration ``iteration``."""
+        self.before = None
+        self.after_tree = None
+        if not self._check_repo():
+            return
+        work_dir = self.loop._workspace_root
+        try:
+            head = git(work_dir, "rev-parse", "HEAD")
+            tree = snapshot_tree(work_dir, self.exclude)
+            commit = commit_snapshot(work_dir, tree, f"ralph snapshot before iteration {iteration}")
+            git(work_dir, "update-ref", self._ref("iterations", iteration), commit)
+            self._prune(iteration)
+        except (subprocess.CalledProcessError, OSError) as e:
+            details = getattr(e, "stderr", None) or e
+            self.loop._log(f"Could not snapshot the workspace before iteration {iteration} ({details})")
+            return
+        try:
+            # Unmerged entries cannot be written as a tree; the index is then reset instead
+            index = git(work_dir, "write-tree")
+        except subprocess.CalledProcessError:
+            index = None
+        self.before = {"iteration": iteration, "head": head, "tree": tree, "commit": commit, "index": index}
+
+    def _prune(self, iteration: int):
+        oldest = iteration - self.history
+        if self.history <= 0 or oldest <= 0:
+            return
+        refs = git(self.loop._workspace_root, "for-each-ref", "--format=%(refname)", f"{self.ref_prefix}/")
+        for ref in refs.splitlines():
+            number = ref.rsplit("/", 1)[-1]
+            if number.isdigit() and int(number) <= oldest:
+                git(self.loop._workspace_root, "update-ref", "-d", ref)
+
+    def finish(self) -> dict:
+        """Count the current iteration's changes; returns fields for its event, or None."""
+        if self.before is None:
+            return None
+        work_dir = self.loop._workspace_root
+        try:
+            tree = snapshot_tree(work_dir, self.exclude)
+            # The agent may have committed .ralphy or the log; they stay out of the counts
+            numstat = git(
+                work_dir, "diff", "--numstat", "--no-renames", self.before["tree"], tree, *pathspec(self.exclude)
+            )
+        except (subprocess.CalledProcessError, OSError) as e:
+            details = getattr(e, "stderr", None) or e
+            self.loop._log(f"Could not count the changes of iteration {self.before['iteration']} ({details})")
+            return {"snapshot": self.before["commit"]}
+        self.after_tree = tree
+        files = insertions = deletions = 0
+        for line in numstat.splitlines():
+            added, removed, _ = line.split("\t", 2)
+            files += 1
+            # Binary files show "-" for both counts
+            insertions += int(added) if added.isdigit() else 0
+            deletions += int(removed) if removed.isdigit() else 0
+        return {
+            "snapshot": self.before["commit"],
+            "files_changed": files,
+            "insertions": insertions,
+            "deletions": deletions,
+        }
+
+    def end(self, success: bool) -> bool:
+        """Close the current iteration, rolling it back if it failed and the policy says so.
+
+        Returns True if it was rolled back.
+        """
+        try:
+            return not success and self.policy == "rollback" and self.rollback()
+        finally:
+            self.before = None
+            self.after_tree = None
+
+    def rollback(self) -> bool:
+        """Put the working dir back as it was before the current iteration.
+
+        Returns True if anything had to be undone.
+        """
+        before = self.before
+        if before is None:
+            return False
+        loop = self.loop
+        work_dir = loop._workspace_root
+        iteration = before["iteration"]
+        try:
+            head = git(work_dir, "rev-parse", "HEAD")
+            tree = self.after_tree or snapshot_tree(work_dir, self.exclude)
+            if tree == before["tree"] and head == before["head"]:
+                return False
+            # Keep what the iteration did, commits included, where it can be looked at
+            failed = commit_snapshot(work_dir, tree, f"ralph: changes of failed iteration {iteration}")
+            git(work_dir, "update-ref", self._ref("failed", iteration), failed)
+            git(work_dir, "restore", f"--source={before['commit']}", "--staged", "--worktree", *pathspec(self.exclude))
+            git(work_dir, "clean", "-fdq", *pathspec(self.exclude))
+            if head != before["head"]:
+                git(work_dir, "reset", "-q", "--soft", before["head"])
+            if before["index"] is not None:
+                git(work_dir, "read-tree", before["index"])
+            else:
+                git(work_dir, "reset", "-q")
+        except (subprocess.CalledProcessError, OSError) as e:
+            details = getattr(e, "stderr", None) or e
+            loop._log(f"Could not roll back iteration {iteration} ({details})")
+            return False
+        loop._log(f"Rolled back the changes of failed iteration {iteration}; they are kept in {self._ref('failed', iteration)}")
+        return True
@@ -0,0 +1,38 @@
+import json
+import os
+
+from .atomic_file import atomic_write
+
+STATE_VERSION = 1
+# Iterations kept in the checkpoint's timing history
+HISTORY_LENGTH = 50
+
+
+def save_state(path, state: dict):
+    """Write ``state`` to ``path`` as JSON, atomically.
+
+    The data goes to a temporary file in the same directory, which is
+    fsynced and then renamed over ``path``, so a crash at any point
+    leaves either the old checkpoint or the new one, never a torn file.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with atomic_write(path, "w", fsync=True, encoding="utf-8") as f:
+        json.dump({"version": STATE_VERSION, **state}, f, indent=2)
+
+
+def load_state(path):
+    """Read a checkpoint written by save_state.
+
+    Returns None when there is no checkpoint. Raises ValueError when the
+    file is unreadable or from an incompatible version.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, json.JSONDecodeError) as e:
+        raise ValueError(f"cannot read {path}: {e}") from e
+    if not isinstance(state, dict) or state.get("version") != STATE_VERSION:
+        raise ValueError(f"{path} is not a version {STATE_VERSION} checkpoint")
+    return state
@@ -0,0 +1,229 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+from .fix_plan import DONE, IN_PROGRESS, Task, TaskIndex
+
+QUEUED = "queued"
+LEASED = "leased"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id TEXT PRIMARY KEY,
+    text TEXT NOT NULL,
+    details TEXT NOT NULL DEFAULT '[]',
+    priority INTEGER,
+    position INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'queued',
+    lease_owner TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tasks_by_status ON tasks (status, lease_expires);
+CREATE TABLE IF NOT EXISTS task_sources (
+    task_id TEXT NOT NULL,
+    source TEXT NOT NULL,
+    PRIMARY KEY (task_id, source)
+);
+"""
+
+
+class SQLiteTaskQueue:
+    """A fix_plan backlog shared by loops on several hosts through one SQLite file.
+
+    A drop-in replacement for TaskScheduler. Open tasks from ``index``
+    (usually the loop's own fix_plan.md) are added to the queue on every
+    claim, so tasks can be added from any host; rows are keyed by the
+    task's id, so every host adding the same plan is harmless.
+
+    A claimed task is leased to this process for ``lease_timeout`` seconds.
+    A heartbeat thread renews the lease while the iteration runs, so it
+    only runs out when the worker dies or hangs; the task then goes back
+    to the queue for the next claim on any host. Finishing a task marks it
+    done, or re-queues it straight away when it is still open.
+
+    The queue records which hosts' plans list each task. A queued task that
+    has been dropped from every plan that listed it is retired (marked done)
+    rather than handed out again.
+
+    The database uses SQLite's default rollback journal and a busy timeout
+    rather than WAL, which does not work on network file systems.
+    """
+
+    def __init__(self, path, index: TaskIndex, lease_timeout: float = 600, heartbeat_interval: float = None,
+                 owner: str = None):
+        self.path = os.path.abspath(path)
+        self.index = index
+        self.lease_timeout = lease_timeout
+        self.heartbeat_interval = heartbeat_interval or max(lease_timeout / 3, 0.05)
+        # Distinguishes this process's leases from those of loops with the same
+        # worker id on other hosts or in other processes
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+        # Stable across restarts, unlike owner, so a plan keeps its tasks
+        self.source = f"{socket.gethostname()}:{os.path.abspath(index.path)}"
+        self._leases = {}  # worker id -> (Task, stop event)
+        self._lock = threading.Lock()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def describe(self) -> str:
+        return f"{self.path} (adding tasks from {self.index.path})"
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return _Connection(conn)
+
+    def _lease_owner(self, worker_id: str) -> str:
+        return f"{self.owner}:{worker_id}"
+
+    def _sync(self, conn, now: float):
+        """Add the plan's open tasks and close the ones it marks done or drops.
+
+        New tasks are ranked in the order the plan would hand them out, after
+        everything already queued.
+        """
+        self.index.refresh()
+        for task in self.index.tasks:
+            if task.status == DONE:
+                conn.execute(
+                    "UPDATE tasks SET status = ?, updated_at = ? WHERE id = ? AND status = ?",
+                    (DONE, now, task.id, QUEUED),
+                )
+        # A missing plan file says nothing about which tasks are finished
+        if self.index.path.exists():
+            self._retire_dropped(conn, now)
+        (last,) = conn.execute("SELECT COALESCE(MAX(position), 0) FROM tasks").fetchone()
+        for rank, task in enumerate(self.index.open_tasks(), start=last + 1):
+            conn.execute(
+                "INSERT OR IGNORE INTO tasks (id, text, details, priority, position, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (task.id, task.text, json.dumps(task.details), task.priority, rank, now, now),
+            )
+
+    def _retire_dropped(self, conn, now: float):
+        """Forget the tasks this plan no longer lists, and retire those no plan lists."""
+        listed = {task.id for task in self.index.tasks}
+        known = {row[0] for row in conn.execute("SELECT task_id FROM task_sources WHERE source = ?", (self.source,))}
+        for task_id in known - listed:
+            conn.execute("DELETE FROM task_sources WHERE task_id = ? AND source = ?", (task_id, self.source))
+            conn.execute(
+                "UPDATE tasks SET status = ?, updated_at = ? WHERE id = ? AND status = ? "
+                "AND NOT EXISTS (SELECT 1 FROM task_sources WHERE task_id = ?)",
+                (DONE, now, task_id, QUEUED, task_id),
+            )
+        conn.executemany(
+            "INSERT OR IGNORE INTO task_sources (task_id, source) VALUES (?, ?)",
+            [(task_id, self.source) for task_id in listed - known],
+        )
+
+    def claim(self, worker_id: str):
+        """Lease the most urgent available task to ``worker_id``.
+
+        Available means queued, or leased with an expired lease. Returns
+        None when nothing is available. A task the worker already holds is
+        released first.
+        """
+        self.finish(worker_id, completed=False)
+        owner = self._lease_owner(worker_id)
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._sync(conn, now)
+                row = conn.execute(
+                    "SELECT * FROM tasks WHERE status = ? OR (status = ? AND lease_expires < ?) "
+                    "ORDER BY position LIMIT 1",
+                    (QUEUED, LEASED, now),
+                ).fetchone()
+                if row is not None:
+                    conn.execute(
+                        "UPDATE tasks SET status = ?, lease_owner = ?, lease_expires = ?, attempts = attempts + 1, "
+                        "updated_at = ? WHERE id = ?",
+                        (LEASED, owner, now + self.lease_timeout, now, row["id"]),
+                    )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        task = Task(
+            id=row["id"],
+            text=row["text"],
+            status=IN_PROGRESS,
+            priority=row["priority"],
+            details=json.loads(row["details"]),
+        )
+        stop = threading.Event()
+        with self._lock:
+            self._leases[worker_id] = (task, stop)
+        threading.Thread(
+            target=self._heartbeat, args=(task.id, owner, stop), name=f"ralph-lease-{worker_id}", daemon=True
+        ).start()
+        return task
+
+    def _heartbeat(self, task_id: str, owner: str, stop: threading.Event):
+        while not stop.wait(self.heartbeat_interval):
+            try:
+                if not self.renew(task_id, owner):
+                    return  # the lease expired and someone else took the task
+            except sqlite3.Error:
+                pass  # try again at the next beat; the lease has some slack
+
+    def renew(self, task_id: str, owner: str) -> bool:
+        """Extend a lease. Returns False when ``owner`` no longer holds it."""
+        now = time.time()
+        with self._connect() as conn:
+            return conn.execute(
+                "UPDATE tasks SET lease_expires = ?, updated_at = ? WHERE id = ? AND status = ? AND lease_owner = ?",
+                (now + self.lease_timeout, now, task_id, LEASED, owner),
+            ).rowcount == 1
+
+    def finish(self, worker_id: str, completed: bool):
+        """End ``worker_id``'s lease: mark the task done, or put it back in the queue."""
+        with self._lock:
+            task, stop = self._leases.pop(worker_id, (None, None))
+        if task is None:
+            return None
+        stop.set()
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE tasks SET status = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ? "
+                "WHERE id = ? AND status = ? AND lease_owner = ?",
+                (DONE if completed else QUEUED, now, task.id, LEASED, self._lease_owner(worker_id)),
+            )
+        return task
+
+    def counts(self) -> dict:
+        """Number of tasks in each status, with expired leases counted as queued."""
+        now = time.time()
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT CASE WHEN status = ? AND lease_expires < ? THEN ? ELSE status END AS state, COUNT(*) "
+                "FROM tasks GROUP BY state",
+                (LEASED, now, QUEUED),
+            ).fetchall()
+        return {state: count for state, count in rows}
+
+
+class _Connection:
+    """Closes the sqlite3 connection on exit, which sqlite3's own context manager does not."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self.conn
+
+    def __exit__(self, *exc_info):
+        self.conn.close()
@@ -0,0 +1,210 @@
+import json
+import re
+from dataclasses import asdict, dataclass, fields
+
+# Named groups a --usage-regex may use; every match is added to the iteration's usage
+REGEX_GROUPS = ("input_tokens", "output_tokens", "cache_read_tokens", "cache_write_tokens", "tokens", "cost_usd")
+_NUMBER = re.compile(r"([0-9][0-9,]*(?:\.[0-9]+)?)\s*([kKmM]?)")
+_SUFFIXES = {"": 1, "k": 1_000, "m": 1_000_000}
+
+
+@dataclass
+class Usage:
+    """Tokens and dollars used by one iteration or a whole run.
+
+    ``other_tokens`` holds totals that an agent did not split into input
+    and output (a regex with a ``tokens`` group).
+    """
+
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cache_read_tokens: int = 0
+    cache_write_tokens: int = 0
+    other_tokens: int = 0
+    cost_usd: float = 0.0
+
+    @property
+    def total_tokens(self) -> int:
+        return (
+            self.input_tokens + self.output_tokens + self.cache_read_tokens
+            + self.cache_write_tokens + self.other_tokens
+        )
+
+    def __add__(self, other: "Usage") -> "Usage":
+        return Usage(*(getattr(self, f.name) + getattr(other, f.name) for f in fields(self)))
+
+    def as_dict(self) -> dict:
+        data = asdict(self)
+        data["cost_usd"] = round(self.cost_usd, 6)
+        data["total_tokens"] = self.total_tokens
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Usage":
+        return cls(**{f.name: data.get(f.name, f.default) for f in fields(cls)})
+
+    def describe(self) -> str:
+        return (
+            f"{self.total_tokens:,} tokens (in {self.input_tokens:,}, out {self.output_tokens:,}, "
+            f"cache {self.cache_read_tokens + self.cache_write_tokens:,}), ${self.cost_usd:.4f}"
+        )
+
+
+def _int(value) -> int:
+    return int(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else 0
+
+
+def _float(value) -> float:
+    return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else 0.0
+
+
+def _parse_number(text: str) -> float:
+    """``1,234`` -> 1234, ``2.3k`` -> 2300, ``$0.05`` -> 0.05."""
+    match = _NUMBER.search(text or "")
+    if not match:
+        return 0.0
+    return float(match.group(1).replace(",", "")) * _SUFFIXES[match.group(2).lower()]
+
+
+def _anthropic_usage(usage: dict, cost=None) -> Usage:
+    return Usage(
+        input_tokens=_int(usage.get("input_tokens")),
+        output_tokens=_int(usage.get("output_tokens")),
+        cache_read_tokens=_int(usage.get("cache_read_input_tokens")),
+        cache_write_tokens=_int(usage.get("cache_creation_input_tokens")),
+        cost_usd=_float(cost),
+    )
+
+
+class UsageMeter:
+    """Picks token and cost figures out of one agent run's stdout.
+
+    Fed the output as it arrives (see OutputCapture's ``observer``) and
+    parses it line by line:
+
+    - Claude Code and Amp ``stream-json``: the final ``result`` event, or
+      failing that the usage of each assistant message
+    - OpenCode ``--format json``: the tokens and cost of each ``step_finish``
+    - any other JSON line with a ``usage`` object or a cost field
+    - lines matching ``regex``, whose named groups (REGEX_GROUPS) are added up
+
+    With ``marker`` set it also looks for the completion marker, but only
+    in text the agent wrote (and in plain-text lines), not in tool output
+    echoed by JSON event streams, which may include the prompt itself.
+    """
+
+    def __init__(self, regex: str = None, marker: str = None):
+        self.regex = re.compile(regex) if regex else None
+        self.marker = marker
+        self.marker_seen = False
+        self.reported = False
+        self._pending = ""
+        self._result = None  # authoritative totals from a result event
+        self._messages = {}  # assistant message id -> Usage
+        self._steps = Usage()
+        self._other = Usage()
+
+    def feed(self, text: str):
+        if not text:
+            return
+        self._pending += text
+        *lines, self._pending = self._pending.split("\n")
+        for line in lines:
+            self._line(line)
+
+    def close(self):
+        """Parse a final line that had no newline."""
+        if self._pending:
+            line, self._pending = self._pending, ""
+            self._line(line)
+
+    def add(self, usage: Usage):
+        """Count usage reported elsewhere, e.g. by hedged runs that lost the race."""
+        self.reported = True
+        self._other = self._other + usage
+
+    def usage(self) -> Usage:
+        if self._result is not None:
+            return self._result + self._other
+        total = self._steps + self._other
+        for message_usage in self._messages.values():
+            total = total + message_usage
+        return total
+
+    def _check_marker(self, text):
+        if self.marker and isinstance(text, str) and self.marker in text:
+            self.marker_seen = True
+
+    def _line(self, line: str):
+        stripped = line.strip()
+        event = None
+        if stripped.startswith("{"):
+            try:
+                event = json.loads(stripped)
+            except ValueError:
+                event = None
+        if isinstance(event, dict):
+            self._event(event)
+        else:
+            self._check_marker(line)
+        if self.regex is not None:
+            match = self.regex.search(line)
+            if match:
+                self._regex_match(match)
+
+    def _regex_match(self, match):
+        groups = {name: value for name, value in match.groupdict().items() if value is not None}
+        found = Usage(
+            input_tokens=int(_parse_number(groups.get("input_tokens"))),
+            output_tokens=int(_parse_number(groups.get("output_tokens"))),
+            cache_read_tokens=int(_parse_number(groups.get("cache_read_tokens"))),
+            cache_write_tokens=int(_parse_number(groups.get("cache_write_tokens"))),
+            other_tokens=int(_parse_number(groups.get("tokens"))),
+            cost_usd=_parse_number(groups.get("cost_usd")),
+        )
+        if groups:
+            self.reported = True
+            self._other = self._other + found
+
+    def _event(self, event: dict):
+        kind = event.get("type")
+        if kind == "result":
+            self._check_marker(event.get("result"))
+            if isinstance(event.get("usage"), dict) or "total_cost_usd" in event:
+                self.reported = True
+                self._result = _anthropic_usage(
+                    event.get("usage") or {}, event.get("total_cost_usd", event.get("cost_usd"))
+                )
+            return
+        if kind == "assistant" and isinstance(event.get("message"), dict):
+            message = event["message"]
+            for block in message.get("content") or []:
+                if isinstance(block, dict) and block.get("type") == "text":
+                    self._check_marker(block.get("text"))
+            if isinstance(message.get("usage"), dict):
+                self.reported = True
+                # The same message is repeated once per content block
+                self._messages[message.get("id") or len(self._messages)] = _anthropic_usage(message["usage"])
+            return
+        part = event.get("part") if isinstance(event.get("part"), dict) else {}
+        if kind == "text":
+            self._check_marker(part.get("text"))
+            return
+        if kind == "step_finish":
+            tokens = part.get("tokens") or {}
+            cache = tokens.get("cache") or {}
+            self.reported = True
+            self._steps = self._steps + Usage(
+                input_tokens=_int(tokens.get("input")),
+                output_tokens=_int(tokens.get("output")) + _int(tokens.get("reasoning")),
+                cache_read_tokens=_int(cache.get("read")),
+                cache_write_tokens=_int(cache.get("write")),
+                cost_usd=_float(part.get("cost")),
+            )
+            return
+        if kind in ("user", "system", "tool_use", "tool_result", "step_start"):
+            return
+        cost = next((event[key] for key in ("total_cost_usd", "cost_usd", "cost") if key in event), None)
+        if isinstance(event.get("usage"), dict) or cost is not None:
+            self.reported = True
+            self._other = self._other + _anthropic_usage(event.get("usage") or {}, cost)
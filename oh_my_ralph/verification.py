@@ -0,0 +1,221 @@
+import os
+import subprocess
+import threading
+import time
+from pathlib import Path
+
+from .git_workspace import check_repo, commit_snapshot, create_detached_worktree, git, loop_excludes, snapshot_tree
+from .process_group import kill_process_tree, new_process_group_kwargs, signal_process_tree
+
+# Characters kept from the end of the test output, for the prompt and events.jsonl
+VERIFY_OUTPUT_CHARS = 4000
+
+VERIFICATION_SECTION = """
+
+## Verification
+
+The orchestrator ran `{command}` on the code as iteration {iteration} left it. {status}
+Fix any failures before starting new work. You do not need to run the whole
+test suite yourself just to find out where things stand. The full output is in
+`.ralphy/verify.log`; the end of it:
+
+```
+{output}
+```
+"""
+
+
+def describe_result(result: dict) -> str:
+    if result["exit_code"] is None:
+        return f"It could not be run: {result['output']}"
+    if result["timed_out"]:
+        return f"It timed out after {result['duration_s']:.0f}s."
+    if result["passed"]:
+        return "It passed."
+    return f"It failed with exit code {result['exit_code']}."
+
+
+class Verifier:
+    """Runs a test command on what each iteration left while the next one runs.
+
+    After every iteration the working dir is snapshotted, committed or not,
+    the way Hedger does it, and ``command`` runs in a shell on that snapshot
+    in a git worktree of its own (``<working-dir>-verify/verify`` by
+    default), so the next iteration can start straight away. One snapshot
+    is verified at a time: one taken while a run is going waits for it and
+    is replaced if a newer one arrives first. A snapshot identical to the
+    last one verified is not verified again. Without a git repository the
+    command runs in the working dir itself, before the next iteration.
+
+    The loop collects finished results with ``take_results`` and hands the
+    latest to the agent in its next prompt. The full output of the last run
+    is kept in ``.ralphy/verify.log``.
+    """
+
+    def __init__(self, loop, command: str, timeout: float = 1800, worktree_root=None):
+        self.loop = loop
+        self.command = command
+        self.timeout = timeout
+        self.worktree_root = Path(
+            worktree_root if worktree_root else f"{loop._workspace_root.rstrip(os.sep)}-verify"
+        ).resolve()
+        self.output_file = os.path.join(loop.ralphy_dir, "verify.log")
+        # The loop's own files stay out of snapshots
+        self.exclude = loop_excludes(loop)
+        self._lock = threading.Lock()
+        self._busy = False
+        self._thread = None
+        self._pending = None  # (iteration, snapshot commit) waiting for the running one
+        self._results = []  # finished and not yet taken
+        self._proc = None
+        self._cancelled = False
+        self._last_tree = None
+        self._repo = None  # (top level, prefix of the working dir), once checked
+
+    def _check_repo(self) -> bool:
+        if self._repo is None:
+            self._repo = check_repo(
+                self.loop,
+                "Verifying alongside the next iteration needs a git repository with at least one commit; "
+                "verifying in the working dir between iterations instead",
+            )
+        return bool(self._repo)
+
+    def start(self, iteration: int):
+        """Verify the working dir as iteration ``iteration`` left it."""
+        loop = self.loop
+        if self._cancelled:
+            return
+        if not self._check_repo():
+            loop._log(f"Verifying iteration {iteration}: {self.command}")
+            self._finish(self._run_command(iteration, None, loop._workspace_root))
+            return
+        try:
+            tree = snapshot_tree(loop._workspace_root, self.exclude)
+            if tree == self._last_tree:
+                loop._log(f"Iteration {iteration} changed nothing since the last verified one; not verifying again")
+                return
+            commit = commit_snapshot(loop._workspace_root, tree, "ralph verify snapshot")
+        except (subprocess.CalledProcessError, OSError) as e:
+            details = getattr(e, "stderr", None) or e
+            loop._log(f"Could not snapshot the workspace to verify iteration {iteration} ({details})")
+            return
+        self._last_tree = tree
+        job = (iteration, commit)
+        with self._lock:
+            if self._busy:
+                if self._pending is not None:
+                    loop._log(f"Skipping verification of iteration {self._pending[0]}; iteration {iteration} is newer")
+                self._pending = job
+                loop._log(f"Verification of iteration {iteration} will start once the running one finishes")
+                return
+            self._busy = True
+        loop._log(f"Verifying iteration {iteration} in the background: {self.command}")
+        self._thread = threading.Thread(target=self._work, args=(job,), name="ralph-verify", daemon=True)
+        self._thread.start()
+
+    def _work(self, job):
+        while True:
+            result = self._verify(*job)
+            with self._lock:
+                self._results.append(result)
+                job, self._pending = self._pending, None
+                if job is None or self._cancelled:
+                    self._busy = False
+                    return
+            self.loop._log(f"Verifying iteration {job[0]} in the background: {self.command}")
+
+    def _verify(self, iteration: int, commit: str) -> dict:
+        top, prefix = self._repo
+        worktree = self.worktree_root / "verify"
+        try:
+            self.worktree_root.mkdir(parents=True, exist_ok=True)
+            create_detached_worktree(top, str(worktree))
+            git(str(worktree), "reset", "-q", "--hard", commit)
+            # Ignored files, such as build caches, are kept between runs
+            git(str(worktree), "clean", "-fdq")
+        except (subprocess.CalledProcessError, OSError) as e:
+            details = getattr(e, "stderr", None) or e
+            return self._result(iteration, commit, None, 0.0, f"could not check out the snapshot ({details})".strip())
+        return self._run_command(iteration, commit, os.path.join(str(worktree), prefix))
+
+    def _run_command(self, iteration: int, commit, cwd: str) -> dict:
+        start = time.monotonic()
+        timed_out = False
+        try:
+            os.makedirs(os.path.dirname(self.output_file), exist_ok=True)
+            with open(self.output_file, "w", encoding="utf-8", errors="replace") as out:
+                self._proc = subprocess.Popen(
+                    self.command,
+                    shell=True,
+                    cwd=cwd,
+                    stdin=subprocess.DEVNULL,
+                    stdout=out,
+                    stderr=subprocess.STDOUT,
+                    **new_process_group_kwargs(),
+                )
+                try:
+                    exit_code = self._proc.wait(timeout=self.timeout)
+                except subprocess.TimeoutExpired:
+                    kill_process_tree(self._proc)
+                    exit_code = self._proc.wait()
+                    timed_out = True
+        except OSError as e:
+            return self._result(iteration, commit, None, time.monotonic() - start, str(e))
+        finally:
+            self._proc = None
+        return self._result(iteration, commit, exit_code, time.monotonic() - start, self._output_tail(), timed_out)
+
+    def _output_tail(self) -> str:
+        with open(self.output_file, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(f.tell() - VERIFY_OUTPUT_CHARS, 0))
+            return f.read().decode("utf-8", errors="replace")
+
+    def _result(self, iteration, commit, exit_code, duration, output, timed_out=False) -> dict:
+        return {
+            "iteration": iteration,
+            "command": self.command,
+            "commit": commit,
+            "exit_code": exit_code,
+            "passed": exit_code == 0 and not timed_out,
+            "timed_out": timed_out,
+            "duration_s": round(duration, 3),
+            "output": output,
+        }
+
+    def _finish(self, result: dict):
+        with self._lock:
+            self._results.append(result)
+
+    def take_results(self) -> list[dict]:
+        """Results finished since the last call, oldest first."""
+        with self._lock:
+            results, self._results = self._results, []
+        return results
+
+    def wait(self):
+        """Wait for the running verification, and any queued after it, to finish."""
+        thread = self._thread
+        if thread is not None:
+            thread.join()
+
+    def cancel(self, signum=None):
+        """Drop queued verifications and stop the running one."""
+        self._cancelled = True
+        with self._lock:
+            self._pending = None
+        proc = self._proc
+        if proc is not None and proc.poll() is None:
+            if signum is None:
+                kill_process_tree(proc)
+            else:
+                signal_process_tree(proc, signum)
+
+    def prompt_section(self, result: dict) -> str:
+        return VERIFICATION_SECTION.format(
+            command=self.command,
+            iteration=result["iteration"],
+            status=describe_result(result),
+            output=result["output"].strip() or "(no output)",
+        )
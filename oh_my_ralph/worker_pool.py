@@ -0,0 +1,298 @@
+import os
+import signal
+import subprocess
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from .log_sink import LogSink
+from .process_group import signal_process_tree
+from .ralph_loop import RalphLoop
+
+
+def create_worktree(repo_dir: str, path: str, branch: str):
+    """Create a git worktree at ``path`` checked out on ``branch``.
+
+    An existing worktree is reused as is. A missing branch is created from
+    the current HEAD of ``repo_dir``; an existing one is checked out without
+    being reset, so work from earlier runs is kept.
+    """
+    if os.path.exists(os.path.join(path, ".git")):
+        return
+    branch_exists = subprocess.run(
+        ["git", "rev-parse", "--verify", "--quiet", f"refs/heads/{branch}"],
+        cwd=repo_dir,
+        capture_output=True,
+        text=True,
+    ).returncode == 0
+    if branch_exists:
+        cmd = ["git", "worktree", "add", path, branch]
+    else:
+        cmd = ["git", "worktree", "add", "-b", branch, path, "HEAD"]
+    subprocess.run(cmd, cwd=repo_dir, check=True, capture_output=True, text=True)
+
+
+class WorkerPool:
+    """Run several Ralph loops at once, each in its own git worktree.
+
+    ``max_iterations`` and the DONE marker apply to the pool as a whole: the
+    workers share one iteration budget, and a completion marker from any
+    worker stops all of them once their current iteration ends. Each worker
+    logs to its own file (``ralph.worker-N.log``); ``log_file`` only gets
+    pool-level messages. With ``assign_tasks`` the workers share one
+    TaskScheduler over the working dir's fix_plan.md, so no two workers are
+    given the same item at once. With ``metrics_port`` one metrics server
+    covers every worker, labelled ``worker="worker-N"``.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        working_dir: str = None,
+        worktree_root: str = None,
+        log_file: str = "ralph.log",
+        max_iterations: int = 0,  # 0 = infinite
+        delay_between_loops: int = 5,
+        opencode_port: int = 8089,
+        assign_tasks: bool = False,
+        **loop_options,
+    ):
+        self.workers = workers
+        self.working_dir = os.path.abspath(working_dir) if working_dir else os.getcwd()
+        self.worktree_root = Path(
+            worktree_root
+            if worktree_root
+            else f"{self.working_dir.rstrip(os.sep)}-worktrees"
+        ).resolve()
+        # Absolute, so worker logs sit next to it rather than in the worktrees
+        self.log_file = Path(log_file).resolve()
+        self._log_sink = LogSink(
+            self.log_file,
+            flush_interval=loop_options.get("log_flush_interval", 0.0),
+            max_bytes=loop_options.get("log_max_bytes", 0),
+            max_age=loop_options.get("log_max_age", 0),
+            backups=loop_options.get("log_backups", 5),
+            compress=loop_options.get("log_compress", False),
+        )
+        self.max_iterations = max_iterations
+        self.delay = delay_between_loops
+        self.opencode_port = opencode_port
+        # The pool serves metrics for all workers; loops must not bind the port
+        self.metrics_port = loop_options.pop("metrics_port", None)
+        self.metrics_host = loop_options.pop("metrics_host", "127.0.0.1")
+        self._metrics_server = None
+        self.loop_options = loop_options
+        self.task_scheduler = None
+        plan = Path(self.working_dir) / ".ralphy" / "fix_plan.md"
+        if loop_options.get("task_queue"):
+            from .fix_plan import TaskIndex
+            from .task_queue import SQLiteTaskQueue
+            self.task_scheduler = SQLiteTaskQueue(
+                loop_options["task_queue"], TaskIndex(plan), lease_timeout=loop_options.get("lease_timeout", 600)
+            )
+        elif assign_tasks:
+            from .fix_plan import TaskIndex, TaskScheduler
+            self.task_scheduler = TaskScheduler(TaskIndex(plan))
+        self.loops = []
+        self.iterations_started = 0
+        self.successes = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def _log(self, message: str):
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        log_entry = f"[{timestamp}] {message}"
+        if not self.loop_options.get("quiet"):
+            print(log_entry)
+        self._log_sink.write(log_entry)
+
+    def _signal_handler(self, signum, frame):
+        print(f"\n[Ralph] Received shutdown signal. Finishing current iterations...")
+        for loop in self.loops:
+            if loop._agent_proc is not None:
+                signal_process_tree(loop._agent_proc, signum)
+            if loop.verifier is not None:
+                loop.verifier.cancel(signum)
+        self.stop()
+
+    def stop(self):
+        self._stop.set()
+        for loop in self.loops:
+            loop.running = False
+            loop._log_sink.flush()
+        self._log_sink.flush()
+
+    def _worker_log_file(self, index: int) -> str:
+        return str(self.log_file.with_name(f"{self.log_file.stem}.worker-{index}{self.log_file.suffix}"))
+
+    def _uses_opencode(self) -> bool:
+        return any(loop._uses_opencode_server() for loop in self.loops)
+
+    def _claim_iteration(self) -> bool:
+        with self._lock:
+            if self._stop.is_set():
+                return False
+            if self.max_iterations > 0 and self.iterations_started >= self.max_iterations:
+                return False
+            self.iterations_started += 1
+            return True
+
+    def _seed_ralphy_dir(self, path: str):
+        """Copy the working dir's .ralphy files into a worktree that lacks them.
+
+        .ralphy is usually not committed, so a new worktree has none and
+        prepare_ralphy_dir would fill it with the package templates. Files
+        a worktree already has, from a commit or an earlier run, are kept.
+        """
+        import shutil
+        from .resources import RESOURCE_FILES
+        source_dir = os.path.join(self.working_dir, ".ralphy")
+        target_dir = os.path.join(path, ".ralphy")
+        for name in RESOURCE_FILES:
+            source = os.path.join(source_dir, name)
+            target = os.path.join(target_dir, name)
+            if os.path.exists(source) and not os.path.exists(target):
+                os.makedirs(target_dir, exist_ok=True)
+                shutil.copyfile(source, target)
+
+    def _create_loops(self):
+        self.worktree_root.mkdir(parents=True, exist_ok=True)
+        for index in range(1, self.workers + 1):
+            path = str(self.worktree_root / f"worker-{index}")
+            branch = f"ralph/worker-{index}"
+            try:
+                create_worktree(self.working_dir, path, branch)
+            except (subprocess.CalledProcessError, OSError) as e:
+                details = getattr(e, "stderr", None) or e
+                self._log(f"Failed to create worktree for worker-{index}: {details}")
+                continue
+            self._seed_ralphy_dir(path)
+            metrics = None
+            if self.metrics_port is not None:
+                from .metrics import LoopMetrics
+                metrics = LoopMetrics(f"worker-{index}")
+            options = dict(self.loop_options)
+            if options.get("verify_root"):
+                # One verify worktree per worker
+                options["verify_root"] = str(Path(options["verify_root"]) / f"worker-{index}")
+            loop = RalphLoop(
+                working_dir=path,
+                log_file=self._worker_log_file(index),
+                opencode_port=self.opencode_port + index - 1,
+                delay_between_loops=self.delay,
+                install_signal_handlers=False,
+                log_prefix=f"[worker-{index}] ",
+                task_scheduler=self.task_scheduler,
+                worker_id=f"worker-{index}",
+                metrics=metrics,
+                **options,
+            )
+            loop.prepare_ralphy_dir()
+            if loop.resume:
+                loop.restore_checkpoint()
+            if not loop._check_prerequisites():
+                self._log(f"Prerequisites check failed for worker-{index}. Skipping it.")
+                continue
+            self._log(f"worker-{index} ready in {path} (branch {branch})")
+            self.loops.append(loop)
+        # Resumed workers have already used part of the shared budget
+        self.iterations_started = sum(loop.iteration for loop in self.loops)
+
+    def _work(self, loop: RalphLoop):
+        try:
+            if loop.resume and loop.next_delay > 0:
+                # A backoff or cool-down still running when the pool stopped
+                loop._set_phase("waiting")
+                self._stop.wait(loop.next_delay)
+            while loop.running:
+                # Per-worker limits (total budget, tokens and cost) are checked
+                # first, so a worker that stops on its own leaves the pool's
+                # iterations to the others
+                if not loop._iteration_allowed() or not self._claim_iteration():
+                    break
+                if loop._uses_opencode_server():
+                    loop.ensure_opencode_server()
+                success, should_stop = loop.run_single_iteration()
+                with self._lock:
+                    if success:
+                        self.successes += 1
+                    else:
+                        self.failures += 1
+                # The same book-keeping as a single loop: snapshots, checkpoint, next delay
+                if not loop._after_iteration(success, should_stop):
+                    if should_stop:
+                        self._log(f"{loop.log_prefix.strip()} signaled completion. Stopping all workers.")
+                        self.stop()
+                    break
+                if loop.running and not self._stop.is_set() and loop.next_delay > 0:
+                    self._stop.wait(loop.next_delay)
+        except Exception as e:
+            self._log(f"{loop.log_prefix.strip()} crashed: {e}")
+        finally:
+            loop._finish_verification()
+            loop._set_phase("stopped")
+
+    def _start_metrics_server(self):
+        if self.metrics_port is None:
+            return
+        from .metrics import MetricsServer
+        try:
+            self._metrics_server = MetricsServer(
+                self.metrics_port, [loop.metrics for loop in self.loops], host=self.metrics_host
+            )
+            self._metrics_server.start()
+            self._log(f"Serving metrics on http://{self.metrics_host}:{self._metrics_server.port}/metrics")
+        except OSError as e:
+            self._log(f"Failed to start metrics server on port {self.metrics_port}: {e}")
+            self._metrics_server = None
+
+    def run(self):
+        signal.signal(signal.SIGINT, self._signal_handler)
+        signal.signal(signal.SIGTERM, self._signal_handler)
+        self._log(f"Starting worker pool with {self.workers} workers under {self.worktree_root}")
+        if self.task_scheduler is not None:
+            self._log(f"Assigning fix_plan tasks from {self.task_scheduler.describe()}")
+        self._create_loops()
+        if not self.loops:
+            self._log("No workers could be started. Exiting.")
+            self._log_sink.close()
+            return
+        self._start_metrics_server()
+        if self._uses_opencode():
+            for loop in self.loops:
+                loop.start_opencode_web_at_port()
+            for loop in self.loops:
+                loop.wait_for_opencode_server()
+        start_time = time.time()
+        for loop in self.loops:
+            loop._start_budget()
+        threads = [
+            threading.Thread(target=self._work, args=(loop,), name=loop.log_prefix.strip(), daemon=True)
+            for loop in self.loops
+        ]
+        try:
+            for thread in threads:
+                thread.start()
+            # Join with a timeout so the main thread keeps handling signals
+            while any(thread.is_alive() for thread in threads):
+                for thread in threads:
+                    thread.join(timeout=0.5)
+        finally:
+            if self._uses_opencode():
+                for loop in self.loops:
+                    loop._stop_opencode_server()
+            if self._metrics_server is not None:
+                self._metrics_server.stop()
+        elapsed = time.time() - start_time
+        finished = self.successes + self.failures
+        per_hour = finished / elapsed * 3600 if elapsed > 0 else 0.0
+        self._log(
+            f"Worker pool stopped after {finished} iterations in {elapsed:.1f}s "
+            f"({per_hour:.1f} iterations/hour, {self.successes} succeeded, {self.failures} failed)."
+        )
+        self._log("Each worker's changes are on its ralph/worker-N branch.")
+        for loop in self.loops:
+            loop._close_sinks()
+        self._log_sink.close()
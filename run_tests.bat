@@ -1,3 +1,25 @@
 @echo off
 python test_ralph.py -v
-python test_cli_model_required.py -v
\ No newline at end of file
+python test_cli_model_required.py -v
+python test_output_capture.py -v
+python test_worker_pool.py -v
+python test_fix_plan.py -v
+python test_async_loop.py -v
+python test_log_sink.py -v
+python test_metrics.py -v
+python test_delay_policy.py -v
+python test_opencode_server.py -v
+python test_process_group.py -v
+python test_state.py -v
+python test_fingerprint.py -v
+python test_agents.py -v
+python test_benchmarks.py -v
+python test_daemon.py -v
+python test_task_queue.py -v
+python test_usage.py -v
+python test_hedging.py -v
+python test_resources.py -v
+python test_verification.py -v
+python test_snapshots.py -v
+python test_git_workspace.py -v
+python test_atomic_file.py -v
\ No newline at end of file
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""Unit tests for agents.py"""
+
+import os
+import sys
+import unittest
+from unittest.mock import Mock, patch
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from oh_my_ralph import agents
+from oh_my_ralph.agents import (
+    ADAPTERS,
+    AgentAdapter,
+    AiderAdapter,
+    AmpAdapter,
+    ClaudeAdapter,
+    CopilotAdapter,
+    OpenCodeAdapter,
+    program_name,
+    register_adapter,
+    resolve_adapter,
+)
+
+
+class TestAdapterResolution(unittest.TestCase):
+    """Test cases for picking an adapter from the agent command."""
+
+    def test_builtin_agents(self):
+        """Test each supported CLI resolves to its adapter."""
+        cases = {
+            "opencode run": OpenCodeAdapter,
+            "claude -p": ClaudeAdapter,
+            "copilot -p": CopilotAdapter,
+            "npx --yes @sourcegraph/amp": AmpAdapter,
+            "aider --yes-always": AiderAdapter,
+            "my-agent --flag": AgentAdapter,
+        }
+        for command, adapter_class in cases.items():
+            self.assertIs(type(resolve_adapter(command)), adapter_class, command)
+
+    def test_program_not_substring(self):
+        """Test the program name decides, not substrings elsewhere in the command."""
+        self.assertIs(type(resolve_adapter("/opt/claude-tools/aider")), AiderAdapter)
+        self.assertIs(type(resolve_adapter("my-agent --notes copilot.md")), AgentAdapter)
+        self.assertEqual(program_name(["/usr/bin/claude"]), "claude")
+
+    def test_registered_adapter_takes_precedence(self):
+        """Test third-party adapters are checked before the built-in ones."""
+        class MyClaude(ClaudeAdapter):
+            name = "my-claude"
+
+            @classmethod
+            def matches(cls, argv):
+                return program_name(argv) == "claude" and "--my" in argv
+
+        register_adapter(MyClaude)
+        try:
+            self.assertIs(type(resolve_adapter("claude --my")), MyClaude)
+            self.assertIs(type(resolve_adapter("claude -p")), ClaudeAdapter)
+        finally:
+            ADAPTERS.remove(MyClaude)
+
+    def test_entry_point_adapters(self):
+        """Test adapters exposed through entry points are registered once."""
+        class PluginAdapter(AgentAdapter):
+            name = "plugin"
+
+            @classmethod
+            def matches(cls, argv):
+                return program_name(argv) == "plugin-agent"
+
+        good = Mock()
+        good.load.return_value = PluginAdapter
+        broken = Mock()
+        broken.name = "broken"
+        broken.load.side_effect = ImportError("missing dependency")
+        with patch.object(agents, "_entry_points_loaded", False):
+            with patch("importlib.metadata.entry_points", return_value=[good, broken]) as mock_entry_points:
+                try:
+                    self.assertIs(type(resolve_adapter("plugin-agent")), PluginAdapter)
+                    resolve_adapter("plugin-agent")
+                finally:
+                    ADAPTERS.remove(PluginAdapter)
+        mock_entry_points.assert_called_once_with(group="oh_my_ralph.agents")
+
+
+class TestAdapterArgv(unittest.TestCase):
+    """Test cases for the argv each adapter builds."""
+
+    def test_opencode_argv(self):
+        """Test opencode gets model, session, attach URL and the instruction."""
+        adapter = resolve_adapter("opencode run", opencode_port=8089)
+        argv = adapter.build_argv("/w/.ralphy/prompt.md", model="m", continue_session=True)
+        self.assertEqual(argv[:-1], ["opencode", "run", "--model", "m", "--continue", "--attach", "http://localhost:8089"])
+        self.assertEqual(argv[-1], "Read and follow the instructions in the file `/w/.ralphy/prompt.md`.")
+        self.assertTrue(adapter.supports_stream_json)
+
+    def test_copilot_flags_before_user_flags(self):
+        """Test copilot's own flags go before flags from the command."""
+        argv = resolve_adapter("copilot -p").build_argv("p.md", model="gpt-4")
+        self.assertEqual(argv[:-1], ["copilot", "--model", "gpt-4", "--yolo", "-p"])
+        self.assertFalse(resolve_adapter("copilot -p").supports_stream_json)
+
+    def test_quoted_arguments_kept_whole(self):
+        """Test quoting in the command is honoured without a shell."""
+        adapter = resolve_adapter('my-agent --system "be brief"')
+        self.assertEqual(adapter.build_argv("p.md"), ["my-agent", "--system", "be brief"])
+        self.assertEqual(adapter.prompt_via, "stdin")
+        self.assertFalse(adapter.supports_session_reuse)
+
+    def test_amp_has_no_session_reuse(self):
+        """Test amp never gets a continue flag."""
+        argv = resolve_adapter("npx --yes @sourcegraph/amp").build_argv("p.md", continue_session=True)
+        self.assertNotIn("--continue", argv)
+        self.assertIn("--dangerously-allow-all", argv)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""Unit tests for async_loop.py"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import AsyncMock, Mock, patch
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from oh_my_ralph.async_loop import AsyncRalphLoop
+
+
+class FakeProcess:
+    """Stand-in for asyncio.subprocess.Process fed from in-memory data."""
+
+    def __init__(self, stdout=b"", stderr=b"", returncode=0, exits=True):
+        self.stdout = asyncio.StreamReader()
+        self.stderr = asyncio.StreamReader()
+        self.stdin = Mock()
+        self.stdin.drain = AsyncMock()
+        self.stdout.feed_data(stdout)
+        self.stderr.feed_data(stderr)
+        self._final_returncode = returncode
+        self.returncode = None
+        self._exited = asyncio.Event()
+        self.terminate = Mock(side_effect=self._finish)
+        self.kill = Mock(side_effect=self._finish)
+        if exits:
+            self._finish()
+
+    def _finish(self):
+        if not self.stdout.at_eof():
+            self.stdout.feed_eof()
+            self.stderr.feed_eof()
+        self.returncode = self._final_returncode
+        self._exited.set()
+
+    async def wait(self):
+        await self._exited.wait()
+        return self.returncode
+
+
+class TestAsyncRalphLoop(unittest.TestCase):
+    """Test cases for AsyncRalphLoop. Subprocesses are always mocked."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.original_cwd = os.getcwd()
+        self.temp_dir = tempfile.mkdtemp()
+        self.log_file = os.path.join(self.temp_dir, "test.log")
+        prompt_file = os.path.join(self.temp_dir, ".ralphy", "prompt.md")
+        os.makedirs(os.path.dirname(prompt_file), exist_ok=True)
+        with open(prompt_file, "w", encoding="utf-8") as f:
+            f.write("Test prompt content")
+        self.signal_patcher = patch("oh_my_ralph.ralph_loop.signal.signal")
+        self.signal_patcher.start()
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        import shutil
+        self.signal_patcher.stop()
+        os.chdir(self.original_cwd)
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _loop(self, **kwargs):
+        return AsyncRalphLoop(working_dir=self.temp_dir, log_file=self.log_file, **kwargs)
+
+    def _run_with_process(self, ralph, make_process, coro_name="run_single_iteration"):
+        async def scenario():
+            process = make_process()
+            with patch("oh_my_ralph.async_loop.asyncio.create_subprocess_exec", AsyncMock(return_value=process)) as spawn:
+                result = await getattr(ralph, coro_name)()
+            return result, process, spawn
+        return asyncio.run(scenario())
+
+    def test_single_iteration_success(self):
+        """Test a successful iteration returns the same tuple as RalphLoop."""
+        ralph = self._loop(agent_command="claude -p")
+        (success, should_stop), _, spawn = self._run_with_process(ralph, lambda: FakeProcess(b"all good\n"))
+
+        self.assertTrue(success)
+        self.assertFalse(should_stop)
+        self.assertEqual(ralph.iteration, 1)
+        self.assertIsNone(spawn.call_args[1]["stdin"])
+        self.assertEqual(spawn.call_args[1]["cwd"], os.path.abspath(self.temp_dir))
+
+    def test_prompt_written_to_stdin(self):
+        """Test stdin-driven agents receive the prompt."""
+        ralph = self._loop(agent_command="test-agent")
+        _, process, _ = self._run_with_process(ralph, lambda: FakeProcess(b"ok\n"))
+
+        process.stdin.write.assert_called_once_with(b"Test prompt content")
+        process.stdin.close.assert_called_once()
+
+    def test_failure_and_done_marker(self):
+        """Test exit codes and the completion marker are reported."""
+        ralph = self._loop(agent_command="claude -p")
+        (success, should_stop), _, _ = self._run_with_process(
+            ralph, lambda: FakeProcess(b"<PROMISE>DONE</PROMISE>\n", b"boom\n", returncode=2)
+        )
+
+        self.assertFalse(success)
+        self.assertTrue(should_stop)
+
+    @patch("oh_my_ralph.async_loop.DONE_GRACE_PERIOD", 0.01)
+    def test_stop_on_done_terminates_lingering_agent(self):
+        """Test stop_on_done ends an agent that keeps running after DONE."""
+        ralph = self._loop(agent_command="claude -p", stop_on_done=True)
+        (success, should_stop), process, _ = self._run_with_process(
+            ralph, lambda: FakeProcess(b"<PROMISE>DONE</PROMISE>\n", returncode=-15, exits=False)
+        )
+
+        process.terminate.assert_called_once()
+        self.assertTrue(success)
+        self.assertTrue(should_stop)
+
+    @unittest.skipIf(sys.platform == "win32", "POSIX process groups")
+    @patch("oh_my_ralph.async_loop.DONE_GRACE_PERIOD", 0.5)
+    def test_agent_exit_ends_iteration_despite_background_child(self):
+        """Test an agent that exits 0 but leaves a child holding its pipes is not reported as a timeout."""
+        import time
+        ralph = self._loop(agent_command='sh -c "sleep 30 & echo hi; exit 0"', iteration_timeout=8)
+        started = time.monotonic()
+        result = asyncio.run(ralph._run_agent("prompt"))
+
+        self.assertEqual(result, (0, "hi\n", ""))
+        self.assertLess(time.monotonic() - started, 5)
+        ralph._close_sinks()
+        with open(self.log_file, "r", encoding="utf-8") as f:
+            self.assertIn("Agent exited but its pipes are still open", f.read())
+
+    @patch("oh_my_ralph.async_loop.AsyncRalphLoop._sleep", AsyncMock())
+    def test_run_respects_max_iterations(self):
+        """Test the coroutine run loop stops at max_iterations."""
+        ralph = self._loop(agent_command="claude -p", max_iterations=3, delay_between_loops=0)
+        self._run_with_process(ralph, lambda: FakeProcess(b"ok\n"), coro_name="run")
+
+        self.assertEqual(ralph.iteration, 3)
+        with open(self.log_file, "r", encoding="utf-8") as f:
+            self.assertIn("Ralph Loop stopped after 3 iterations", f.read())
+
+    @patch("oh_my_ralph.async_loop.AsyncRalphLoop._sleep", AsyncMock())
+    def test_blocking_hooks_do_not_stall_the_event_loop(self):
+        """Test git snapshots and fingerprints run in threads while other coroutines keep going."""
+        import threading
+        import time
+        ralph = self._loop(agent_command="claude -p", max_iterations=1, delay_between_loops=0, stall_limit=1)
+        threads = []
+
+        def slow_fingerprint():
+            threads.append(threading.current_thread())
+            time.sleep(0.2)
+            return "same"
+
+        async def scenario():
+            ticks = 0
+
+            async def tick():
+                nonlocal ticks
+                while True:
+                    await asyncio.sleep(0.01)
+                    ticks += 1
+
+            ticker = asyncio.ensure_future(tick())
+            with patch.object(ralph, "_fingerprint", side_effect=slow_fingerprint), \
+                    patch("oh_my_ralph.async_loop.asyncio.create_subprocess_exec", AsyncMock(return_value=FakeProcess(b"ok\n"))):
+                await ralph.run()
+            ticker.cancel()
+            return ticks
+
+        ticks = asyncio.run(scenario())
+        self.assertEqual(len(threads), 2)  # before and after the iteration
+        self.assertNotIn(threading.main_thread(), threads)
+        self.assertGreater(ticks, 20)
+
+
+if __name__ == "__main__":
+    unittest.main()
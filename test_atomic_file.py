@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""Unit tests for atomic_file.py"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from oh_my_ralph.atomic_file import atomic_write
+
+
+class TestAtomicWrite(unittest.TestCase):
+    """Test cases for atomic_write."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, "plan.md")
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write("old")
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _read(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            return f.read()
+
+    def test_replaces_the_file_when_done(self):
+        """Test the old content stays until the block finishes, then the new one replaces it."""
+        with atomic_write(self.path, "w", fsync=True, encoding="utf-8") as f:
+            f.write("new")
+            f.flush()
+            self.assertEqual(self._read(), "old")
+            self.assertEqual(os.path.dirname(f.name), self.temp_dir)
+        self.assertEqual(self._read(), "new")
+        self.assertEqual(os.listdir(self.temp_dir), ["plan.md"])
+
+    def test_failure_leaves_the_file_alone(self):
+        """Test an exception in the block keeps the old file and removes the temporary one."""
+        with self.assertRaises(RuntimeError):
+            with atomic_write(self.path, "w", encoding="utf-8") as f:
+                f.write("partial")
+                raise RuntimeError("interrupted")
+        self.assertEqual(self._read(), "old")
+        self.assertEqual(os.listdir(self.temp_dir), ["plan.md"])
+
+    @unittest.skipIf(sys.platform == "win32", "POSIX permissions")
+    def test_keeps_permissions(self):
+        """Test a replaced file keeps its mode and a new one gets the umask default, not 0600."""
+        os.chmod(self.path, 0o644)
+        with atomic_write(self.path, "w", encoding="utf-8") as f:
+            f.write("new")
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o644)
+        umask = os.umask(0)
+        os.umask(umask)
+        new_path = os.path.join(self.temp_dir, "state.json")
+        with atomic_write(new_path, "w", encoding="utf-8") as f:
+            f.write("{}")
+        self.assertEqual(os.stat(new_path).st_mode & 0o777, 0o666 & ~umask)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""Smoke tests for the benchmark suite in benchmarks/"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import bench_orchestrator
+import bench_startup
+from bench_orchestrator import STUB_AGENT
+
+
+class TestStubAgent(unittest.TestCase):
+    """Test cases for the stub agent."""
+
+    def _run(self, *args):
+        return subprocess.run(
+            [sys.executable, STUB_AGENT, *args], input="prompt", capture_output=True, text=True
+        )
+
+    def test_emits_requested_output_size(self):
+        """Test --output-mb writes that many bytes after the start line."""
+        result = self._run("--output-mb", "0.5")
+        body = result.stdout.split("\n", 1)[1]
+        self.assertEqual(len(body), 512 * 1024)
+        self.assertEqual(result.returncode, 0)
+
+    def test_done_marker_and_failure(self):
+        """Test --done prints the marker and --exit-code sets the exit status."""
+        result = self._run("--done", "--exit-code", "3")
+        self.assertIn("<PROMISE>DONE</PROMISE>", result.stdout)
+        self.assertEqual(result.returncode, 3)
+
+
+class TestBenchOrchestrator(unittest.TestCase):
+    """Test cases for bench_orchestrator."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_iterations_run_through_the_loop(self):
+        """Test bench_iterations records throughput and first-byte latency."""
+        result = bench_orchestrator.bench_iterations(2, stream=True)
+        self.assertGreater(result["iterations_per_second"], 0)
+        self.assertIsNotNone(result["spawn_to_first_byte_ms"]["median"])
+
+    @unittest.skipIf(bench_orchestrator.resource is None, "needs the resource module")
+    def test_echoed_output_memory_does_not_grow_with_output(self):
+        """Test peak RSS with the echo on stays flat as the agent prints more."""
+        result = bench_orchestrator.bench_peak_rss([10], stream=True)
+        self.assertLess(result["by_output_mb"]["10"]["growth_kb"], 10 * 1024)
+
+    def test_log_writes(self):
+        """Test bench_log_writes reports both flush modes."""
+        result = bench_orchestrator.bench_log_writes(100)
+        self.assertEqual(set(result), {"unbuffered_us_per_line", "buffered_1s_us_per_line"})
+
+    def test_flatten_keeps_numbers_only(self):
+        """Test flatten turns nested results into dotted numeric keys."""
+        flat = bench_orchestrator.flatten({"a": {"b": 1, "c": None}, "d": 2.5, "e": True})
+        self.assertEqual(flat, {"a.b": 1, "d": 2.5})
+
+    def test_results_file_is_json(self):
+        """Test a quick run writes a results file that --compare can read."""
+        output = os.path.join(self.temp_dir, "bench.json")
+        cmd = [sys.executable, os.path.join(ROOT, "benchmarks", "bench_orchestrator.py"),
+               "--quick", "--iterations", "2", "--output-sizes", "0.1", "--output", output]
+        subprocess.run(cmd, capture_output=True, check=True)
+        with open(output, "r", encoding="utf-8") as f:
+            results = json.load(f)
+        self.assertIn("version", results)
+        self.assertIn("quiet", results["results"])
+        self.assertIn("echo", results["results"])
+        compared = subprocess.run(cmd + ["--compare", output], capture_output=True, text=True, check=True)
+        self.assertIn("Compared with", compared.stdout)
+
+
+class TestBenchStartup(unittest.TestCase):
+    """Test cases for bench_startup."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_quiet_one_iteration_run_is_fast_and_silent(self):
+        """Test a --quiet --max-iterations 1 CLI run prints nothing and does not sleep."""
+        argv = bench_startup.cli_run_argv(self.temp_dir)
+        bench_startup.time_command(argv, 1)  # copies the resource files
+        start = time.perf_counter()
+        result = subprocess.run(argv, env=bench_startup._env(), capture_output=True, text=True, check=True)
+        self.assertLess(time.perf_counter() - start, 5)
+        self.assertEqual(result.stdout, "")
+        with open(os.path.join(self.temp_dir, "ralph.log"), "r", encoding="utf-8") as f:
+            self.assertIn("Agent finished", f.read())
+
+    def test_budget_fails_the_run(self):
+        """Test --budget-ms exits 1 when the CLI overhead is over budget."""
+        output = os.path.join(self.temp_dir, "startup.json")
+        cmd = [sys.executable, os.path.join(ROOT, "benchmarks", "bench_startup.py"), "--runs", "1", "--output", output]
+        over = subprocess.run(cmd + ["--budget-ms", "0"], capture_output=True, text=True)
+        self.assertEqual(over.returncode, 1)
+        self.assertIn("over the 0.0 ms budget", over.stdout)
+        with open(output, "r", encoding="utf-8") as f:
+            self.assertIn("cli_run", json.load(f)["results"])
+
+
+if __name__ == "__main__":
+    unittest.main()
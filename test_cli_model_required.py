@@ -25,12 +25,42 @@ class TestCliModelRequired(unittest.TestCase):
             '--model', 'test-model'
         ]
         with patch.object(sys, 'argv', test_args):
-            with patch('oh_my_ralph.ralph_cli.RalphLoop') as mock_loop:
+            with patch('oh_my_ralph.ralph_loop.RalphLoop') as mock_loop:
                 instance = mock_loop.return_value
                 instance.run = unittest.mock.MagicMock()
                 ralph_cli.main()
                 mock_loop.assert_called_once()
                 instance.run.assert_called_once()
+    def test_async_rejected_with_workers(self):
+        test_args = [
+            'ralph_cli.py',
+            '--agent', 'test-agent',
+            '--model', 'test-model',
+            '--workers', '2',
+            '--async',
+        ]
+        with patch.object(sys, 'argv', test_args):
+            with patch('oh_my_ralph.worker_pool.WorkerPool') as mock_pool:
+                with self.assertRaises(SystemExit) as cm:
+                    ralph_cli.main()
+            self.assertEqual(cm.exception.code, 2)
+            mock_pool.assert_not_called()
+
+    def test_help_does_not_load_the_loop(self):
+        import subprocess
+        code = (
+            "import sys\n"
+            "from oh_my_ralph import ralph_cli\n"
+            "sys.argv = ['ralph_cli.py', '--help']\n"
+            "try:\n"
+            "    ralph_cli.main()\n"
+            "except SystemExit:\n"
+            "    pass\n"
+            "print('oh_my_ralph.ralph_loop' in sys.modules, 'subprocess' in sys.modules)\n"
+        )
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.splitlines()[-1], "False False")
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""Unit tests for daemon.py"""
+
+import asyncio
+import json
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from oh_my_ralph.daemon import FairScheduler, RalphDaemon, load_manifest, parse_control_address, send_command
+from test_async_loop import FakeProcess
+
+
+class TestFairScheduler(unittest.TestCase):
+    """Test cases for FairScheduler."""
+
+    def _run(self, coro):
+        return asyncio.run(coro)
+
+    def test_limit_and_least_recently_served_first(self):
+        """Test a freed slot goes to the project served least recently."""
+        async def scenario():
+            scheduler = FairScheduler(1)
+            self.assertTrue(await scheduler.acquire("a"))
+            waiting_b = asyncio.ensure_future(scheduler.acquire("b"))
+            await asyncio.sleep(0)
+            self.assertFalse(waiting_b.done())
+            scheduler.release("a")
+            self.assertTrue(await waiting_b)
+            # a asks again before c, but c has never been served
+            waiting_a = asyncio.ensure_future(scheduler.acquire("a"))
+            await asyncio.sleep(0)
+            waiting_c = asyncio.ensure_future(scheduler.acquire("c"))
+            await asyncio.sleep(0)
+            scheduler.release("b")
+            await asyncio.sleep(0)
+            self.assertTrue(waiting_c.done())
+            self.assertFalse(waiting_a.done())
+            scheduler.release("c")
+            self.assertTrue(await waiting_a)
+        self._run(scenario())
+
+    def test_paused_project_is_skipped(self):
+        """Test a paused project only gets a slot after it is resumed."""
+        async def scenario():
+            scheduler = FairScheduler(1)
+            scheduler.pause("a")
+            waiting = asyncio.ensure_future(scheduler.acquire("a"))
+            await asyncio.sleep(0)
+            self.assertFalse(waiting.done())
+            scheduler.resume("a")
+            self.assertTrue(await waiting)
+        self._run(scenario())
+
+    def test_remove_and_close_fail_pending_acquires(self):
+        """Test remove() and close() wake waiters with False."""
+        async def scenario():
+            scheduler = FairScheduler(1)
+            await scheduler.acquire("a")
+            removed = asyncio.ensure_future(scheduler.acquire("b"))
+            closed = asyncio.ensure_future(scheduler.acquire("c"))
+            await asyncio.sleep(0)
+            scheduler.remove("b")
+            self.assertFalse(await removed)
+            scheduler.close()
+            self.assertFalse(await closed)
+            self.assertFalse(await scheduler.acquire("d"))
+        self._run(scenario())
+
+
+class TestManifest(unittest.TestCase):
+    """Test cases for load_manifest and control addresses."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _write(self, manifest):
+        path = os.path.join(self.temp_dir, "projects.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        return path
+
+    def test_paths_are_relative_to_manifest(self):
+        """Test working_dir, log_file and control resolve next to the manifest."""
+        manifest = load_manifest(self._write({
+            "control": "ctl.sock",
+            "log_file": "daemon.log",
+            "defaults": {"task_queue": "shared/queue.db"},
+            "projects": [{"working_dir": "api", "verify_root": "verify", "hedge_root": "/abs/hedge"}],
+        }))
+        self.assertEqual(manifest["projects"][0]["working_dir"], os.path.join(self.temp_dir, "api"))
+        self.assertEqual(manifest["defaults"]["task_queue"], os.path.join(self.temp_dir, "shared", "queue.db"))
+        self.assertEqual(manifest["projects"][0]["verify_root"], os.path.join(self.temp_dir, "verify"))
+        self.assertEqual(manifest["projects"][0]["hedge_root"], "/abs/hedge")
+        self.assertEqual(manifest["control"], os.path.join(self.temp_dir, "ctl.sock"))
+        self.assertEqual(manifest["log_file"], os.path.join(self.temp_dir, "daemon.log"))
+
+    def test_invalid_manifest(self):
+        """Test projects without a working_dir are rejected."""
+        with self.assertRaises(ValueError):
+            load_manifest(self._write({"projects": [{"model": "x"}]}))
+
+    def test_parse_control_address(self):
+        """Test host:port is TCP and anything else is a socket path."""
+        self.assertEqual(parse_control_address("127.0.0.1:9000"), ("127.0.0.1", 9000))
+        self.assertEqual(parse_control_address("9000"), ("127.0.0.1", 9000))
+        self.assertEqual(parse_control_address("/tmp/x.sock"), "/tmp/x.sock")
+
+
+class TestRalphDaemon(unittest.TestCase):
+    """Test cases for RalphDaemon. Agent subprocesses are always mocked."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.original_cwd = os.path.dirname(os.path.abspath(__file__))
+        self.temp_dir = tempfile.mkdtemp()
+        self.projects = []
+        for name in ("api", "web", "cli"):
+            path = os.path.join(self.temp_dir, name)
+            os.makedirs(os.path.join(path, ".ralphy"))
+            with open(os.path.join(path, ".ralphy", "prompt.md"), "w", encoding="utf-8") as f:
+                f.write("Test prompt content")
+            self.projects.append({"working_dir": path})
+        self.print_patcher = patch("builtins.print")
+        self.print_patcher.start()
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.print_patcher.stop()
+        os.chdir(self.original_cwd)
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _manifest(self, **overrides):
+        manifest = {
+            "base_dir": self.temp_dir,
+            "control": f"127.0.0.1:{self._free_port()}" if not hasattr(socket, "AF_UNIX") else os.path.join(self.temp_dir, "ctl.sock"),
+            "defaults": {"agent": "claude -p", "model": "test-model", "delay": 0, "max_iterations": 3},
+            "projects": self.projects,
+        }
+        manifest.update(overrides)
+        return manifest
+
+    def _free_port(self):
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            return s.getsockname()[1]
+
+    def test_runs_every_project_under_the_concurrency_cap(self):
+        """Test all projects run to completion and never more than max_concurrent agents at once."""
+        running = []
+        peak = []
+
+        def finish(process):
+            running.pop()
+            process._finish()
+
+        def fake_exec(*args, **kwargs):
+            process = FakeProcess(stdout=b"working\n", exits=False)
+            running.append(process)
+            peak.append(len(running))
+            asyncio.get_running_loop().call_later(0.02, finish, process)
+            return process
+
+        daemon = RalphDaemon(self._manifest(), max_concurrent=2, exit_when_done=True, install_signal_handlers=False)
+        with patch("oh_my_ralph.async_loop.asyncio.create_subprocess_exec", side_effect=fake_exec):
+            asyncio.run(asyncio.wait_for(daemon.run(), 10))
+        self.assertEqual(len(peak), 9)
+        self.assertLessEqual(max(peak), 2)
+        self.assertEqual(sorted(p.loop.iteration for p in daemon.projects.values()), [3, 3, 3])
+
+    def test_control_socket_pause_add_remove(self):
+        """Test projects can be paused, added and removed over the control socket."""
+        manifest = self._manifest(projects=[dict(self.projects[0], paused=True)])
+        manifest["defaults"]["max_iterations"] = 1
+
+        async def scenario():
+            daemon = RalphDaemon(manifest, max_concurrent=1, install_signal_handlers=False)
+            runner = asyncio.ensure_future(daemon.run())
+            while daemon._control_server is None:
+                await asyncio.sleep(0.01)
+            ask = lambda request: asyncio.to_thread(send_command, daemon.control, request)
+            status = await ask({"command": "status"})
+            self.assertEqual(status["projects"][0]["state"], "paused")
+            reply = await ask({"command": "add", "project": dict(self.projects[1], name="web")})
+            self.assertTrue(reply["ok"])
+            duplicate = await ask({"command": "add", "project": self.projects[0]})
+            self.assertIn("already running", duplicate["error"])
+            await asyncio.wait_for(daemon.projects["web"].task, 5)
+            self.assertEqual(daemon.projects["api"].loop.iteration, 0)
+            self.assertTrue((await ask({"command": "remove", "name": "api"}))["ok"])
+            await asyncio.sleep(0.05)
+            self.assertNotIn("api", daemon.projects)
+            self.assertFalse((await ask({"command": "pause", "name": "nope"}))["ok"])
+            self.assertTrue((await ask({"command": "shutdown"}))["ok"])
+            await asyncio.wait_for(runner, 5)
+            return daemon
+
+        with patch("oh_my_ralph.async_loop.asyncio.create_subprocess_exec",
+                   side_effect=lambda *a, **k: FakeProcess(stdout=b"ok\n")):
+            daemon = asyncio.run(scenario())
+        self.assertEqual(daemon.projects["web"].loop.iteration, 1)
+
+    def test_loops_keep_the_daemon_directory(self):
+        """Test no project changes the daemon's directory and relative paths stay with their project."""
+        os.chdir(self.temp_dir)
+        manifest = self._manifest()
+        manifest["defaults"]["max_iterations"] = 1
+        manifest["projects"] = [dict(project, task_queue="queue.db") for project in self.projects]
+        daemon = RalphDaemon(manifest, exit_when_done=True, install_signal_handlers=False)
+        with patch("oh_my_ralph.async_loop.asyncio.create_subprocess_exec",
+                   side_effect=lambda *a, **k: FakeProcess(stdout=b"ok\n")) as spawn:
+            asyncio.run(asyncio.wait_for(daemon.run(), 10))
+        self.assertEqual(os.getcwd(), os.path.realpath(self.temp_dir))
+        self.assertEqual(
+            sorted(call.kwargs["cwd"] for call in spawn.call_args_list),
+            sorted(project["working_dir"] for project in self.projects),
+        )
+        for project in self.projects:
+            name = os.path.basename(project["working_dir"])
+            loop = daemon.projects[name].loop
+            self.assertEqual(loop.task_scheduler.path, os.path.join(project["working_dir"], "queue.db"))
+            self.assertTrue(os.path.exists(os.path.join(project["working_dir"], "ralph.log")))
+
+    def test_bad_project_is_skipped(self):
+        """Test a project with a missing directory does not stop the others."""
+        self.projects.append({"working_dir": os.path.join(self.temp_dir, "missing")})
+        daemon = RalphDaemon(self._manifest(), exit_when_done=True, install_signal_handlers=False)
+        with patch("oh_my_ralph.async_loop.asyncio.create_subprocess_exec",
+                   side_effect=lambda *a, **k: FakeProcess(stdout=b"ok\n")):
+            asyncio.run(asyncio.wait_for(daemon.run(), 10))
+        self.assertEqual(len(daemon.projects), 3)
+
+    def test_hedging_project_is_rejected(self):
+        """Test a project asking for hedging is refused rather than run without backups."""
+        daemon = RalphDaemon(self._manifest(projects=[]), install_signal_handlers=False)
+        reply = daemon.handle_request({"command": "add", "project": dict(self.projects[0], hedge=["claude -p"])})
+        self.assertFalse(reply["ok"])
+        self.assertIn("project api: hedge is not supported", reply["error"])
+        self.assertEqual(daemon.projects, {})
+        daemon._log_sink.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""Unit tests for delay_policy.py"""
+
+import os
+import random
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from oh_my_ralph.delay_policy import AdaptiveDelay, FixedDelay
+from oh_my_ralph.ralph_loop import RalphLoop
+
+
+class TestDelayPolicies(unittest.TestCase):
+    """Test cases for FixedDelay and AdaptiveDelay."""
+
+    def test_fixed_delay(self):
+        """Test FixedDelay always returns the configured delay."""
+        policy = FixedDelay(7)
+        self.assertEqual(policy.next_delay(True, 1.0, 0), 7)
+        self.assertEqual(policy.next_delay(False, 1.0, 3), 7)
+        self.assertEqual(policy.initial_delay, 0)
+
+    def test_adaptive_no_delay_after_fast_success(self):
+        """Test AdaptiveDelay goes straight on after a fast success and waits after a slow one."""
+        policy = AdaptiveDelay(base_delay=5, fast_threshold=60)
+        self.assertEqual(policy.next_delay(True, 2.0, 0), 0)
+        self.assertEqual(policy.next_delay(True, 60.0, 0), 5)
+        self.assertEqual(policy.initial_delay, 0)
+
+    def test_adaptive_exponential_backoff(self):
+        """Test failures double the delay up to the cap."""
+        policy = AdaptiveDelay(base_delay=5, max_delay=30, jitter=0)
+        delays = [policy.next_delay(False, 1.0, n) for n in range(1, 6)]
+        self.assertEqual(delays, [5, 10, 20, 30, 30])
+
+    def test_adaptive_jitter_bounds(self):
+        """Test jitter only shortens the delay, by at most the jitter fraction."""
+        policy = AdaptiveDelay(base_delay=10, jitter=0.5, rng=random.Random(1))
+        for _ in range(50):
+            delay = policy.next_delay(False, 1.0, 2)
+            self.assertGreaterEqual(delay, 10)
+            self.assertLessEqual(delay, 20)
+
+
+class TestRalphLoopFailureThreshold(unittest.TestCase):
+    """Test cases for what RalphLoop does at the failure threshold."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.log_file = os.path.join(self.temp_dir, "test.log")
+        self.original_cwd = os.getcwd()
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        import shutil
+        os.chdir(self.original_cwd)
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _run_failing_loop(self, **kwargs):
+        kwargs.setdefault("max_iterations", 10)
+        ralph = RalphLoop(
+            agent_command="test-agent",
+            working_dir=self.temp_dir,
+            log_file=self.log_file,
+            install_signal_handlers=False,
+            **kwargs,
+        )
+        with patch.object(ralph, "_run_agent", return_value=(1, "", "error")):
+            with patch("oh_my_ralph.ralph_loop.time.sleep") as mock_sleep:
+                ralph.run()
+        return ralph, [c.args[0] for c in mock_sleep.call_args_list]
+
+    def test_invalid_failure_action(self):
+        """Test an unknown failure action is rejected."""
+        with self.assertRaises(ValueError):
+            RalphLoop(log_file=self.log_file, install_signal_handlers=False, failure_action="explode")
+
+    def test_stop_at_threshold(self):
+        """Test failure_action='stop' ends the loop at the threshold."""
+        ralph, _ = self._run_failing_loop(max_consecutive_failures=3, failure_action="stop")
+        self.assertEqual(ralph.iteration, 3)
+        with open(self.log_file, "r", encoding="utf-8") as f:
+            self.assertIn("Stopping after 3 consecutive failures", f.read())
+
+    def test_cooldown_at_threshold(self):
+        """Test failure_action='cooldown' pauses and restarts the backoff."""
+        ralph, sleeps = self._run_failing_loop(
+            max_iterations=4,
+            max_consecutive_failures=2,
+            failure_action="cooldown",
+            cooldown=600,
+            delay_policy=AdaptiveDelay(base_delay=1, jitter=0),
+        )
+        self.assertEqual(ralph.iteration, 4)
+        self.assertEqual(sleeps, [1, 600, 1, 600])
+
+    def test_adaptive_success_skips_sleep(self):
+        """Test successful iterations run back to back with AdaptiveDelay."""
+        ralph = RalphLoop(
+            agent_command="test-agent",
+            max_iterations=3,
+            working_dir=self.temp_dir,
+            log_file=self.log_file,
+            install_signal_handlers=False,
+            delay_policy=AdaptiveDelay(),
+        )
+        with patch.object(ralph, "_run_agent", return_value=(0, "ok", "")):
+            with patch("oh_my_ralph.ralph_loop.time.sleep") as mock_sleep:
+                ralph.run()
+        self.assertEqual(ralph.iteration, 3)
+        mock_sleep.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
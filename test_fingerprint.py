@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""Unit tests for fingerprint.py and stall detection"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from oh_my_ralph.fingerprint import workspace_fingerprint
+from oh_my_ralph.ralph_loop import RalphLoop
+
+
+def _write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+class TestWorkspaceFingerprint(unittest.TestCase):
+    """Test cases for workspace_fingerprint."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.mkdtemp()
+        _write(os.path.join(self.temp_dir, "requirements.md"), "Build it")
+        _write(os.path.join(self.temp_dir, "src", "main.py"), "print(1)\n")
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        import shutil
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _git_init(self):
+        env = {**os.environ, "GIT_AUTHOR_NAME": "t", "GIT_AUTHOR_EMAIL": "t@t", "GIT_COMMITTER_NAME": "t", "GIT_COMMITTER_EMAIL": "t@t"}
+        for cmd in (["git", "init", "-q"], ["git", "add", "-A"], ["git", "commit", "-q", "-m", "init"]):
+            subprocess.run(cmd, cwd=self.temp_dir, check=True, env=env, capture_output=True)
+
+    def _assert_changes(self, mutate, expect_change=True, root=None):
+        root = root or self.temp_dir
+        before = workspace_fingerprint(root, ignore=("ralph.log",))
+        mutate()
+        after = workspace_fingerprint(root, ignore=("ralph.log",))
+        if expect_change:
+            self.assertNotEqual(before, after)
+        else:
+            self.assertEqual(before, after)
+
+    def test_stable_without_changes(self):
+        """Test the fingerprint is deterministic."""
+        self._assert_changes(lambda: None, expect_change=False)
+
+    def test_plan_and_bookkeeping_files(self):
+        """Test plan edits count but .ralphy bookkeeping and the log do not."""
+        self._assert_changes(lambda: _write(os.path.join(self.temp_dir, ".ralphy", "fix_plan.md"), "- [ ] task"))
+        self._assert_changes(lambda: _write(os.path.join(self.temp_dir, ".ralphy", "events.jsonl"), "{}"), expect_change=False)
+        self._assert_changes(lambda: _write(os.path.join(self.temp_dir, "ralph.log.1"), "log"), expect_change=False)
+
+    def test_without_git_uses_mtimes(self):
+        """Test new files are noticed outside a git repository."""
+        self._assert_changes(lambda: _write(os.path.join(self.temp_dir, "src", "new.py"), "x"))
+
+    def test_git_dirty_file_edited_again(self):
+        """Test editing an already modified file in a git repo is noticed."""
+        self._git_init()
+        _write(os.path.join(self.temp_dir, "src", "main.py"), "print(2)\n")
+        self._assert_changes(lambda: _write(os.path.join(self.temp_dir, "src", "main.py"), "print(3)\n"))
+
+    def test_git_working_dir_in_repo_subdirectory(self):
+        """Test a working dir below the repository root hashes its dirty files and applies its ignores."""
+        self._git_init()
+        src = os.path.join(self.temp_dir, "src")
+        _write(os.path.join(src, "main.py"), "print(2)\n")
+        self._assert_changes(lambda: _write(os.path.join(src, "main.py"), "print(3)\n"), root=src)
+        self._assert_changes(lambda: _write(os.path.join(src, "ralph.log"), "log"), expect_change=False, root=src)
+        self._assert_changes(
+            lambda: _write(os.path.join(src, ".ralphy", "state.json"), "{}"), expect_change=False, root=src
+        )
+
+
+
+class TestStallDetection(unittest.TestCase):
+    """Test cases for RalphLoop's stall handling."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.log_file = os.path.join(self.temp_dir, "ralph.log")
+        _write(os.path.join(self.temp_dir, ".ralphy", "prompt.md"), "Do the work")
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        import shutil
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _loop(self, **kwargs):
+        return RalphLoop(
+            agent_command="test-agent",
+            working_dir=self.temp_dir,
+            log_file=self.log_file,
+            install_signal_handlers=False,
+            stall_limit=2,
+            **kwargs,
+        )
+
+    def _iterate(self, ralph, change=False):
+        def agent(prompt):
+            if change:
+                _write(os.path.join(self.temp_dir, f"file-{ralph.iteration}.txt"), "work")
+            return 0, "ok", ""
+        with patch.object(ralph, "_run_agent", side_effect=agent):
+            success, _ = ralph.run_single_iteration()
+        return ralph._schedule_next(success)
+
+    def test_stops_after_idle_iterations(self):
+        """Test the loop stops once stall_limit iterations changed nothing."""
+        ralph = self._loop()
+        self.assertTrue(self._iterate(ralph))
+        self.assertFalse(self._iterate(ralph))
+
+    def test_changes_reset_idle_count(self):
+        """Test an iteration that changes files resets the idle count."""
+        ralph = self._loop()
+        self._iterate(ralph)
+        self.assertTrue(self._iterate(ralph, change=True))
+        self.assertEqual(ralph.idle_iterations, 0)
+
+    def test_switch_model_then_stop(self):
+        """Test switch-model escalates once, then stops."""
+        ralph = self._loop(model="small", stall_action="switch-model", stall_model="large")
+        self._iterate(ralph)
+        self.assertTrue(self._iterate(ralph))
+        self.assertEqual(ralph.model, "large")
+        self._iterate(ralph)
+        self.assertFalse(self._iterate(ralph))
+
+    def test_backoff(self):
+        """Test backoff waits the cool-down instead of stopping."""
+        ralph = self._loop(stall_action="backoff", cooldown=120)
+        self._iterate(ralph)
+        self.assertTrue(self._iterate(ralph))
+        self.assertEqual(ralph.next_delay, 120)
+
+
+if __name__ == "__main__":
+    unittest.main()
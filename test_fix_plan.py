@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""Unit tests for fix_plan.py"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from oh_my_ralph.fix_plan import DONE, IN_PROGRESS, TODO, PlanArchiver, TaskIndex, TaskScheduler, parse_fix_plan
+
+SAMPLE_PLAN = """# Fix Plan
+
+## Priority Legend
+- 🔴 Critical - Must fix immediately
+- 🟢 Low - Nice to have
+
+## To Do (Sorted by Priority)
+
+### 🔴 Critical
+
+<!-- Add critical priority items here -->
+- Fix crash on empty input
+  - happens in parser.py
+
+### 🟡 Medium Priority
+
+- [ ] Add --verbose flag
+- [x] Write README
+
+### 🟢 Low Priority
+
+1. Tidy up imports
+
+## In Progress
+
+- Implement login form
+
+## Completed
+
+- Set up project skeleton (2024-01-01)
+
+## Bugs Found
+
+- Not a task
+"""
+
+
+class TestParseFixPlan(unittest.TestCase):
+    """Test cases for parse_fix_plan."""
+
+    def test_sections_and_priorities(self):
+        """Test items get their status and priority from the headings."""
+        tasks = {task.text: task for task in parse_fix_plan(SAMPLE_PLAN)}
+
+        self.assertEqual(tasks["Fix crash on empty input"].priority, 0)
+        self.assertEqual(tasks["Fix crash on empty input"].status, TODO)
+        self.assertEqual(tasks["Add --verbose flag"].priority, 2)
+        self.assertEqual(tasks["Tidy up imports"].priority, 3)
+        self.assertEqual(tasks["Implement login form"].status, IN_PROGRESS)
+        self.assertEqual(tasks["Set up project skeleton (2024-01-01)"].status, DONE)
+
+    def test_checked_items_are_done(self):
+        """Test [x] marks an item done even under To Do."""
+        tasks = {task.text: task for task in parse_fix_plan(SAMPLE_PLAN)}
+        self.assertEqual(tasks["Write README"].status, DONE)
+
+    def test_legend_comments_and_other_sections_ignored(self):
+        """Test only plan sections produce tasks."""
+        texts = [task.text for task in parse_fix_plan(SAMPLE_PLAN)]
+        self.assertNotIn("Not a task", texts)
+        self.assertFalse(any("Critical - Must fix" in text for text in texts))
+        self.assertEqual(len(texts), 6)
+
+    def test_indented_lines_become_details(self):
+        """Test sub-bullets are attached to their parent item."""
+        tasks = {task.text: task for task in parse_fix_plan(SAMPLE_PLAN)}
+        self.assertIn("happens in parser.py", tasks["Fix crash on empty input"].describe())
+        self.assertTrue(tasks["Fix crash on empty input"].describe().startswith("[critical]"))
+
+
+class TestTaskIndexAndScheduler(unittest.TestCase):
+    """Test cases for TaskIndex and TaskScheduler."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.plan = os.path.join(self.temp_dir, "fix_plan.md")
+        with open(self.plan, "w", encoding="utf-8") as f:
+            f.write(SAMPLE_PLAN)
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        import shutil
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_open_tasks_ordered(self):
+        """Test in-progress work comes first, then by priority."""
+        index = TaskIndex(self.plan)
+        texts = [task.text for task in index.open_tasks()]
+        self.assertEqual(texts, [
+            "Implement login form",
+            "Fix crash on empty input",
+            "Add --verbose flag",
+            "Tidy up imports",
+        ])
+
+    def test_reparse_only_when_file_changes(self):
+        """Test the plan is parsed again only after it changes."""
+        index = TaskIndex(self.plan)
+        self.assertTrue(index.refresh())
+        self.assertFalse(index.refresh())
+
+        with open(self.plan, "a", encoding="utf-8") as f:
+            f.write("\n## To Do\n\n- Brand new item\n")
+        os.utime(self.plan, ns=(1, 1))
+        self.assertTrue(index.refresh())
+        self.assertIn("Brand new item", [task.text for task in index.tasks])
+
+    def test_two_workers_never_get_the_same_task(self):
+        """Test claimed tasks are skipped for other workers."""
+        scheduler = TaskScheduler(TaskIndex(self.plan))
+        first = scheduler.claim("worker-1")
+        second = scheduler.claim("worker-2")
+        self.assertNotEqual(first.id, second.id)
+
+        scheduler.finish("worker-1", completed=False)
+        self.assertEqual(scheduler.claim("worker-3").id, first.id)
+
+    def test_completed_tasks_not_handed_out_again(self):
+        """Test completed tasks are skipped even while the plan lists them."""
+        scheduler = TaskScheduler(TaskIndex(self.plan))
+        first = scheduler.claim("worker-1")
+        scheduler.finish("worker-1", completed=True)
+        self.assertNotEqual(scheduler.claim("worker-1").id, first.id)
+
+
+class TestPlanArchiver(unittest.TestCase):
+    """Test cases for archiving completed fix_plan items."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.plan = os.path.join(self.temp_dir, "fix_plan.md")
+        self.archive = os.path.join(self.temp_dir, "fix_plan.archive.md")
+        with open(self.plan, "w", encoding="utf-8") as f:
+            f.write(SAMPLE_PLAN.replace("- Set up project skeleton (2024-01-01)",
+                                        "- Set up project skeleton (2024-01-01)\n  - used cookiecutter"))
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        import shutil
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _read(self, path):
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+
+    def test_items_move_after_n_iterations(self):
+        """Test completed items stay for N iterations, then move with their details."""
+        archiver = PlanArchiver(self.plan, self.archive, after=2)
+        self.assertEqual(archiver.compact(1), 0)
+        self.assertEqual(archiver.compact(2), 0)
+        self.assertEqual(archiver.compact(3), 2)
+        plan = self._read(self.plan)
+        self.assertNotIn("Write README", plan)
+        self.assertNotIn("cookiecutter", plan)
+        self.assertIn("_2 completed items archived in `fix_plan.archive.md`", plan)
+        archive = self._read(self.archive)
+        self.assertIn("## Archived after iteration 3", archive)
+        self.assertIn("- Set up project skeleton (2024-01-01)\n  - used cookiecutter\n", archive)
+        self.assertIn("- [x] Write README", archive)
+        # Open items and other sections are untouched
+        texts = [task.text for task in parse_fix_plan(plan)]
+        self.assertEqual(texts, ["Fix crash on empty input", "Add --verbose flag", "Tidy up imports", "Implement login form"])
+        self.assertIn("- Not a task", plan)
+
+    def test_summary_count_accumulates(self):
+        """Test a later archive updates the count instead of adding another line."""
+        archiver = PlanArchiver(self.plan, self.archive, after=1)
+        archiver.compact(1)
+        archiver.compact(2)
+        with open(self.plan, "a", encoding="utf-8") as f:
+            f.write("\n## Completed\n\n- Ship it\n")
+        archiver.compact(3)
+        archiver.compact(4)
+        plan = self._read(self.plan)
+        self.assertEqual(plan.count("archived in"), 1)
+        self.assertIn("_3 completed items archived", plan)
+        self.assertEqual(self._read(self.archive).count("## Archived after"), 2)
+
+    @unittest.skipIf(sys.platform == "win32", "POSIX permissions")
+    def test_plan_mode_survives_compaction(self):
+        """Test rewriting the plan keeps its permissions."""
+        os.chmod(self.plan, 0o644)
+        self.assertEqual(PlanArchiver(self.plan, self.archive, after=0).compact(1), 2)
+        self.assertEqual(os.stat(self.plan).st_mode & 0o777, 0o644)
+
+    def test_failed_plan_write_does_not_archive_twice(self):
+        """Test items archived before the plan write failed are not appended again on the next run."""
+        from unittest.mock import patch
+        from oh_my_ralph import fix_plan
+        real_atomic_write = fix_plan.atomic_write
+
+        def failing_plan_write(path, *args, **kwargs):
+            if os.path.basename(path) == "fix_plan.md":
+                raise OSError("disk full")
+            return real_atomic_write(path, *args, **kwargs)
+
+        with patch("oh_my_ralph.fix_plan.atomic_write", side_effect=failing_plan_write):
+            with self.assertRaises(OSError):
+                fix_plan.archive_tasks(self.plan, self.archive, self._done_ids(), "First")
+        self.assertEqual(fix_plan.archive_tasks(self.plan, self.archive, self._done_ids(), "Second"), 2)
+        archive = self._read(self.archive)
+        self.assertEqual(archive.count("- [x] Write README"), 1)
+        self.assertNotIn("## Second", archive)
+        self.assertNotIn("Write README", self._read(self.plan))
+
+    def _done_ids(self):
+        return {task.id for task in parse_fix_plan(self._read(self.plan)) if task.status == DONE}
+
+    def test_reopened_item_starts_over(self):
+        """Test an item that is reopened and completed again waits the full N iterations."""
+        archiver = PlanArchiver(self.plan, self.archive, after=2)
+        archiver.compact(1)
+        with open(self.plan, encoding="utf-8") as f:
+            text = f.read()
+        with open(self.plan, "w", encoding="utf-8") as f:
+            f.write(text.replace("- [x] Write README", "- [ ] Write README"))
+        archiver.compact(2)
+        with open(self.plan, "w", encoding="utf-8") as f:
+            f.write(text)
+        self.assertEqual(archiver.compact(3), 1)  # only the skeleton item
+        self.assertIn("Write README", self._read(self.plan))
+        self.assertEqual(archiver.compact(5), 1)
+    def test_loop_archives_between_iterations(self):
+        """Test RalphLoop archives after iterations, logs context sizes and checkpoints the ages."""
+        import json
+        from unittest.mock import patch
+        from oh_my_ralph.ralph_loop import RalphLoop
+        ralphy = os.path.join(self.temp_dir, ".ralphy")
+        os.makedirs(ralphy)
+        os.replace(self.plan, os.path.join(ralphy, "fix_plan.md"))
+        with open(os.path.join(ralphy, "prompt.md"), "w", encoding="utf-8") as f:
+            f.write("Test prompt")
+        with patch("oh_my_ralph.ralph_loop.signal.signal"), patch("builtins.print"):
+            loop = RalphLoop(working_dir=self.temp_dir, log_file="ralph.log", archive_after=1, delay_between_loops=0)
+            with patch.object(loop, "_run_agent", return_value=(0, "ok", "")):
+                loop.run_single_iteration()
+                loop._schedule_next(True)
+                self.assertEqual(len(loop.plan_archiver.completed_at), 2)
+                loop._save_checkpoint()
+                resumed = RalphLoop(working_dir=self.temp_dir, log_file="ralph.log", archive_after=1)
+                resumed.restore_checkpoint()
+                self.assertEqual(resumed.plan_archiver.completed_at, loop.plan_archiver.completed_at)
+                resumed._close_sinks()
+                loop.run_single_iteration()
+                loop._schedule_next(True)
+            loop._close_sinks()
+        self.assertIn("Write README", self._read(os.path.join(ralphy, "fix_plan.archive.md")))
+        with open(loop.events_file, encoding="utf-8") as f:
+            event = json.loads(f.readline())
+        self.assertEqual(set(event["context_bytes"]), {"prompt.md", "fix_plan.md"})
+        self.assertIn("Context files: prompt.md", self._read(os.path.join(self.temp_dir, "ralph.log")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""Unit tests for git_workspace.py"""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest.mock import Mock
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from oh_my_ralph.git_workspace import check_repo, commit_snapshot, create_detached_worktree, git, pathspec, snapshot_tree
+
+
+class TestGitWorkspace(unittest.TestCase):
+    """Test cases for the git helpers shared by hedging, verification and snapshots."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.repo = os.path.join(self.temp_dir, "repo")
+        os.makedirs(os.path.join(self.repo, "sub"))
+        git(self.repo, "init", "-q")
+        git(self.repo, "config", "user.email", "ralph@example.com")
+        git(self.repo, "config", "user.name", "Ralph")
+        self._write("app.txt", "committed\n")
+        git(self.repo, "add", "-A")
+        git(self.repo, "commit", "-q", "-m", "initial")
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _write(self, name, text):
+        with open(os.path.join(self.repo, name), "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def _loop(self, work_dir):
+        return Mock(_workspace_root=work_dir)
+
+    def test_check_repo(self):
+        """Test check_repo finds the top level and prefix, or logs why there is no repository."""
+        loop = self._loop(os.path.join(self.repo, "sub"))
+        self.assertEqual(check_repo(loop, "needs git"), (os.path.realpath(self.repo), "sub/"))
+        loop._log.assert_not_called()
+        plain = os.path.join(self.temp_dir, "plain")
+        os.makedirs(plain)
+        loop = self._loop(plain)
+        self.assertFalse(check_repo(loop, "needs git"))
+        self.assertTrue(loop._log.call_args[0][0].startswith("needs git ("))
+
+    def test_snapshot_in_a_detached_worktree(self):
+        """Test a snapshot commit holds uncommitted files minus exclusions and checks out elsewhere."""
+        self._write("app.txt", "edited\n")
+        self._write("notes.log", "loop output\n")
+        tree = snapshot_tree(self.repo, ("notes.log*",))
+        commit = commit_snapshot(self.repo, tree, "snapshot")
+        self.assertEqual(git(self.repo, "status", "--porcelain"), "M app.txt\n?? notes.log")
+        worktree = os.path.join(self.temp_dir, "worktree")
+        create_detached_worktree(self.repo, worktree)
+        create_detached_worktree(self.repo, worktree)  # reused
+        git(worktree, "reset", "-q", "--hard", commit)
+        with open(os.path.join(worktree, "app.txt"), encoding="utf-8") as f:
+            self.assertEqual(f.read(), "edited\n")
+        self.assertFalse(os.path.exists(os.path.join(worktree, "notes.log")))
+
+    def test_pathspec(self):
+        """Test pathspec covers everything but the exclusions."""
+        self.assertEqual(pathspec((".ralphy",)), ["--", ".", ":(exclude).ralphy"])
+
+    def test_git_raises_on_failure(self):
+        """Test a failing git command raises with its stderr."""
+        with self.assertRaises(subprocess.CalledProcessError) as raised:
+            git(self.repo, "rev-parse", "--verify", "no-such-ref")
+        self.assertTrue(raised.exception.stderr)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""Unit tests for hedging.py"""
+
+import json
+import os
+import shlex
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from oh_my_ralph.git_workspace import snapshot_tree
+from oh_my_ralph.hedging import HEDGE_MIN_SAMPLES, HedgeStats, parse_hedge_spec
+from oh_my_ralph.ralph_loop import RalphLoop
+from git_fixtures import git, make_repo
+
+# Stand-in agent: "slow" leaves a partial edit and hangs, "fast" edits,
+# updates the plan and commits, "fail" exits 1, "check" reports what it sees
+AGENT_SCRIPT = """
+import os, subprocess, sys, time
+mode = sys.argv[1]
+sys.stdin.read()
+if mode == "slow":
+    open("partial.txt", "w").write("half done")
+    time.sleep(30)
+if mode == "fail":
+    sys.exit(1)
+if mode == "check":
+    print(open("tracked.txt").read().strip(), os.path.exists("untracked.txt"), os.path.exists("partial.txt"))
+    sys.exit(0)
+open("work.txt", "w").write(mode)
+with open(os.path.join(".ralphy", "fix_plan.md"), "a") as f:
+    f.write("- [x] done by " + mode + chr(10))
+subprocess.run(["git", "add", "work.txt"], check=True)
+subprocess.run(["git", "commit", "-q", "-m", mode], check=True)
+open("notes.txt", "w").write("uncommitted from " + mode)
+print("finished", mode)
+"""
+
+
+class TestHedgeHelpers(unittest.TestCase):
+    """Test cases for hedge specs and stats."""
+
+    def test_parse_hedge_spec(self):
+        """Test a bare spec is a model and AGENT::MODEL names both."""
+        self.assertEqual(parse_hedge_spec("gpt-5", "opencode run"), ("opencode run", "gpt-5"))
+        self.assertEqual(parse_hedge_spec("npx --yes @sourcegraph/amp::", "x"), ("npx --yes @sourcegraph/amp", None))
+        self.assertEqual(parse_hedge_spec("claude -p::sonnet", "x"), ("claude -p", "sonnet"))
+
+    def test_percentile_needs_enough_wins(self):
+        """Test the percentile only appears after HEDGE_MIN_SAMPLES wins and survives a reload."""
+        temp_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(temp_dir, "hedge_stats.json")
+            stats = HedgeStats(path)
+            for latency in range(1, HEDGE_MIN_SAMPLES):
+                stats.record("a", "won", latency)
+            stats.record("a", "cancelled", 99)
+            self.assertIsNone(stats.percentile("a", 90))
+            stats.record("a", "won", 100)
+            self.assertEqual(stats.percentile("a", 90), 100)
+            self.assertEqual(stats.percentile("a", 50), 3)
+            stats.save()
+            reloaded = HedgeStats(path)
+            self.assertEqual(reloaded.percentile("a", 90), 100)
+            self.assertIn("won 5/6", reloaded.describe("a"))
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+class TestHedger(unittest.TestCase):
+    """Test cases for racing agents in git worktrees, with a real git repository."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.repo = make_repo(self.temp_dir, {"tracked.txt": "committed\n"})
+        for name, text in (("prompt.md", "Test prompt"), ("agent.md", "agent"), ("fix_plan.md", "# Plan\n")):
+            with open(os.path.join(self.repo, ".ralphy", name), "w", encoding="utf-8") as f:
+                f.write(text)
+        self.agent_path = os.path.join(self.temp_dir, "agent.py")
+        with open(self.agent_path, "w", encoding="utf-8") as f:
+            f.write(AGENT_SCRIPT)
+        self.signal_patcher = patch("oh_my_ralph.ralph_loop.signal.signal")
+        self.signal_patcher.start()
+        self.print_patcher = patch("builtins.print")
+        self.print_patcher.start()
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.signal_patcher.stop()
+        self.print_patcher.stop()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _agent(self, mode):
+        return f"{shlex.quote(sys.executable)} {shlex.quote(self.agent_path)} {mode}"
+
+    def _loop(self, primary, backups, delay):
+        return RalphLoop(
+            agent_command=self._agent(primary),
+            working_dir=self.repo,
+            log_file="ralph.log",
+            hedge=[f"{self._agent(mode)}::" for mode in backups],
+            hedge_delay=delay,
+            hedge_percentile=0,
+            iteration_timeout=60,
+        )
+
+    def _read(self, *parts):
+        with open(os.path.join(self.repo, *parts), encoding="utf-8") as f:
+            return f.read()
+
+    def test_backup_wins_and_its_changes_replace_the_primary(self):
+        """Test a fast backup beats a hung primary, which is killed and its edits discarded."""
+        loop = self._loop("slow", ["fast"], delay=0.3)
+        success, should_stop = loop.run_single_iteration()
+        loop._close_sinks()
+        self.assertTrue(success)
+        self.assertFalse(os.path.exists(os.path.join(self.repo, "partial.txt")))
+        self.assertEqual(self._read("work.txt"), "fast")
+        self.assertEqual(self._read("notes.txt"), "uncommitted from fast")
+        self.assertEqual(git(self.repo, "log", "-1", "--format=%s"), "fast")
+        self.assertEqual(git(self.repo, "status", "--porcelain"), "?? notes.txt")
+        self.assertIn("done by fast", self._read(".ralphy", "fix_plan.md"))
+        race = loop.hedger.last_race
+        self.assertEqual([a["outcome"] for a in race["attempts"]], ["cancelled", "won"])
+        with open(loop.events_file, encoding="utf-8") as f:
+            event = json.loads(f.readlines()[-1])
+        self.assertEqual(event["hedge"]["winner"], race["winner"])
+        stats = HedgeStats(os.path.join(self.repo, ".ralphy", "hedge_stats.json"))
+        self.assertEqual(stats.entries[race["winner"]]["wins"], 1)
+
+    def test_fast_primary_needs_no_backup(self):
+        """Test no backup starts when the primary finishes within the hedge delay."""
+        loop = self._loop("fast", ["fail"], delay=30)
+        success, _ = loop.run_single_iteration()
+        loop._close_sinks()
+        self.assertTrue(success)
+        self.assertEqual(len(loop.hedger.last_race["attempts"]), 1)
+        self.assertFalse(os.path.exists(self.repo + "-hedge"))
+
+    def test_failed_primary_starts_backup_at_once(self):
+        """Test a backup starts without waiting once the primary has failed."""
+        loop = self._loop("fail", ["fast"], delay=30)
+        success, _ = loop.run_single_iteration()
+        loop._close_sinks()
+        self.assertTrue(success)
+        self.assertEqual([a["outcome"] for a in loop.hedger.last_race["attempts"]], ["failed", "won"])
+        self.assertEqual(self._read("work.txt"), "fast")
+
+    def test_backup_starts_from_the_uncommitted_state(self):
+        """Test the backup's worktree holds the working dir's uncommitted and untracked files."""
+        with open(os.path.join(self.repo, "tracked.txt"), "w", encoding="utf-8") as f:
+            f.write("edited\n")
+        with open(os.path.join(self.repo, "untracked.txt"), "w", encoding="utf-8") as f:
+            f.write("new\n")
+        loop = self._loop("slow", ["check"], delay=0.3)
+        _, stdout, _ = loop._run_agent("prompt")
+        loop._close_sinks()
+        self.assertEqual(stdout.strip(), "edited True False")
+        # Nothing the backup did not change is lost
+        self.assertEqual(self._read("tracked.txt"), "edited\n")
+        self.assertEqual(self._read("untracked.txt"), "new\n")
+        self.assertIn("?? untracked.txt", git(self.repo, "status", "--porcelain"))
+
+    def test_snapshot_leaves_index_alone(self):
+        """Test snapshot_tree neither stages anything nor moves HEAD."""
+        with open(os.path.join(self.repo, "new.txt"), "w", encoding="utf-8") as f:
+            f.write("x\n")
+        head = git(self.repo, "rev-parse", "HEAD")
+        tree = snapshot_tree(self.repo)
+        self.assertIn("new.txt", git(self.repo, "ls-tree", "--name-only", tree))
+        self.assertEqual(git(self.repo, "status", "--porcelain"), "?? new.txt")
+        self.assertEqual(git(self.repo, "rev-parse", "HEAD"), head)
+
+
+if __name__ == "__main__":
+    unittest.main()
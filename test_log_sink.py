@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Unit tests for log_sink.py"""
+
+import gzip
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from oh_my_ralph.log_sink import LogSink
+
+
+class TestLogSink(unittest.TestCase):
+    """Test cases for LogSink."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.log_file = os.path.join(self.temp_dir, "ralph.log")
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        import shutil
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _read(self, path=None):
+        with open(path or self.log_file, "r", encoding="utf-8") as f:
+            return f.read()
+
+    def test_unbuffered_writes_visible_immediately(self):
+        """Test flush_interval=0 flushes every line."""
+        sink = LogSink(self.log_file)
+        sink.write("first")
+        self.assertEqual(self._read(), "first\n")
+        sink.close()
+
+    def test_buffered_writes_flushed_on_close(self):
+        """Test buffered lines reach the file on flush/close."""
+        sink = LogSink(self.log_file, flush_interval=3600)
+        sink.write("buffered")
+        self.assertEqual(self._read(), "")
+        sink.close()
+        self.assertEqual(self._read(), "buffered\n")
+
+    def test_background_flush(self):
+        """Test the flusher thread writes buffered lines on its interval."""
+        sink = LogSink(self.log_file, flush_interval=0.05)
+        sink.write("later")
+        deadline = time.time() + 2
+        while time.time() < deadline and not self._read():
+            time.sleep(0.02)
+        self.assertEqual(self._read(), "later\n")
+        sink.close()
+
+    def test_rotate_by_size_keeps_backups(self):
+        """Test size-based rotation shifts older segments and drops the oldest."""
+        sink = LogSink(self.log_file, max_bytes=20, backups=2)
+        for number in range(4):
+            sink.write(f"line {number} " + "x" * 10)
+        sink.close()
+
+        self.assertIn("line 3", self._read())
+        self.assertIn("line 2", self._read(self.log_file + ".1"))
+        self.assertIn("line 1", self._read(self.log_file + ".2"))
+        self.assertFalse(os.path.exists(self.log_file + ".3"))
+
+    def test_rotate_by_age_with_gzip(self):
+        """Test age-based rotation gzips the old segment."""
+        sink = LogSink(self.log_file, max_age=0.01, compress=True)
+        sink.write("old")
+        time.sleep(0.02)
+        sink.write("new")
+        sink.close()
+
+        self.assertEqual(self._read(), "new\n")
+        with gzip.open(self.log_file + ".1.gz", "rt", encoding="utf-8") as f:
+            self.assertEqual(f.read(), "old\n")
+
+    def test_write_after_close_reopens(self):
+        """Test late messages (e.g. from a signal handler) are not lost."""
+        sink = LogSink(self.log_file)
+        sink.write("one")
+        sink.close()
+        sink.write("two")
+        sink.close()
+        self.assertEqual(self._read(), "one\ntwo\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""Unit tests for metrics.py"""
+
+import io
+import os
+import sys
+import tempfile
+import unittest
+import urllib.error
+import urllib.request
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from oh_my_ralph.metrics import LoopMetrics, MetricsServer, render
+from oh_my_ralph.ralph_loop import RalphLoop
+
+
+class TestLoopMetrics(unittest.TestCase):
+    """Test cases for LoopMetrics and render."""
+
+    def test_render_counters_and_histogram(self):
+        """Test iterations, exit codes and durations render in Prometheus text."""
+        metrics = LoopMetrics("main")
+        metrics.iteration_started()
+        metrics.iteration_finished(0, 3.0)
+        metrics.iteration_started()
+        metrics.iteration_finished(2, 90.0)
+        metrics.set_consecutive_failures(1)
+
+        text = render([metrics])
+
+        self.assertIn("# TYPE ralph_iterations_total counter", text)
+        self.assertIn('ralph_iterations_total{worker="main"} 2', text)
+        self.assertIn('ralph_iteration_successes_total{worker="main"} 1', text)
+        self.assertIn('ralph_iteration_failures_total{worker="main"} 1', text)
+        self.assertIn('ralph_consecutive_failures{worker="main"} 1', text)
+        self.assertIn('ralph_agent_exit_code_total{worker="main",code="2"} 1', text)
+        self.assertIn("# TYPE ralph_iteration_duration_seconds histogram", text)
+        self.assertIn('ralph_iteration_duration_seconds_bucket{worker="main",le="5"} 1', text)
+        self.assertIn('ralph_iteration_duration_seconds_bucket{worker="main",le="120"} 2', text)
+        self.assertIn('ralph_iteration_duration_seconds_bucket{worker="main",le="+Inf"} 2', text)
+        self.assertIn('ralph_iteration_duration_seconds_sum{worker="main"} 93', text)
+        self.assertIn('ralph_phase{worker="main",phase="running_agent"} 1', text)
+
+    def test_render_several_workers_once_per_family(self):
+        """Test HELP/TYPE lines appear once when several loops are rendered."""
+        text = render([LoopMetrics("worker-1"), LoopMetrics("worker-2")])
+        self.assertEqual(text.count("# TYPE ralph_iterations_total"), 1)
+        self.assertIn('ralph_iterations_total{worker="worker-1"} 0', text)
+        self.assertIn('ralph_iterations_total{worker="worker-2"} 0', text)
+
+    def test_server_alive_gauge(self):
+        """Test the opencode server gauge reflects the callback."""
+        metrics = LoopMetrics()
+        self.assertNotIn("ralph_opencode_server_up", render([metrics]))
+        metrics.server_alive = lambda: True
+        self.assertIn('ralph_opencode_server_up{worker="main"} 1', render([metrics]))
+
+
+class TestMetricsServer(unittest.TestCase):
+    """Test cases for MetricsServer."""
+
+    def test_serves_metrics_over_http(self):
+        """Test /metrics is served and unknown paths return 404."""
+        metrics = LoopMetrics()
+        server = MetricsServer(0, [metrics])
+        server.start()
+        try:
+            url = f"http://127.0.0.1:{server.port}"
+            with urllib.request.urlopen(f"{url}/metrics", timeout=5) as response:
+                self.assertIn("text/plain", response.headers["Content-Type"])
+                self.assertIn('ralph_iterations_total{worker="main"} 0', response.read().decode())
+            with self.assertRaises(urllib.error.HTTPError):
+                urllib.request.urlopen(f"{url}/other", timeout=5)
+        finally:
+            server.stop()
+
+
+class TestRalphLoopMetrics(unittest.TestCase):
+    """Test cases for metrics recorded by RalphLoop."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.log_file = os.path.join(self.temp_dir, "test.log")
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        import shutil
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_metrics_off_by_default(self):
+        """Test no metrics are collected without a metrics port."""
+        ralph = RalphLoop(log_file=self.log_file, working_dir=self.temp_dir, install_signal_handlers=False)
+        self.assertIsNone(ralph.metrics)
+
+    @patch("subprocess.Popen")
+    def test_iteration_updates_metrics(self, mock_popen):
+        """Test an iteration is counted with its exit code and failure streak."""
+        mock_process = MagicMock()
+        mock_process.stdout = io.StringIO("output")
+        mock_process.stderr = io.StringIO()
+        mock_process.stdin = io.StringIO()
+        mock_process.returncode = 1
+        mock_popen.return_value = mock_process
+
+        os.makedirs(os.path.join(self.temp_dir, ".ralphy"))
+        with open(os.path.join(self.temp_dir, ".ralphy", "prompt.md"), "w") as f:
+            f.write("Test prompt")
+        ralph = RalphLoop(
+            log_file=self.log_file,
+            working_dir=self.temp_dir,
+            install_signal_handlers=False,
+            metrics_port=0,
+        )
+
+        success, _ = ralph.run_single_iteration()
+        ralph._record_result(success)
+
+        text = render([ralph.metrics])
+        self.assertIn('ralph_iterations_total{worker="main"} 1', text)
+        self.assertIn('ralph_iteration_failures_total{worker="main"} 1', text)
+        self.assertIn('ralph_agent_exit_code_total{worker="main",code="1"} 1', text)
+        self.assertIn('ralph_consecutive_failures{worker="main"} 1', text)
+        self.assertIn('ralph_opencode_server_up{worker="main"} 0', text)
+        ralph._close_sinks()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""Unit tests for opencode_server.py and the loop's opencode server handling"""
+
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from unittest.mock import Mock, patch
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from oh_my_ralph.opencode_server import port_open, wait_until_listening
+from oh_my_ralph.ralph_loop import RalphLoop
+
+
+class TestReadinessProbe(unittest.TestCase):
+    """Test cases for the TCP readiness probe."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.bind(("127.0.0.1", 0))
+        self.port = self.listener.getsockname()[1]
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.listener.close()
+
+    def test_port_open_when_listening(self):
+        """Test the probe succeeds once the port is listening."""
+        self.listener.listen()
+        self.assertTrue(port_open(self.port, host="127.0.0.1"))
+        self.assertTrue(wait_until_listening(self.port, 1, host="127.0.0.1"))
+
+    def test_gives_up_when_process_exited(self):
+        """Test waiting stops as soon as the server process is gone."""
+        start = time.monotonic()
+        ready = wait_until_listening(self.port, 30, is_alive=lambda: False, host="127.0.0.1")
+        self.assertFalse(ready)
+        self.assertLess(time.monotonic() - start, 5)
+
+    def test_times_out(self):
+        """Test waiting gives up after the timeout."""
+        self.assertFalse(wait_until_listening(self.port, 0.3, is_alive=lambda: True, host="127.0.0.1"))
+
+
+class TestOpencodeServerSupervision(unittest.TestCase):
+    """Test cases for starting and restarting the opencode web server."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.log_file = os.path.join(self.temp_dir, "test.log")
+        self.ralph = RalphLoop(working_dir=self.temp_dir, log_file=self.log_file, install_signal_handlers=False)
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        import shutil
+        self.ralph._close_opencode_log()
+        self.ralph._close_sinks()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    @patch("oh_my_ralph.ralph_loop.subprocess.Popen")
+    def test_server_output_goes_to_log_file(self, mock_popen):
+        """Test the server writes to .ralphy/opencode-web.log instead of pipes."""
+        self.ralph.start_opencode_web_at_port()
+
+        kwargs = mock_popen.call_args.kwargs
+        self.assertEqual(kwargs["stderr"], subprocess.STDOUT)
+        self.assertEqual(kwargs["stdout"].name, str(self.ralph.opencode_log))
+        self.assertTrue(self.ralph.opencode_log.exists())
+
+    @patch("oh_my_ralph.opencode_server.wait_until_listening", return_value=True)
+    @patch("oh_my_ralph.ralph_loop.subprocess.Popen")
+    def test_restarts_dead_server(self, mock_popen, mock_wait):
+        """Test a server that exited is restarted before the next iteration."""
+        dead = Mock()
+        dead.poll.return_value = 1
+        self.ralph.opencode_proc = dead
+        mock_popen.return_value = Mock(**{"poll.return_value": None})
+
+        self.ralph.ensure_opencode_server()
+
+        mock_popen.assert_called_once()
+        mock_wait.assert_called_once()
+        self.assertIs(self.ralph.opencode_proc, mock_popen.return_value)
+        with open(self.log_file, "r", encoding="utf-8") as f:
+            self.assertIn("exited with code 1. Restarting it.", f.read())
+
+    @patch("oh_my_ralph.ralph_loop.subprocess.Popen")
+    def test_live_server_left_alone(self, mock_popen):
+        """Test a running server is not restarted."""
+        self.ralph.opencode_proc = Mock(**{"poll.return_value": None})
+        self.ralph.ensure_opencode_server()
+        mock_popen.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""Unit tests for output_capture.py"""
+
+import io
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from oh_my_ralph.output_capture import OutputCapture
+
+
+class TestOutputCapture(unittest.TestCase):
+    """Test cases for OutputCapture."""
+
+    def test_small_output_kept_whole(self):
+        """Test output smaller than head + tail is returned unchanged."""
+        capture = OutputCapture(head_chars=10, tail_chars=10)
+        capture.write("hello ")
+        capture.write("world")
+
+        self.assertFalse(capture.truncated)
+        self.assertEqual(capture.getvalue(), "hello world")
+
+    def test_large_output_keeps_head_and_tail(self):
+        """Test only the head and tail of large output stay in memory."""
+        capture = OutputCapture(head_chars=5, tail_chars=5)
+        capture.write("HEAD-")
+        for _ in range(1000):
+            capture.write("x" * 100)
+        capture.write("-TAIL")
+
+        value = capture.getvalue()
+        self.assertTrue(capture.truncated)
+        self.assertTrue(value.startswith("HEAD-"))
+        self.assertTrue(value.endswith("-TAIL"))
+        self.assertIn("characters omitted", value)
+        self.assertEqual(capture.total_chars, 100010)
+        self.assertLess(len(value), 100)
+
+    def test_marker_detected_across_writes(self):
+        """Test the marker is found even when split between two writes."""
+        capture = OutputCapture(head_chars=4, tail_chars=4, marker="<DONE>")
+        capture.write("a" * 50 + "<DO")
+        self.assertFalse(capture.marker_seen)
+        capture.write("NE>" + "b" * 50)
+        self.assertTrue(capture.marker_seen)
+
+    def test_transcript_receives_everything(self):
+        """Test the transcript gets the full output, not just head and tail."""
+        transcript = io.StringIO()
+        capture = OutputCapture(head_chars=2, tail_chars=2, transcript=transcript, transcript_prefix="> ")
+        capture.write("first\n")
+        capture.write("second\n")
+
+        self.assertEqual(transcript.getvalue(), "> first\n> second\n")
+        self.assertEqual(capture.total_bytes, len("first\nsecond\n"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""Unit tests for process_group.py and the loop's timeouts and budget"""
+
+import os
+import sys
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from oh_my_ralph.ralph_loop import RalphLoop
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    # A killed child of ours may linger as a zombie until reaped
+    try:
+        with open(f"/proc/{pid}/stat", "r") as f:
+            return f.read().split()[2] != "Z"
+    except OSError:
+        return True
+
+
+class TestTimeoutKillsProcessTree(unittest.TestCase):
+    """Test cases for killing the agent's whole process tree."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.log_file = os.path.join(self.temp_dir, "test.log")
+        self.pid_file = os.path.join(self.temp_dir, "grandchild.pid")
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        import shutil
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _agent(self, **kwargs):
+        # The shell backgrounds a grandchild and waits on it, like an agent
+        # that started a dev server or test runner
+        return RalphLoop(
+            agent_command=f"sh -c 'sleep 30 & echo $! > {self.pid_file}; wait'",
+            working_dir=self.temp_dir,
+            log_file=self.log_file,
+            install_signal_handlers=False,
+            iteration_timeout=0.5,
+            **kwargs,
+        )
+
+    def _grandchild_pid(self):
+        deadline = time.monotonic() + 5
+        while not os.path.exists(self.pid_file) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        with open(self.pid_file, "r") as f:
+            return int(f.read())
+
+    def _assert_killed(self, pid):
+        deadline = time.monotonic() + 5
+        while _pid_alive(pid) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertFalse(_pid_alive(pid))
+
+    @unittest.skipIf(sys.platform == "win32", "POSIX process groups")
+    def test_timeout_kills_grandchildren(self):
+        """Test a timed-out agent's children are killed along with the shell."""
+        ralph = self._agent()
+        return_code, _, stderr = ralph._run_agent("prompt")
+
+        self.assertEqual(return_code, -1)
+        self.assertIn("timed out", stderr)
+        self._assert_killed(self._grandchild_pid())
+        self.assertIsNone(ralph._agent_proc)
+
+    @unittest.skipIf(sys.platform == "win32", "POSIX process groups")
+    def test_streaming_timeout_kills_grandchildren(self):
+        """Test the streaming path kills the whole tree on timeout too."""
+        ralph = self._agent(stream_output=True)
+        return_code, _, stderr = ralph._run_agent("prompt")
+
+        self.assertEqual(return_code, -1)
+        self.assertIn("timed out", stderr)
+        self._assert_killed(self._grandchild_pid())
+
+    @unittest.skipIf(sys.platform == "win32", "POSIX process groups")
+    @patch("oh_my_ralph.ralph_loop.DONE_GRACE_PERIOD", 0.5)
+    def test_agent_exit_ends_iteration_despite_background_child(self):
+        """Test an agent that exits 0 but leaves a child holding its pipes is not reported as a timeout."""
+        ralph = RalphLoop(
+            agent_command='sh -c "sleep 30 & echo hi; exit 0"',
+            working_dir=self.temp_dir,
+            log_file=self.log_file,
+            install_signal_handlers=False,
+            iteration_timeout=8,
+        )
+        started = time.monotonic()
+        result = ralph._run_agent("prompt")
+
+        self.assertEqual(result, (0, "hi\n", ""))
+        self.assertLess(time.monotonic() - started, 5)
+        ralph._close_sinks()
+        with open(self.log_file, "r", encoding="utf-8") as f:
+            self.assertIn("Agent exited but its pipes are still open", f.read())
+
+
+
+class TestTotalBudget(unittest.TestCase):
+    """Test cases for the total wall-clock budget."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.log_file = os.path.join(self.temp_dir, "test.log")
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        import shutil
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _loop(self, **kwargs):
+        return RalphLoop(
+            agent_command="test-agent",
+            working_dir=self.temp_dir,
+            log_file=self.log_file,
+            install_signal_handlers=False,
+            **kwargs,
+        )
+
+    def test_timeout_capped_by_remaining_budget(self):
+        """Test an iteration never gets more time than the budget has left."""
+        ralph = self._loop(iteration_timeout=3600, total_budget=100)
+        ralph.budget_started = time.monotonic() - 70
+        self.assertAlmostEqual(ralph._agent_timeout(), 30, delta=1)
+        self.assertEqual(self._loop(iteration_timeout=120)._agent_timeout(), 120)
+
+    def test_exhausted_budget_stops_loop(self):
+        """Test no iteration starts once the budget is used up."""
+        ralph = self._loop(total_budget=10)
+        ralph.budget_started = time.monotonic() - 11
+        self.assertFalse(ralph._iteration_allowed())
+
+    def test_budget_reported_per_iteration(self):
+        """Test each iteration logs its share of the budget."""
+        ralph = self._loop(total_budget=1000)
+        with patch.object(ralph, "_run_agent", return_value=(0, "ok", "")):
+            ralph.run_single_iteration()
+        with open(self.log_file, "r", encoding="utf-8") as f:
+            self.assertIn("of the 1000s budget", f.read())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -15,6 +15,18 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 from oh_my_ralph.ralph_loop import RalphLoop
 
 
+def piped_process(stdout_text="", stderr_text="", returncode=0, running=False):
+    """Build a mock agent process whose pipes are in-memory streams."""
+    from io import StringIO
+    mock_process = Mock()
+    mock_process.stdout = StringIO(stdout_text)
+    mock_process.stderr = StringIO(stderr_text)
+    mock_process.stdin = StringIO()
+    mock_process.returncode = returncode
+    mock_process.poll.return_value = None if running else returncode
+    return mock_process
+
+
 class TestRalphLoop(unittest.TestCase):
     """Test cases for RalphLoop class."""
 
@@ -22,6 +34,8 @@ class TestRalphLoop(unittest.TestCase):
         """Set up test fixtures."""
         self.temp_dir = tempfile.mkdtemp()
         self.log_file = os.path.join(self.temp_dir, "test.log")
+        # run() changes into the working dir, which tearDown removes
+        self.original_cwd = os.path.dirname(os.path.abspath(__file__))
         self.prompt_file = os.path.join(self.temp_dir, ".ralphy", "prompt.md")
         
         # Create .ralphy directory structure
@@ -42,6 +56,7 @@ class TestRalphLoop(unittest.TestCase):
     def tearDown(self):
         """Clean up test fixtures."""
         import shutil
+        os.chdir(self.original_cwd)
         shutil.rmtree(self.temp_dir, ignore_errors=True)
 
     def test_initialization(self):
@@ -74,6 +89,16 @@ class TestRalphLoop(unittest.TestCase):
             content = f.read()
             self.assertIn("Test message", content)
 
+    def test_relative_log_file_follows_working_dir(self):
+        """Test a relative log path is kept in the working dir, and buffered logs flush on shutdown."""
+        ralph = RalphLoop(log_file="relative.log", working_dir=self.temp_dir, log_flush_interval=3600)
+        ralph._log("Buffered message")
+        ralph._signal_handler(signal.SIGINT, None)
+
+        with open(os.path.join(self.temp_dir, "relative.log"), "r", encoding="utf-8") as f:
+            self.assertIn("Buffered message", f.read())
+        ralph._log_sink.close()
+
     def test_read_prompt_success(self):
         """Test reading prompt file successfully."""
         ralph = RalphLoop(working_dir=self.temp_dir, log_file=self.log_file)
@@ -168,11 +193,44 @@ class TestRalphLoop(unittest.TestCase):
         self.assertNotIn("--model", cmd)
         self.assertIn("Read and follow the instructions", cmd)
 
+    def test_build_agent_command_continues_session(self):
+        """Test the continue flag is added only when continuing a session."""
+        ralph = RalphLoop(
+            agent_command="claude -p",
+            working_dir=self.temp_dir,
+            log_file=self.log_file,
+            reuse_session=True,
+        )
+
+        self.assertNotIn("--continue", ralph._build_agent_command("test prompt"))
+        ralph.continuing_session = True
+        cmd = ralph._build_agent_command("test prompt")
+        self.assertIn("--dangerously-skip-permissions --continue", cmd)
+        self.assertIn("Read and follow the instructions", cmd)
+
+    def test_session_reuse_lifecycle(self):
+        """Test sessions start fresh first, after failures and on refresh."""
+        ralph = RalphLoop(
+            agent_command="opencode run",
+            working_dir=self.temp_dir,
+            log_file=self.log_file,
+            reuse_session=True,
+            session_refresh_every=3,
+        )
+        continued = []
+        with patch.object(ralph, "_run_agent") as mock_run:
+            for return_code in (0, 0, 0, 0, 1, 0):
+                mock_run.return_value = (return_code, "", "")
+                success, _ = ralph.run_single_iteration()
+                continued.append(ralph.continuing_session)
+                ralph._record_result(success)
+
+        self.assertEqual(continued, [False, True, True, False, True, False])
+
     @patch("oh_my_ralph.ralph_loop.subprocess.Popen")
     def test_run_agent_copilot_no_stdin(self, mock_popen):
         """Test that copilot agent runs without stdin piping."""
-        mock_process = Mock()
-        mock_process.communicate.return_value = ("stdout content", "")
+        mock_process = piped_process("stdout content", "")
         mock_process.returncode = 0
         mock_popen.return_value = mock_process
         
@@ -197,8 +255,7 @@ class TestRalphLoop(unittest.TestCase):
     @patch("oh_my_ralph.ralph_loop.subprocess.Popen")
     def test_run_agent_claude_no_stdin(self, mock_popen):
         """Test that claude agent runs without stdin piping."""
-        mock_process = Mock()
-        mock_process.communicate.return_value = ("stdout content", "")
+        mock_process = piped_process("stdout content", "")
         mock_process.returncode = 0
         mock_popen.return_value = mock_process
         
@@ -223,8 +280,7 @@ class TestRalphLoop(unittest.TestCase):
     @patch("oh_my_ralph.ralph_loop.subprocess.Popen")
     def test_run_agent_amp_no_stdin(self, mock_popen):
         """Test that amp agent runs without stdin piping."""
-        mock_process = Mock()
-        mock_process.communicate.return_value = ("stdout content", "")
+        mock_process = piped_process("stdout content", "")
         mock_process.returncode = 0
         mock_popen.return_value = mock_process
         
@@ -249,8 +305,7 @@ class TestRalphLoop(unittest.TestCase):
     @patch("oh_my_ralph.ralph_loop.subprocess.Popen")
     def test_run_agent_success(self, mock_popen):
         """Test successful agent execution."""
-        mock_process = Mock()
-        mock_process.communicate.return_value = ("stdout content", "")
+        mock_process = piped_process("stdout content", "")
         mock_process.returncode = 0
         mock_popen.return_value = mock_process
         
@@ -269,8 +324,7 @@ class TestRalphLoop(unittest.TestCase):
     @patch("oh_my_ralph.ralph_loop.subprocess.Popen")
     def test_run_agent_failure(self, mock_popen):
         """Test agent execution failure."""
-        mock_process = Mock()
-        mock_process.communicate.return_value = ("", "error message")
+        mock_process = piped_process("", "error message")
         mock_process.returncode = 1
         mock_popen.return_value = mock_process
         
@@ -290,8 +344,8 @@ class TestRalphLoop(unittest.TestCase):
         """Test agent execution timeout."""
         import subprocess
         
-        mock_process = Mock()
-        mock_process.communicate.side_effect = subprocess.TimeoutExpired("cmd", 3600)
+        mock_process = piped_process()
+        mock_process.wait.side_effect = [subprocess.TimeoutExpired("cmd", 3600), -9]
         mock_popen.return_value = mock_process
         
         ralph = RalphLoop(
@@ -305,6 +359,8 @@ class TestRalphLoop(unittest.TestCase):
         self.assertEqual(return_code, -1)
         self.assertIn("timed out", stderr.lower())
         mock_process.kill.assert_called_once()
+        # The killed agent is reaped
+        self.assertEqual(mock_process.wait.call_count, 2)
 
     def test_check_prerequisites_all_exist(self):
         """Test prerequisites check when all files exist."""
@@ -342,8 +398,7 @@ class TestRalphLoop(unittest.TestCase):
     @patch("oh_my_ralph.ralph_loop.subprocess.Popen")
     def test_run_single_iteration_success(self, mock_popen):
         """Test a successful single iteration."""
-        mock_process = Mock()
-        mock_process.communicate.return_value = ("success output", "")
+        mock_process = piped_process("success output", "")
         mock_process.returncode = 0
         mock_popen.return_value = mock_process
         
@@ -362,8 +417,7 @@ class TestRalphLoop(unittest.TestCase):
     @patch("oh_my_ralph.ralph_loop.subprocess.Popen")
     def test_run_single_iteration_failure(self, mock_popen):
         """Test a failed single iteration."""
-        mock_process = Mock()
-        mock_process.communicate.return_value = ("", "error")
+        mock_process = piped_process("", "error")
         mock_process.returncode = 1
         mock_popen.return_value = mock_process
         
@@ -382,8 +436,7 @@ class TestRalphLoop(unittest.TestCase):
     @patch("oh_my_ralph.ralph_loop.subprocess.Popen")
     def test_run_single_iteration_with_done_marker(self, mock_popen):
         """Test iteration detects <PROMISE>DONE</PROMISE> marker."""
-        mock_process = Mock()
-        mock_process.communicate.return_value = ("Some output <PROMISE>DONE</PROMISE> more text", "")
+        mock_process = piped_process("Some output <PROMISE>DONE</PROMISE> more text", "")
         mock_process.returncode = 0
         mock_popen.return_value = mock_process
         
@@ -404,11 +457,28 @@ class TestRalphLoop(unittest.TestCase):
             log_content = f.read()
             self.assertIn("DETECTED COMPLETION MARKER", log_content)
 
+    def test_done_marker_log_uses_adapter_marker(self):
+        """Test the completion log line names the adapter's own marker."""
+        ralph = RalphLoop(
+            agent_command="test-agent",
+            working_dir=self.temp_dir,
+            log_file=self.log_file,
+        )
+        ralph.agent.completion_marker = "ALL_TASKS_COMPLETE"
+
+        with patch.object(ralph, "_run_agent", return_value=(0, "done ALL_TASKS_COMPLETE", "")):
+            _, should_stop = ralph.run_single_iteration()
+
+        self.assertTrue(should_stop)
+        with open(self.log_file, "r", encoding="utf-8") as f:
+            log_content = f.read()
+        self.assertIn("DETECTED COMPLETION MARKER: ALL_TASKS_COMPLETE", log_content)
+        self.assertNotIn("<PROMISE>DONE</PROMISE>", log_content)
+
     @patch("oh_my_ralph.ralph_loop.subprocess.Popen")
     def test_run_single_iteration_without_done_marker(self, mock_popen):
         """Test iteration continues without done marker."""
-        mock_process = Mock()
-        mock_process.communicate.return_value = ("Regular output without marker", "")
+        mock_process = piped_process("Regular output without marker", "")
         mock_process.returncode = 0
         mock_popen.return_value = mock_process
         
@@ -475,8 +545,7 @@ class TestRalphLoop(unittest.TestCase):
     @patch("oh_my_ralph.ralph_loop.subprocess.Popen")
     def test_run_with_max_iterations(self, mock_popen, mock_sleep):
         """Test run loop with max iterations."""
-        mock_process = Mock()
-        mock_process.communicate.return_value = ("output", "")
+        mock_process = piped_process("output", "")
         mock_process.returncode = 0
         mock_popen.return_value = mock_process
         
@@ -588,9 +657,8 @@ class TestRalphLoop(unittest.TestCase):
     @patch("oh_my_ralph.ralph_loop.subprocess.Popen")
     def test_run_stops_on_done_marker(self, mock_popen, mock_sleep):
         """Test that run loop stops when done marker is detected."""
-        mock_process = Mock()
         # First iteration returns done marker
-        mock_process.communicate.return_value = ("<PROMISE>DONE</PROMISE>", "")
+        mock_process = piped_process("<PROMISE>DONE</PROMISE>")
         mock_process.returncode = 0
         mock_popen.return_value = mock_process
         
@@ -613,6 +681,267 @@ class TestRalphLoop(unittest.TestCase):
             log_content = f.read()
             self.assertIn("Agent signaled completion", log_content)
 
+    def _streaming_process(self, stdout_text, stderr_text="", returncode=0, running=False):
+        return piped_process(stdout_text, stderr_text, returncode, running)
+
+    @patch("oh_my_ralph.ralph_loop.subprocess.Popen")
+    def test_run_agent_streaming_captures_output(self, mock_popen):
+        """Test streaming mode reads output line by line and tees it to the log."""
+        mock_process = self._streaming_process("line one\nline two\n", "warn\n")
+        mock_popen.return_value = mock_process
+
+        ralph = RalphLoop(
+            agent_command="claude -p",
+            working_dir=self.temp_dir,
+            log_file=self.log_file,
+            stream_output=True,
+        )
+
+        return_code, stdout, stderr = ralph._run_agent("test prompt")
+
+        self.assertEqual(return_code, 0)
+        self.assertEqual(stdout, "line one\nline two\n")
+        self.assertEqual(stderr, "warn\n")
+        mock_process.communicate.assert_not_called()
+        with open(self.log_file, "r", encoding="utf-8") as f:
+            log_content = f.read()
+            self.assertIn("stdout| line two", log_content)
+            self.assertIn("stderr| warn", log_content)
+
+    @patch("oh_my_ralph.ralph_loop.subprocess.Popen")
+    def test_run_agent_streaming_writes_prompt_to_stdin(self, mock_popen):
+        """Test streaming mode still feeds the prompt to stdin-driven agents."""
+        mock_process = self._streaming_process("ok\n")
+        stdin = Mock()
+        mock_process.stdin = stdin
+        mock_popen.return_value = mock_process
+
+        ralph = RalphLoop(
+            agent_command="test-agent",
+            working_dir=self.temp_dir,
+            log_file=self.log_file,
+            stream_output=True,
+        )
+
+        ralph._run_agent("test prompt")
+
+        stdin.write.assert_called_once_with("test prompt")
+        stdin.close.assert_called_once()
+
+    @patch("oh_my_ralph.ralph_loop.DONE_GRACE_PERIOD", 0)
+    @patch("oh_my_ralph.ralph_loop.subprocess.Popen")
+    def test_stop_on_done_terminates_lingering_agent(self, mock_popen):
+        """Test stop_on_done ends the iteration once the marker is seen."""
+        mock_process = self._streaming_process("working\n<PROMISE>DONE</PROMISE>\n", running=True)
+        mock_process.returncode = -15
+        mock_popen.return_value = mock_process
+
+        ralph = RalphLoop(
+            agent_command="test-agent",
+            working_dir=self.temp_dir,
+            log_file=self.log_file,
+            stop_on_done=True,
+        )
+
+        success, should_stop = ralph.run_single_iteration()
+
+        self.assertTrue(ralph.stream_output)
+        mock_process.terminate.assert_called_once()
+        self.assertTrue(success)
+        self.assertTrue(should_stop)
+
+    def test_invalid_utf8_output_does_not_stall_agent(self):
+        """Test bytes that are not UTF-8 are replaced and the pipes keep draining."""
+        agent = os.path.join(self.temp_dir, "agent.py")
+        with open(agent, "w", encoding="utf-8") as f:
+            f.write(
+                "import sys\n"
+                "sys.stdout.buffer.write(b'caf\\xe9\\n' + b'x' * 2000000 + b'\\n')\n"
+                "sys.stdout.buffer.write(b'<PROMISE>DONE</PROMISE>\\n')\n"
+            )
+        ralph = RalphLoop(
+            agent_command=f"{sys.executable} {agent}",
+            working_dir=self.temp_dir,
+            log_file=self.log_file,
+            install_signal_handlers=False,
+            iteration_timeout=30,
+        )
+
+        success, should_stop = ralph.run_single_iteration()
+
+        self.assertTrue(success)
+        self.assertTrue(should_stop)
+        self.assertGreater(ralph._agent_stats["stdout_bytes"], 2000000)
+
+    @patch("oh_my_ralph.ralph_loop.subprocess.Popen")
+    def test_keep_transcripts_writes_iteration_file(self, mock_popen):
+        """Test full output is spilled to a per-iteration transcript."""
+        mock_popen.return_value = self._streaming_process("x" * 200000 + "\n<PROMISE>DONE</PROMISE>\n" + "y" * 200000 + "\n")
+
+        ralph = RalphLoop(
+            agent_command="test-agent",
+            working_dir=self.temp_dir,
+            log_file=self.log_file,
+            keep_transcripts=True,
+        )
+
+        success, should_stop = ralph.run_single_iteration()
+
+        transcript = os.path.join(self.temp_dir, ".ralphy", "transcripts", "iteration-0001.log")
+        self.assertTrue(os.path.exists(transcript))
+        self.assertGreater(os.path.getsize(transcript), 400000)
+        # The marker sits in the omitted middle but is still detected
+        self.assertTrue(should_stop)
+        with open(self.log_file, "r", encoding="utf-8") as f:
+            log_content = f.read()
+            self.assertNotIn("stdout| xxx", log_content)
+            self.assertIn("Transcript saved", log_content)
+
+    def _read_events(self):
+        import json
+        events_file = os.path.join(self.temp_dir, ".ralphy", "events.jsonl")
+        with open(events_file, "r", encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+
+    @patch("oh_my_ralph.ralph_loop.subprocess.Popen")
+    def test_iteration_event_recorded(self, mock_popen):
+        """Test each iteration appends a structured event to events.jsonl."""
+        mock_process = piped_process("héllo <PROMISE>DONE</PROMISE>", "err")
+        mock_process.returncode = 0
+        mock_popen.return_value = mock_process
+
+        ralph = RalphLoop(
+            agent_command="claude -p",
+            model="sonnet",
+            working_dir=self.temp_dir,
+            log_file=self.log_file,
+        )
+        ralph.run_single_iteration()
+
+        event = self._read_events()[0]
+        self.assertEqual(event["event"], "iteration")
+        self.assertEqual(event["iteration"], 1)
+        self.assertEqual(event["agent_command"], "claude -p")
+        self.assertEqual(event["model"], "sonnet")
+        self.assertEqual(event["exit_code"], 0)
+        self.assertEqual(event["stdout_bytes"], len("héllo <PROMISE>DONE</PROMISE>".encode("utf-8")))
+        self.assertEqual(event["stderr_bytes"], 3)
+        self.assertTrue(event["done_marker"])
+        self.assertIsNotNone(event["spawn_latency_s"])
+        self.assertIsNotNone(event["first_output_s"])
+        self.assertIn("wall_time_s", event)
+
+    @patch("oh_my_ralph.ralph_loop.subprocess.Popen")
+    def test_streaming_event_has_first_output_latency(self, mock_popen):
+        """Test streaming runs record time to first output."""
+        mock_popen.return_value = self._streaming_process("first\n")
+
+        ralph = RalphLoop(
+            agent_command="test-agent",
+            working_dir=self.temp_dir,
+            log_file=self.log_file,
+            stream_output=True,
+        )
+        ralph.run_single_iteration()
+
+        event = self._read_events()[0]
+        self.assertIsNotNone(event["first_output_s"])
+        self.assertEqual(event["stdout_bytes"], 6)
+
+    def test_failed_iteration_event_and_opt_out(self):
+        """Test errors are recorded, and record_events=False writes nothing."""
+        os.remove(self.prompt_file)
+        ralph = RalphLoop(working_dir=self.temp_dir, log_file=self.log_file)
+        ralph.run_single_iteration()
+        event = self._read_events()[0]
+        self.assertIsNone(event["exit_code"])
+        self.assertIn("Prompt file not found", event["error"])
+
+        ralph._close_sinks()
+        os.remove(os.path.join(self.temp_dir, ".ralphy", "events.jsonl"))
+        quiet = RalphLoop(working_dir=self.temp_dir, log_file=self.log_file, record_events=False)
+        quiet.run_single_iteration()
+        self.assertFalse(os.path.exists(os.path.join(self.temp_dir, ".ralphy", "events.jsonl")))
+
+    @patch("oh_my_ralph.ralph_loop.subprocess.Popen")
+    def test_assign_tasks_injects_task_into_prompt(self, mock_popen):
+        """Test the scheduled fix_plan task is added to the agent's prompt."""
+        mock_process = piped_process("output", "")
+        mock_process.returncode = 0
+        mock_popen.return_value = mock_process
+        fix_plan = os.path.join(self.temp_dir, ".ralphy", "fix_plan.md")
+        with open(fix_plan, "w", encoding="utf-8") as f:
+            f.write("## To Do\n\n### 🟢 Low\n\n- Polish docs\n\n### 🔴 Critical\n\n- Fix login crash\n")
+
+        ralph = RalphLoop(
+            agent_command="claude -p",
+            working_dir=self.temp_dir,
+            log_file=self.log_file,
+            assign_tasks=True,
+        )
+
+        ralph.run_single_iteration()
+
+        argv = mock_popen.call_args[0][0]
+        self.assertIn("iteration_prompt.md", argv[-1])
+        iteration_prompt = os.path.join(self.temp_dir, ".ralphy", "iteration_prompt.md")
+        with open(iteration_prompt, "r", encoding="utf-8") as f:
+            content = f.read()
+            self.assertTrue(content.startswith("Test prompt content"))
+            self.assertIn("[critical] Fix login crash", content)
+            self.assertNotIn("Polish docs", content)
+        with open(self.log_file, "r", encoding="utf-8") as f:
+            self.assertIn("Task still open: Fix login crash", f.read())
+
+    def test_assigned_task_done_when_checked_off_or_removed(self):
+        """Test a task stays open after a failure and is done once checked off or removed."""
+        from oh_my_ralph.fix_plan import TaskIndex, TaskScheduler
+        shared_plan = os.path.join(self.temp_dir, "shared_plan.md")
+        with open(shared_plan, "w", encoding="utf-8") as f:
+            f.write("## To Do\n\n- Fix login crash\n- Polish docs\n")
+        own_plan = os.path.join(self.temp_dir, ".ralphy", "fix_plan.md")
+        with open(own_plan, "w", encoding="utf-8") as f:
+            f.write("## To Do\n\n- Fix login crash\n")
+        scheduler = TaskScheduler(TaskIndex(shared_plan))
+        ralph = RalphLoop(
+            agent_command="test-agent",
+            working_dir=self.temp_dir,
+            log_file=self.log_file,
+            task_scheduler=scheduler,
+        )
+
+        with patch.object(RalphLoop, "_run_agent", return_value=(0, "output", "")):
+            ralph.run_single_iteration()
+        self.assertEqual(scheduler.claim("other").text, "Fix login crash")
+        scheduler.finish("other", False)
+
+        def check_off(prompt):
+            with open(own_plan, "w", encoding="utf-8") as f:
+                f.write("## Completed\n\n- [x] Fix login crash\n")
+            return 0, "output", ""
+
+        with patch.object(RalphLoop, "_run_agent", side_effect=check_off):
+            ralph.run_single_iteration()
+        self.assertEqual(scheduler.claim("other").text, "Polish docs")
+        scheduler.finish("other", False)
+
+        # Not in the loop's own plan: open after a failure, done after a success
+        with patch.object(RalphLoop, "_run_agent", return_value=(1, "", "error")):
+            ralph.run_single_iteration()
+        with patch.object(RalphLoop, "_run_agent", return_value=(0, "output", "")):
+            ralph.run_single_iteration()
+        self.assertIsNone(scheduler.claim("other"))
+        ralph._close_sinks()
+        with open(self.log_file, "r", encoding="utf-8") as f:
+            log_content = f.read()
+        self.assertIn("Task still open: Fix login crash", log_content)
+        self.assertIn("Task completed: Fix login crash", log_content)
+        self.assertIn("the assigned task is not in", log_content)
+        self.assertIn("leaving it open: Polish docs", log_content)
+        self.assertIn("counting it as done: Polish docs", log_content)
+        self.assertIn("Task completed: Polish docs", log_content)
+
+
 
 class TestRalphLoopIntegration(unittest.TestCase):
     """Integration tests for RalphLoop."""
@@ -621,10 +950,13 @@ class TestRalphLoopIntegration(unittest.TestCase):
         """Set up test fixtures."""
         self.temp_dir = tempfile.mkdtemp()
         self.log_file = os.path.join(self.temp_dir, "test.log")
+        # run() changes into the working dir, which tearDown removes
+        self.original_cwd = os.path.dirname(os.path.abspath(__file__))
 
     def tearDown(self):
         """Clean up test fixtures."""
         import shutil
+        os.chdir(self.original_cwd)
         shutil.rmtree(self.temp_dir, ignore_errors=True)
 
     @patch("oh_my_ralph.ralph_loop.time.sleep")
@@ -640,8 +972,7 @@ class TestRalphLoopIntegration(unittest.TestCase):
             f.write("Test prompt")
         
         # Mock successful agent execution
-        mock_process = Mock()
-        mock_process.communicate.return_value = ("Success", "")
+        mock_process = piped_process("Success", "")
         mock_process.returncode = 0
         mock_process.poll.return_value = None
         mock_popen.return_value = mock_process
@@ -697,8 +1028,7 @@ class TestNoSideEffects(unittest.TestCase):
     @patch("oh_my_ralph.ralph_loop.subprocess.Popen")
     def test_subprocess_always_mocked_in_execution(self, mock_popen, mock_signal):
         """Ensure subprocess calls are always mocked when executing."""
-        mock_process = Mock()
-        mock_process.communicate.return_value = ("test", "")
+        mock_process = piped_process("test", "")
         mock_process.returncode = 0
         mock_popen.return_value = mock_process
         
@@ -731,6 +1061,8 @@ class TestRalphLoopEdgeCases(unittest.TestCase):
     def setUp(self):
         self.temp_dir = tempfile.mkdtemp()
         self.log_file = os.path.join(self.temp_dir, "test.log")
+        # run() changes into the working dir, which tearDown removes
+        self.original_cwd = os.path.dirname(os.path.abspath(__file__))
         self.prompt_file = os.path.join(self.temp_dir, ".ralphy", "prompt.md")
         os.makedirs(os.path.dirname(self.prompt_file), exist_ok=True)
         with open(self.prompt_file, "w", encoding="utf-8") as f:
@@ -738,6 +1070,7 @@ class TestRalphLoopEdgeCases(unittest.TestCase):
 
     def tearDown(self):
         import shutil
+        os.chdir(self.original_cwd)
         shutil.rmtree(self.temp_dir, ignore_errors=True)
         # Clean up bad_dir if created by any test
         if os.path.exists("bad_dir"):
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""Unit tests for resources.py"""
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from oh_my_ralph import resources
+from oh_my_ralph.ralph_loop import RalphLoop
+from oh_my_ralph.resources import copy_if_changed, file_digest, resource_path
+
+
+class TestResources(unittest.TestCase):
+    """Test cases for resource lookup and copying."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.src = os.path.join(self.temp_dir, "src.md")
+        self.dst = os.path.join(self.temp_dir, "dst.md")
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _write(self, path, text):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def test_resource_path_is_resolved_once(self):
+        """Test package resources resolve to real files and are looked up only once."""
+        path = resource_path("prompt.md")
+        self.assertTrue(os.path.isfile(path))
+        with patch("importlib.resources.files", side_effect=AssertionError("looked up again")):
+            self.assertEqual(resource_path("prompt.md"), path)
+        self.assertIsNone(resource_path("no-such-file.md"))
+
+    def test_copy_if_changed(self):
+        """Test identical files are left alone and different ones are replaced."""
+        self._write(self.src, "one")
+        self.assertTrue(copy_if_changed(self.src, self.dst))
+        inode = os.stat(self.dst).st_ino
+        self.assertFalse(copy_if_changed(self.src, self.dst))
+        self.assertEqual(os.stat(self.dst).st_ino, inode)
+        self._write(self.src, "two")
+        os.utime(self.src, ns=(1_000_000_000_000_000_000, 1_000_000_000_000_000_000))
+        self.assertTrue(copy_if_changed(self.src, self.dst))
+        self.assertEqual(file_digest(self.dst), file_digest(self.src))
+        self.assertEqual(os.stat(self.dst).st_mtime_ns, os.stat(self.src).st_mtime_ns)
+        self.assertEqual(sorted(os.listdir(self.temp_dir)), ["dst.md", "src.md"])
+
+    def test_readers_never_see_a_partial_file(self):
+        """Test a reader racing with copies only ever sees a whole old or new file."""
+        versions = {letter: letter * (2 * 1024 * 1024) for letter in "ab"}
+        sources = {}
+        for letter, text in versions.items():
+            sources[letter] = os.path.join(self.temp_dir, f"{letter}.md")
+            self._write(sources[letter], text)
+        copy_if_changed(sources["a"], self.dst)
+        seen = set()
+        stop = threading.Event()
+
+        def read():
+            while not stop.is_set():
+                with open(self.dst, "r", encoding="utf-8") as f:
+                    seen.add(f.read() in versions.values())
+
+        reader = threading.Thread(target=read)
+        reader.start()
+        try:
+            for i in range(20):
+                copy_if_changed(sources["ab"[i % 2]], self.dst)
+        finally:
+            stop.set()
+            reader.join()
+        self.assertEqual(seen, {True})
+
+
+class TestPrepareRalphyDir(unittest.TestCase):
+    """Test cases for bootstrapping .ralphy/ in RalphLoop."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.signal_patcher = patch("oh_my_ralph.ralph_loop.signal.signal")
+        self.signal_patcher.start()
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.signal_patcher.stop()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _prepare(self):
+        loop = RalphLoop(working_dir=self.temp_dir, log_file=os.path.join(self.temp_dir, "ralph.log"), quiet=True)
+        loop.prepare_ralphy_dir()
+        loop._close_sinks()
+        log_file = os.path.join(self.temp_dir, "ralph.log")
+        if not os.path.exists(log_file):
+            return ""
+        with open(log_file, "r", encoding="utf-8") as f:
+            return f.read()
+
+    def test_unchanged_prompt_is_not_rewritten(self):
+        """Test a second start leaves an up-to-date prompt.md alone and restores an edited one."""
+        prompt = os.path.join(self.temp_dir, ".ralphy", "prompt.md")
+        self.assertIn("Copied prompt.md", self._prepare())
+        inode = os.stat(prompt).st_ino
+        os.remove(os.path.join(self.temp_dir, "ralph.log"))
+        self.assertNotIn("Copied", self._prepare())
+        self.assertEqual(os.stat(prompt).st_ino, inode)
+        with open(prompt, "a", encoding="utf-8") as f:
+            f.write("local edit\n")
+        self.assertIn("Copied prompt.md", self._prepare())
+        self.assertEqual(file_digest(prompt), file_digest(resources.resource_path("prompt.md")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""Unit tests for snapshots.py"""
+
+import json
+import os
+import shlex
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from oh_my_ralph.ralph_loop import RalphLoop
+from git_fixtures import git, make_repo
+
+# Stand-in agent: edits, adds and deletes files, commits, updates the plan,
+# then exits with the code it is given ("hang" sleeps past the timeout)
+AGENT_SCRIPT = """
+import os, subprocess, sys, time
+mode = sys.argv[1]
+sys.stdin.read()
+open("app.txt", "w").write("half-finished\\n")
+open("scratch.txt", "w").write("agent notes\\n")
+os.remove("untracked.txt")
+subprocess.run(["git", "commit", "-q", "-am", "wip"], check=True)
+open("app.txt", "a").write("more\\n")
+with open(os.path.join(".ralphy", "fix_plan.md"), "a") as f:
+    f.write("- learned something" + chr(10))
+if mode == "hang":
+    time.sleep(30)
+sys.exit(int(mode) if mode.isdigit() else 0)
+"""
+
+# Stand-in agent that does what prompt.md asks: edit, then git add -A and commit
+COMMIT_ALL_SCRIPT = """
+import os, subprocess, sys
+sys.stdin.read()
+open("app.txt", "a").write("done\\n")
+with open(os.path.join(".ralphy", "fix_plan.md"), "a") as f:
+    f.write("- [x] app" + chr(10))
+subprocess.run(["git", "add", "-A"], check=True)
+subprocess.run(["git", "commit", "-q", "-m", "work"], check=True)
+"""
+
+
+class TestIterationSnapshots(unittest.TestCase):
+    """Test cases for per-iteration snapshots and rollback, with a real git repository."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.repo = make_repo(self.temp_dir, {"app.txt": "working\n", "lib.txt": "committed\n"})
+        self.head = git(self.repo, "rev-parse", "HEAD")
+        # Work in progress from before the iteration, which must survive a rollback
+        self._write("lib.txt", "staged edit\n")
+        git(self.repo, "add", "lib.txt")
+        self._write("untracked.txt", "mine\n")
+        self._write(os.path.join(".ralphy", "prompt.md"), "Test prompt")
+        self._write(os.path.join(".ralphy", "fix_plan.md"), "# Plan\n")
+        self.agent_path = os.path.join(self.temp_dir, "agent.py")
+        with open(self.agent_path, "w", encoding="utf-8") as f:
+            f.write(AGENT_SCRIPT)
+        self.signal_patcher = patch("oh_my_ralph.ralph_loop.signal.signal")
+        self.signal_patcher.start()
+        self.print_patcher = patch("builtins.print")
+        self.print_patcher.start()
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.signal_patcher.stop()
+        self.print_patcher.stop()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _write(self, name, text):
+        with open(os.path.join(self.repo, name), "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def _read(self, name):
+        with open(os.path.join(self.repo, name), encoding="utf-8") as f:
+            return f.read()
+
+    def _run(self, mode, policy="rollback", **options):
+        loop = RalphLoop(
+            agent_command=f"{shlex.quote(sys.executable)} {shlex.quote(self.agent_path)} {mode}",
+            working_dir=self.repo,
+            log_file="ralph.log",
+            snapshots=policy,
+            **options,
+        )
+        success, should_stop = loop.run_single_iteration()
+        loop._after_iteration(success, should_stop)
+        loop._close_sinks()
+        with open(loop.events_file, encoding="utf-8") as f:
+            event = json.loads(f.readlines()[-1])
+        return loop, event
+
+    def test_failed_iteration_is_rolled_back(self):
+        """Test a failed iteration's files, commits and staging are undone, but not .ralphy."""
+        _, event = self._run("1")
+        self.assertEqual(git(self.repo, "rev-parse", "HEAD"), self.head)
+        self.assertEqual(self._read("app.txt"), "working\n")
+        self.assertEqual(self._read("untracked.txt"), "mine\n")
+        self.assertFalse(os.path.exists(os.path.join(self.repo, "scratch.txt")))
+        self.assertEqual(git(self.repo, "status", "--porcelain"), "M  lib.txt\n?? untracked.txt")
+        self.assertIn("learned something", self._read(os.path.join(".ralphy", "fix_plan.md")))
+        self.assertEqual(event["files_changed"], 3)
+        # The failed work stays reachable, with the agent's commit as its parent
+        failed = "refs/ralph/main/failed/1"
+        self.assertEqual(git(self.repo, "show", f"{failed}:app.txt"), "half-finished\nmore")
+        self.assertEqual(git(self.repo, "log", "-1", "--format=%s", f"{failed}^"), "wip")
+        self.assertEqual(git(self.repo, "rev-parse", "refs/ralph/main/iterations/1"), event["snapshot"])
+
+    def test_timed_out_iteration_is_rolled_back(self):
+        """Test an iteration killed by the timeout is rolled back too."""
+        self._run("hang", iteration_timeout=2)
+        self.assertEqual(git(self.repo, "rev-parse", "HEAD"), self.head)
+        self.assertEqual(self._read("app.txt"), "working\n")
+
+    def test_keep_policy_and_success_leave_changes(self):
+        """Test changes stay with the keep policy and after a successful iteration."""
+        for mode, policy in (("1", "keep"), ("0", "rollback")):
+            with self.subTest(policy=policy):
+                git(self.repo, "reset", "-q", "--hard", self.head)
+                git(self.repo, "clean", "-fdq")
+                self._write("untracked.txt", "mine\n")
+                _, event = self._run(mode, policy)
+                self.assertEqual(self._read("app.txt"), "half-finished\nmore\n")
+                self.assertEqual(git(self.repo, "log", "-1", "--format=%s"), "wip")
+                self.assertEqual(event["insertions"], 3)
+
+    def test_committed_loop_files_are_not_counted(self):
+        """Test .ralphy and the log stay out of the counts when the agent commits them."""
+        self._write(".gitignore", "")
+        with open(self.agent_path, "w", encoding="utf-8") as f:
+            f.write(COMMIT_ALL_SCRIPT)
+        _, event = self._run("0")
+        self.assertIn(".ralphy/fix_plan.md", git(self.repo, "show", "--name-only", "--format=", "HEAD"))
+        self.assertEqual(event["files_changed"], 1)
+        self.assertEqual(event["insertions"], 1)
+
+    def test_old_snapshot_refs_are_pruned(self):
+        """Test only the last snapshot_history iterations keep their refs."""
+        loop = RalphLoop(working_dir=self.repo, log_file="ralph.log", snapshots="keep", snapshot_history=2)
+        for iteration in range(1, 5):
+            loop.snapshots.begin(iteration)
+            loop.snapshots.end(True)
+        loop._close_sinks()
+        refs = git(self.repo, "for-each-ref", "--format=%(refname)", "refs/ralph/")
+        self.assertEqual(refs.splitlines(), ["refs/ralph/main/iterations/3", "refs/ralph/main/iterations/4"])
+
+    def test_unknown_policy(self):
+        """Test an unknown snapshot policy is rejected."""
+        with self.assertRaises(ValueError):
+            RalphLoop(working_dir=self.repo, log_file="ralph.log", snapshots="sometimes")
+
+
+if __name__ == "__main__":
+    unittest.main()
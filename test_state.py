@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""Unit tests for state.py and checkpoint/resume"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from oh_my_ralph.ralph_loop import RalphLoop
+from oh_my_ralph.state import load_state, save_state
+
+
+class TestStateFile(unittest.TestCase):
+    """Test cases for save_state and load_state."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, ".ralphy", "state.json")
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        import shutil
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_round_trip(self):
+        """Test a saved state loads back with its version."""
+        save_state(self.path, {"iteration": 3})
+        self.assertEqual(load_state(self.path), {"version": 1, "iteration": 3})
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), ["state.json"])
+
+    def test_missing_file(self):
+        """Test a missing checkpoint loads as None."""
+        self.assertIsNone(load_state(self.path))
+
+    def test_corrupt_file(self):
+        """Test unreadable or foreign checkpoints are rejected."""
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, "w") as f:
+            f.write("{not json")
+        with self.assertRaises(ValueError):
+            load_state(self.path)
+        with open(self.path, "w") as f:
+            json.dump({"version": 99}, f)
+        with self.assertRaises(ValueError):
+            load_state(self.path)
+
+    def test_failed_write_keeps_old_checkpoint(self):
+        """Test a failure mid-write leaves the previous checkpoint intact."""
+        save_state(self.path, {"iteration": 1})
+        with patch("oh_my_ralph.state.json.dump", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                save_state(self.path, {"iteration": 2})
+        self.assertEqual(load_state(self.path)["iteration"], 1)
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), ["state.json"])
+
+
+class TestCheckpointResume(unittest.TestCase):
+    """Test cases for RalphLoop checkpoints."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.log_file = os.path.join(self.temp_dir, "test.log")
+        # Not os.getcwd(): earlier tests may leave the cwd in a removed temp dir
+        self.original_cwd = os.path.dirname(os.path.abspath(__file__))
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        import shutil
+        os.chdir(self.original_cwd)
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _run(self, return_code, **kwargs):
+        ralph = RalphLoop(
+            agent_command="test-agent",
+            working_dir=self.temp_dir,
+            log_file=self.log_file,
+            install_signal_handlers=False,
+            **kwargs,
+        )
+        with patch.object(ralph, "_run_agent", return_value=(return_code, "", "")):
+            with patch("oh_my_ralph.ralph_loop.time.sleep") as mock_sleep:
+                ralph.run()
+        return ralph, mock_sleep
+
+    def test_checkpoint_after_each_iteration(self):
+        """Test state.json records the iteration count and history."""
+        ralph, _ = self._run(1, max_iterations=2)
+        state = load_state(ralph.state_file)
+        self.assertEqual(state["iteration"], 2)
+        self.assertEqual(state["consecutive_failures"], 2)
+        self.assertEqual([entry["exit_code"] for entry in state["history"]], [1, 1])
+
+    def test_resume_continues_count_and_streak(self):
+        """Test --resume picks up where the last run stopped."""
+        self._run(1, max_iterations=2, delay_between_loops=0)
+        ralph, mock_sleep = self._run(1, max_iterations=3, delay_between_loops=0, resume=True)
+
+        self.assertEqual(ralph.iteration, 3)
+        self.assertEqual(ralph.consecutive_failures, 3)
+        self.assertEqual(len(ralph.history), 3)
+        # The start-up wait is skipped when resuming
+        mock_sleep.assert_not_called()
+
+    def test_resume_keeps_budget_used(self):
+        """Test resumed runs count the budget already spent."""
+        ralph = RalphLoop(working_dir=self.temp_dir, log_file=self.log_file, install_signal_handlers=False, total_budget=100)
+        ralph.budget_started = time.monotonic() - 40
+        ralph._save_checkpoint()
+
+        resumed = RalphLoop(working_dir=self.temp_dir, log_file=self.log_file, install_signal_handlers=False, total_budget=100)
+        self.assertTrue(resumed.restore_checkpoint())
+        self.assertAlmostEqual(resumed._budget_remaining(), 60, delta=1)
+
+    def test_resume_without_checkpoint(self):
+        """Test resuming with no state.json starts from the beginning."""
+        ralph = RalphLoop(working_dir=self.temp_dir, log_file=self.log_file, install_signal_handlers=False)
+        self.assertFalse(ralph.restore_checkpoint())
+        self.assertEqual(ralph.iteration, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
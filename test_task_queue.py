@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""Unit tests for task_queue.py"""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+
+from oh_my_ralph.fix_plan import TaskIndex
+from oh_my_ralph.task_queue import SQLiteTaskQueue
+
+PLAN = """# Fix Plan
+
+## To Do
+
+### 🔴 Critical
+- Fix the login crash
+
+### 🟢 Low Priority
+- Tidy the README
+- [x] Already finished
+
+## In Progress
+- Half-done migration
+"""
+
+WORKER_SCRIPT = """
+import sys, time
+sys.path.insert(0, {root!r})
+from oh_my_ralph.fix_plan import TaskIndex
+from oh_my_ralph.task_queue import SQLiteTaskQueue
+queue = SQLiteTaskQueue({db!r}, TaskIndex({plan!r}), lease_timeout=30)
+while True:
+    task = queue.claim("main")
+    if task is None:
+        break
+    print(task.text, flush=True)
+    time.sleep(0.01)
+    queue.finish("main", completed=True)
+"""
+
+
+class TestSQLiteTaskQueue(unittest.TestCase):
+    """Test cases for SQLiteTaskQueue."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.db = os.path.join(self.temp_dir, "shared", "queue.db")
+        self.plan = os.path.join(self.temp_dir, "fix_plan.md")
+        self._write_plan(PLAN)
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _write_plan(self, text):
+        with open(self.plan, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def _queue(self, owner, **kwargs):
+        kwargs.setdefault("lease_timeout", 30)
+        return SQLiteTaskQueue(self.db, TaskIndex(self.plan), owner=owner, **kwargs)
+
+    def test_claims_follow_plan_order_without_duplicates(self):
+        """Test two hosts lease different tasks, most urgent first."""
+        host_a, host_b = self._queue("a"), self._queue("b")
+        first = host_a.claim("main")
+        second = host_b.claim("main")
+        self.assertEqual(first.text, "Half-done migration")
+        self.assertEqual(second.text, "Fix the login crash")
+        self.assertEqual(host_a.claim("worker-2").text, "Tidy the README")
+        self.assertIsNone(host_b.claim("worker-2"))
+        self.assertEqual(host_a.counts(), {"leased": 3})
+
+    def test_finish_marks_done_or_requeues(self):
+        """Test a completed task is never handed out again and an open one is."""
+        queue = self._queue("a")
+        done = queue.claim("main")
+        queue.finish("main", completed=True)
+        retry = queue.claim("main")
+        queue.finish("main", completed=False)
+        claimed = [queue.claim(f"w{i}") for i in range(3)]
+        texts = [task.text for task in claimed if task is not None]
+        self.assertNotIn(done.text, texts)
+        self.assertIn(retry.text, texts)
+        self.assertEqual(queue.counts().get("done"), 1)
+
+    def test_expired_lease_is_requeued(self):
+        """Test a task leased by a worker that died goes to another host."""
+        self._write_plan("## To Do\n- Only task\n")
+        dead = self._queue("dead", lease_timeout=0.2)
+        task = dead.claim("main")
+        dead._leases["main"][1].set()  # the worker dies: no more heartbeats
+        survivor = self._queue("alive", lease_timeout=0.2)
+        self.assertIsNone(survivor.claim("main"))
+        time.sleep(0.3)
+        self.assertEqual(survivor.claim("main").id, task.id)
+        # The dead worker's late report does not touch the new lease
+        dead.finish("main", completed=True)
+        self.assertEqual(survivor.counts(), {"leased": 1})
+
+    def test_heartbeat_keeps_lease(self):
+        """Test a lease outlives its timeout while the worker is alive."""
+        self._write_plan("## To Do\n- Only task\n")
+        holder = self._queue("holder", lease_timeout=0.3, heartbeat_interval=0.05)
+        holder.claim("main")
+        time.sleep(0.6)
+        self.assertIsNone(self._queue("other", lease_timeout=0.3).claim("main"))
+        holder.finish("main", completed=True)
+
+    def test_plan_marks_tasks_done(self):
+        """Test a task checked off in the plan is closed in the queue."""
+        queue = self._queue("a")
+        queue.claim("main")
+        queue.finish("main", completed=False)
+        self._write_plan(PLAN.replace("- Half-done migration", "- [x] Half-done migration"))
+        self.assertEqual(queue.claim("main").text, "Fix the login crash")
+        self.assertEqual(queue.counts().get("done"), 1)
+
+    def test_tasks_dropped_from_every_plan_are_retired(self):
+        """Test a queued task is retired once no plan that listed it still does."""
+        other_plan = os.path.join(self.temp_dir, "other_plan.md")
+        with open(other_plan, "w", encoding="utf-8") as f:
+            f.write("## To Do\n- Tidy the README\n")
+        queue = self._queue("a")
+        other = SQLiteTaskQueue(self.db, TaskIndex(other_plan), owner="b", lease_timeout=30)
+        other.claim("main")
+        other.finish("main", completed=False)
+        queue.claim("main")
+        queue.finish("main", completed=False)
+        self._write_plan("## To Do\n- Fix the login crash\n")
+        claimed = [queue.claim(f"w{i}") for i in range(3)]
+        self.assertEqual(
+            sorted(task.text for task in claimed if task is not None),
+            ["Fix the login crash", "Tidy the README"],  # the other plan still lists the README task
+        )
+        self.assertEqual(queue.counts().get("done"), 1)
+
+    def test_several_processes_share_one_database(self):
+        """Test worker processes on one database file complete every task exactly once."""
+        plan = "## To Do\n" + "".join(f"- Task {i}\n" for i in range(20))
+        self._write_plan(plan)
+        script = WORKER_SCRIPT.format(root=ROOT, db=self.db, plan=self.plan)
+        workers = [
+            subprocess.Popen([sys.executable, "-c", script], stdout=subprocess.PIPE, text=True)
+            for _ in range(4)
+        ]
+        claimed = []
+        for worker in workers:
+            out, _ = worker.communicate(timeout=60)
+            self.assertEqual(worker.returncode, 0)
+            claimed.extend(out.splitlines())
+        self.assertEqual(sorted(claimed), sorted(f"Task {i}" for i in range(20)))
+
+    def test_task_from_another_hosts_plan_is_completed(self):
+        """Test a loop finishes a task it leased from another host's plan instead of re-leasing it forever."""
+        from oh_my_ralph.ralph_loop import RalphLoop
+        loops = {}
+        for host, plan in (("a", "## To Do\n- Only task\n"), ("b", "# Fix Plan\n")):
+            ralphy = os.path.join(self.temp_dir, host, ".ralphy")
+            os.makedirs(ralphy)
+            for name, text in (("prompt.md", "Test prompt"), ("fix_plan.md", plan)):
+                with open(os.path.join(ralphy, name), "w", encoding="utf-8") as f:
+                    f.write(text)
+            with patch("oh_my_ralph.ralph_loop.signal.signal"):
+                loops[host] = RalphLoop(
+                    agent_command="test-agent",
+                    working_dir=os.path.dirname(ralphy),
+                    log_file=os.path.join(self.temp_dir, f"{host}.log"),
+                    task_queue=self.db,
+                    record_events=False,
+                )
+        # Host a only adds the task; host b leases and finishes it
+        loops["a"].task_scheduler.claim("main")
+        loops["a"].task_scheduler.finish("main", completed=False)
+        with patch.object(RalphLoop, "_run_agent", return_value=(0, "output", "")):
+            loops["b"].run_single_iteration()
+            loops["b"].run_single_iteration()
+        self.assertEqual(loops["b"].task_scheduler.counts(), {"done": 1})
+        for loop in loops.values():
+            loop._close_sinks()
+        with open(os.path.join(self.temp_dir, "b.log"), "r", encoding="utf-8") as f:
+            log_content = f.read()
+        self.assertEqual(log_content.count("Assigned task: Only task"), 1)
+        self.assertIn("Task completed: Only task", log_content)
+
+    def test_loop_uses_queue(self):
+        """Test RalphLoop leases its tasks from the queue with task_queue set."""
+        from oh_my_ralph.ralph_loop import RalphLoop
+        with patch("oh_my_ralph.ralph_loop.signal.signal"):
+            loop = RalphLoop(
+                working_dir=self.temp_dir,
+                log_file=os.path.join(self.temp_dir, "ralph.log"),
+                task_queue=self.db,
+                lease_timeout=5,
+                record_events=False,
+            )
+        self.assertIsInstance(loop.task_scheduler, SQLiteTaskQueue)
+        self.assertEqual(loop.task_scheduler.lease_timeout, 5)
+        self.assertEqual(loop.task_scheduler.index.path, loop.fix_plan_md)
+        loop._close_sinks()
+
+
+if __name__ == "__main__":
+    unittest.main()
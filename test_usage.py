@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""Unit tests for usage.py"""
+
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from oh_my_ralph.agents import DONE_MARKER
+from oh_my_ralph.ralph_loop import RalphLoop
+from oh_my_ralph.usage import Usage, UsageMeter
+
+
+def jsonl(*events):
+    return "".join(json.dumps(event) + "\n" for event in events)
+
+
+CLAUDE_STREAM = jsonl(
+    {"type": "system", "subtype": "init"},
+    {"type": "assistant", "message": {"id": "m1", "content": [{"type": "text", "text": "Reading"}],
+                                      "usage": {"input_tokens": 10, "output_tokens": 5}}},
+    {"type": "user", "message": {"content": [{"type": "tool_result", "content": f"prompt says {DONE_MARKER}"}]}},
+    {"type": "assistant", "message": {"id": "m2", "content": [{"type": "text", "text": "Working"}],
+                                      "usage": {"input_tokens": 20, "output_tokens": 7}}},
+)
+CLAUDE_RESULT = {
+    "type": "result",
+    "result": "All finished",
+    "total_cost_usd": 0.0421,
+    "usage": {"input_tokens": 30, "output_tokens": 12, "cache_read_input_tokens": 1000,
+              "cache_creation_input_tokens": 200},
+}
+
+
+class TestUsageMeter(unittest.TestCase):
+    """Test cases for UsageMeter."""
+
+    def test_claude_result_is_authoritative(self):
+        """Test the result event replaces the per-message figures."""
+        meter = UsageMeter(marker=DONE_MARKER)
+        text = CLAUDE_STREAM + jsonl(CLAUDE_RESULT)
+        for start in range(0, len(text), 37):  # arbitrary chunking
+            meter.feed(text[start:start + 37])
+        meter.close()
+        usage = meter.usage()
+        self.assertTrue(meter.reported)
+        self.assertEqual(usage.input_tokens, 30)
+        self.assertEqual(usage.cache_read_tokens, 1000)
+        self.assertEqual(usage.total_tokens, 1242)
+        self.assertAlmostEqual(usage.cost_usd, 0.0421)
+
+    def test_claude_messages_without_result(self):
+        """Test assistant message usage is summed once per message id."""
+        repeated = jsonl({"type": "assistant", "message": {"id": "m2", "content": [{"type": "tool_use"}],
+                                                            "usage": {"input_tokens": 20, "output_tokens": 7}}})
+        meter = UsageMeter()
+        meter.feed(CLAUDE_STREAM + repeated)
+        self.assertEqual(meter.usage().input_tokens, 30)
+        self.assertEqual(meter.usage().output_tokens, 12)
+
+    def test_marker_only_counts_in_agent_text(self):
+        """Test a marker inside echoed tool output does not count, but one in the reply does."""
+        meter = UsageMeter(marker=DONE_MARKER)
+        meter.feed(CLAUDE_STREAM)
+        self.assertFalse(meter.marker_seen)
+        meter.feed(jsonl(dict(CLAUDE_RESULT, result=f"Nothing left. {DONE_MARKER}")))
+        self.assertTrue(meter.marker_seen)
+
+    def test_opencode_steps(self):
+        """Test OpenCode step_finish events are added up."""
+        step = {"type": "step_finish", "part": {"cost": 0.01, "tokens": {"input": 100, "output": 20, "reasoning": 5,
+                                                                          "cache": {"read": 50, "write": 0}}}}
+        meter = UsageMeter(marker=DONE_MARKER)
+        meter.feed(jsonl(step, {"type": "text", "part": {"text": DONE_MARKER}}, step))
+        usage = meter.usage()
+        self.assertEqual(usage.input_tokens, 200)
+        self.assertEqual(usage.output_tokens, 50)
+        self.assertAlmostEqual(usage.cost_usd, 0.02)
+        self.assertTrue(meter.marker_seen)
+
+    def test_regex(self):
+        """Test a custom regex reads usage from plain text, with k suffixes and commas."""
+        meter = UsageMeter(r"Tokens: (?P<input_tokens>[\d.,]+k?) sent, (?P<output_tokens>[\d.,]+k?) received\. "
+                           r"Cost: \$(?P<cost_usd>[\d.]+) message")
+        meter.feed("Tokens: 2.3k sent, 1,150 received. Cost: $0.05 message, $0.20 session.\nother line\n")
+        usage = meter.usage()
+        self.assertEqual(usage.input_tokens, 2300)
+        self.assertEqual(usage.output_tokens, 1150)
+        self.assertAlmostEqual(usage.cost_usd, 0.05)
+
+    def test_nothing_reported(self):
+        """Test plain output without usage leaves the meter unreported."""
+        meter = UsageMeter()
+        meter.feed("just some text\n{not json\n")
+        meter.close()
+        self.assertFalse(meter.reported)
+        self.assertEqual(meter.usage(), Usage())
+
+    def test_usage_round_trip(self):
+        """Test Usage survives as_dict/from_dict and adds up."""
+        usage = Usage(input_tokens=1, output_tokens=2, cost_usd=0.5)
+        self.assertEqual(Usage.from_dict(usage.as_dict()), usage)
+        self.assertEqual((usage + usage).total_tokens, 6)
+
+
+class TestLoopUsage(unittest.TestCase):
+    """Test cases for usage accounting in RalphLoop. Subprocesses are always mocked."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.temp_dir, ".ralphy"))
+        with open(os.path.join(self.temp_dir, ".ralphy", "prompt.md"), "w", encoding="utf-8") as f:
+            f.write("Test prompt content")
+        self.signal_patcher = patch("oh_my_ralph.ralph_loop.signal.signal")
+        self.signal_patcher.start()
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.signal_patcher.stop()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _loop(self, **kwargs):
+        return RalphLoop(
+            agent_command="claude -p",
+            working_dir=self.temp_dir,
+            log_file=os.path.join(self.temp_dir, "ralph.log"),
+            **kwargs,
+        )
+
+    def _run_iteration(self, loop, stdout):
+        process = MagicMock()
+        process.returncode = 0
+        process.stdout = io.StringIO(stdout)
+        process.stderr = io.StringIO()
+        process.stdin = io.StringIO()
+        with patch("oh_my_ralph.ralph_loop.subprocess.Popen", return_value=process) as popen:
+            result = loop.run_single_iteration()
+        return result, popen.call_args[0][0]
+
+    def test_iteration_usage_is_recorded(self):
+        """Test usage is parsed, totalled, and written to events.jsonl and the checkpoint."""
+        loop = self._loop(track_usage=True)
+        (success, should_stop), argv = self._run_iteration(loop, CLAUDE_STREAM + jsonl(CLAUDE_RESULT))
+        self.assertIn("stream-json", argv)
+        self.assertEqual(argv[-1], "Read and follow the instructions in the file "
+                                   f"`{loop.prompt_file}`.")
+        self.assertTrue(success)
+        self.assertFalse(should_stop)  # the marker was only in tool output
+        self.assertEqual(loop.usage_total.total_tokens, 1242)
+        loop._close_sinks()
+        with open(loop.events_file, "r", encoding="utf-8") as f:
+            event = json.loads(f.readlines()[-1])
+        self.assertEqual(event["total_tokens"], 1242)
+        loop._save_checkpoint()
+        resumed = self._loop(track_usage=True)
+        resumed.restore_checkpoint()
+        self.assertEqual(resumed.usage_total, loop.usage_total)
+        resumed._close_sinks()
+
+    def test_failed_start_does_not_count_the_last_iteration_again(self):
+        """Test an iteration that fails before the agent runs adds no usage."""
+        loop = self._loop(track_usage=True)
+        self._run_iteration(loop, jsonl(CLAUDE_RESULT))
+        total = loop.usage_total
+        os.remove(os.path.join(self.temp_dir, ".ralphy", "prompt.md"))
+        self.assertEqual(loop.run_single_iteration(), (False, False))
+        self.assertEqual(loop.usage_total, total)
+        self.assertEqual(loop.usage_iterations, 1)
+        loop._close_sinks()
+
+    def test_json_output_only_when_tracking(self):
+        """Test the agent's command line is unchanged without usage tracking."""
+        loop = self._loop()
+        _, argv = self._run_iteration(loop, "plain output")
+        self.assertNotIn("stream-json", argv)
+        self.assertIsNone(loop.last_usage)
+        loop._close_sinks()
+
+    def test_max_cost_stops_before_going_over(self):
+        """Test the loop stops when another average iteration would pass max_cost."""
+        loop = self._loop(max_cost=0.1)
+        self.assertTrue(loop._iteration_allowed())
+        self._run_iteration(loop, jsonl(CLAUDE_RESULT))
+        self.assertTrue(loop._iteration_allowed())  # 0.042 + 0.042 fits in 0.1
+        self._run_iteration(loop, jsonl(CLAUDE_RESULT))
+        self.assertFalse(loop._iteration_allowed())  # 0.084 + 0.042 does not
+        loop._close_sinks()
+
+    def test_max_tokens(self):
+        """Test max_tokens stops the loop too."""
+        loop = self._loop(max_tokens=1000)
+        self._run_iteration(loop, jsonl(CLAUDE_RESULT))
+        self.assertFalse(loop._iteration_allowed())
+        loop._close_sinks()
+
+
+if __name__ == "__main__":
+    unittest.main()
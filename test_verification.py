@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""Unit tests for verification.py"""
+
+import json
+import os
+import shlex
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from oh_my_ralph.ralph_loop import RalphLoop
+from git_fixtures import git, make_repo
+
+# Prints app.txt as the verifier's checkout has it, after a pause
+CHECK_SCRIPT = """
+import sys, time
+time.sleep(float(sys.argv[1]))
+text = open("app.txt").read().strip()
+print("app.txt is", text)
+sys.exit(0 if text == "good" else 1)
+"""
+
+
+class TestVerifier(unittest.TestCase):
+    """Test cases for background verification, with a real git repository."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.repo = make_repo(self.temp_dir, {"app.txt": "good\n"})
+        self._write(os.path.join(".ralphy", "prompt.md"), "Test prompt")
+        self.check_path = os.path.join(self.temp_dir, "check.py")
+        with open(self.check_path, "w", encoding="utf-8") as f:
+            f.write(CHECK_SCRIPT)
+        self.signal_patcher = patch("oh_my_ralph.ralph_loop.signal.signal")
+        self.signal_patcher.start()
+        self.print_patcher = patch("builtins.print")
+        self.print_patcher.start()
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.signal_patcher.stop()
+        self.print_patcher.stop()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _write(self, name, text):
+        with open(os.path.join(self.repo, name), "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+    def _loop(self, pause=0.0, working_dir=None):
+        command = f"{shlex.quote(sys.executable)} {shlex.quote(self.check_path)} {pause}"
+        return RalphLoop(
+            agent_command="claude -p",
+            working_dir=working_dir or self.repo,
+            log_file="ralph.log",
+            verify_command=command,
+        )
+
+    def test_runs_on_a_snapshot_while_the_workspace_changes(self):
+        """Test start returns at once and verifies the uncommitted state it was given."""
+        loop = self._loop(pause=0.5)
+        self._write("app.txt", "bad")  # left uncommitted by the iteration
+        started = time.monotonic()
+        loop.verifier.start(1)
+        self.assertLess(time.monotonic() - started, 0.5)
+        self._write("app.txt", "good")  # the next iteration fixes it meanwhile
+        loop.verifier.wait()
+        [result] = loop.verifier.take_results()
+        loop._close_sinks()
+        self.assertEqual(result["iteration"], 1)
+        self.assertFalse(result["passed"])
+        self.assertEqual(result["exit_code"], 1)
+        self.assertIn("app.txt is bad", result["output"])
+        self.assertTrue(os.path.isdir(self.repo + "-verify"))
+        self.assertEqual(git(self.repo, "status", "--porcelain"), "")
+
+    def test_result_goes_into_the_next_prompt_and_events(self):
+        """Test a finished result is appended to the next prompt once and recorded in events.jsonl."""
+        loop = self._loop()
+        self._write("app.txt", "bad")
+        loop.verifier.start(1)
+        loop.verifier.wait()
+        prompt = loop._begin_iteration()
+        self.assertIn("## Verification", prompt)
+        self.assertIn("It failed with exit code 1.", prompt)
+        self.assertIn("app.txt is bad", prompt)
+        self.assertEqual(loop.current_prompt_file, loop.iteration_prompt_md)
+        self.assertNotIn("## Verification", loop._begin_iteration())
+        loop._close_sinks()
+        with open(loop.events_file, encoding="utf-8") as f:
+            events = [json.loads(line) for line in f]
+        verification = [event for event in events if event["event"] == "verification"]
+        self.assertEqual(len(verification), 1)
+        self.assertFalse(verification[0]["passed"])
+        self.assertNotIn("output", verification[0])
+
+    def test_unchanged_snapshot_is_not_verified_again(self):
+        """Test an iteration that changed nothing reuses the last verification."""
+        loop = self._loop()
+        loop.verifier.start(1)
+        loop.verifier.wait()
+        loop.verifier.start(2)
+        loop.verifier.wait()
+        results = loop.verifier.take_results()
+        loop._close_sinks()
+        self.assertEqual([result["iteration"] for result in results], [1])
+        self.assertTrue(results[0]["passed"])
+
+    def test_newest_queued_snapshot_wins(self):
+        """Test snapshots taken during a run wait for it, and only the newest of them runs."""
+        loop = self._loop(pause=0.5)
+        for iteration, text in ((1, "bad"), (2, "worse"), (3, "good")):
+            self._write("app.txt", text)
+            loop.verifier.start(iteration)
+        loop._finish_verification()
+        loop._close_sinks()
+        with open(os.path.join(self.repo, "ralph.log"), encoding="utf-8") as f:
+            log = f.read()
+        self.assertIn("Skipping verification of iteration 2; iteration 3 is newer", log)
+        self.assertIn("Verification of iteration 1 finished", log)
+        self.assertIn("Verification of iteration 3 finished", log)
+        self.assertIn("It passed.", log)
+
+    def test_without_git_verifies_in_place(self):
+        """Test outside a git repository the command runs in the working dir before start returns."""
+        plain = os.path.join(self.temp_dir, "plain")
+        os.makedirs(os.path.join(plain, ".ralphy"))
+        with open(os.path.join(plain, "app.txt"), "w", encoding="utf-8") as f:
+            f.write("good\n")
+        loop = self._loop(working_dir=plain)
+        loop.verifier.start(1)
+        [result] = loop.verifier.take_results()
+        loop._close_sinks()
+        self.assertTrue(result["passed"])
+        self.assertIsNone(result["commit"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""Unit tests for worker_pool.py"""
+
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import Mock, patch
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from oh_my_ralph.ralph_loop import RalphLoop
+from oh_my_ralph.worker_pool import WorkerPool, create_worktree
+
+
+def fake_create_worktree(repo_dir, path, branch):
+    """Stand-in for create_worktree that just makes the directory."""
+    os.makedirs(path, exist_ok=True)
+
+
+class TestWorkerPool(unittest.TestCase):
+    """Test cases for WorkerPool. Agents and git are always mocked."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.repo_dir = os.path.join(self.temp_dir, "repo")
+        os.makedirs(self.repo_dir)
+        self.log_file = os.path.join(self.temp_dir, "ralph.log")
+        self.signal_patcher = patch("oh_my_ralph.worker_pool.signal.signal")
+        self.signal_patcher.start()
+        self.worktree_patcher = patch("oh_my_ralph.worker_pool.create_worktree", side_effect=fake_create_worktree)
+        self.worktree_patcher.start()
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        import shutil
+        self.signal_patcher.stop()
+        self.worktree_patcher.stop()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _pool(self, workers, max_iterations, **options):
+        return WorkerPool(
+            workers=workers,
+            working_dir=self.repo_dir,
+            log_file=self.log_file,
+            max_iterations=max_iterations,
+            delay_between_loops=0,
+            agent_command="test-agent",
+            **options,
+        )
+
+    def test_default_worktree_root_is_sibling_of_working_dir(self):
+        """Test worktrees are kept outside the main working tree."""
+        pool = self._pool(2, 1)
+        self.assertEqual(str(pool.worktree_root), os.path.realpath(self.repo_dir + "-worktrees"))
+
+    def test_max_iterations_shared_across_pool(self):
+        """Test the iteration budget is shared by all workers."""
+        pool = self._pool(3, 5)
+        with patch.object(RalphLoop, "_run_agent", return_value=(0, "output", "")):
+            pool.run()
+
+        self.assertEqual(len(pool.loops), 3)
+        self.assertEqual(sum(loop.iteration for loop in pool.loops), 5)
+        self.assertEqual(pool.successes, 5)
+        with open(self.log_file, "r", encoding="utf-8") as f:
+            log_content = f.read()
+            self.assertIn("Worker pool stopped after 5 iterations", log_content)
+            self.assertIn("iterations/hour", log_content)
+
+    def test_budget_limited_worker_leaves_iterations_to_others(self):
+        """Test a worker stopped by its own budget does not use up one of the pool's iterations."""
+        pool = self._pool(2, 4, total_budget=1000)
+
+        def budget_remaining(loop):
+            return 0.0 if loop.worker_id == "worker-1" else 1000.0
+
+        with patch.object(RalphLoop, "_run_agent", return_value=(0, "output", "")), \
+                patch.object(RalphLoop, "_budget_remaining", autospec=True, side_effect=budget_remaining):
+            pool.run()
+
+        self.assertEqual([loop.iteration for loop in pool.loops], [0, 4])
+        self.assertEqual(pool.iterations_started, 4)
+        self.assertEqual(pool.successes, 4)
+
+    def test_done_marker_stops_all_workers(self):
+        """Test a completion marker from one worker stops the whole pool."""
+        pool = self._pool(2, 0)
+        with patch.object(RalphLoop, "_run_agent", return_value=(0, "<PROMISE>DONE</PROMISE>", "")):
+            pool.run()
+
+        self.assertLessEqual(pool.iterations_started, 2)
+        self.assertTrue(all(not loop.running for loop in pool.loops))
+
+    def test_worker_logs_do_not_interleave(self):
+        """Test each worker writes to its own log file."""
+        pool = self._pool(2, 2)
+        with patch.object(RalphLoop, "_run_agent", return_value=(0, "output", "")):
+            pool.run()
+
+        for index in (1, 2):
+            worker_log = os.path.join(self.temp_dir, f"ralph.worker-{index}.log")
+            self.assertTrue(os.path.exists(worker_log))
+            with open(worker_log, "r", encoding="utf-8") as f:
+                for line in f:
+                    if "[worker-" in line:
+                        self.assertIn(f"[worker-{index}]", line)
+
+    def test_workers_start_from_the_project_plan(self):
+        """Test an uncommitted .ralphy is copied into each worktree rather than the templates."""
+        ralphy = os.path.join(self.repo_dir, ".ralphy")
+        os.makedirs(ralphy)
+        plan = "## To Do\n\n- Project item A\n- Project item B\n"
+        for name, text in (("fix_plan.md", plan), ("agent.md", "# Project notes\n")):
+            with open(os.path.join(ralphy, name), "w", encoding="utf-8") as f:
+                f.write(text)
+        prompts = []
+
+        def agent(loop, prompt):
+            prompts.append(prompt)
+            return 0, "output", ""
+
+        pool = self._pool(2, 2, assign_tasks=True)
+        with patch.object(RalphLoop, "_run_agent", autospec=True, side_effect=agent):
+            pool.run()
+
+        for loop in pool.loops:
+            self.assertEqual(loop.fix_plan_md.read_text(encoding="utf-8"), plan)
+            self.assertEqual(loop.agent_md.read_text(encoding="utf-8"), "# Project notes\n")
+        self.assertEqual(len(prompts), 2)
+        self.assertTrue(all("Project item" in prompt for prompt in prompts))
+
+    def test_failed_iterations_are_rolled_back(self):
+        """Test workers close each iteration's snapshot, so failed ones are rolled back."""
+        from oh_my_ralph.snapshots import IterationSnapshots
+        pool = self._pool(2, 4, snapshots="rollback")
+        with patch.object(RalphLoop, "_run_agent", return_value=(1, "", "failed")), \
+                patch.object(IterationSnapshots, "begin"), \
+                patch.object(IterationSnapshots, "end") as end:
+            pool.run()
+
+        self.assertEqual(pool.failures, 4)
+        self.assertEqual(end.call_count, 4)
+        self.assertTrue(all(call.args == (False,) for call in end.call_args_list))
+
+    def test_workers_verify_their_iterations(self):
+        """Test each worker verifies its iterations and reports the results."""
+        command = f'"{sys.executable}" -c "print(\'checked\')"'
+        pool = self._pool(2, 4, verify_command=command)
+        with patch.object(RalphLoop, "_run_agent", return_value=(0, "output", "")):
+            pool.run()
+
+        for loop in pool.loops:
+            with open(loop.verifier.output_file, "r", encoding="utf-8") as f:
+                self.assertIn("checked", f.read())
+            with open(loop.log_file, "r", encoding="utf-8") as f:
+                log_content = f.read()
+            self.assertIn(f"Verification of iteration {loop.iteration} finished", log_content)
+            self.assertIn("It passed.", log_content)
+
+    def test_signal_stops_workers(self):
+        """Test the pool's signal handler stops every loop."""
+        pool = self._pool(2, 0)
+        pool.loops = [Mock(running=True), Mock(running=True)]
+        pool._signal_handler(None, None)
+        self.assertTrue(all(not loop.running for loop in pool.loops))
+        self.assertTrue(all(loop.verifier.cancel.called for loop in pool.loops))
+        self.assertFalse(pool._claim_iteration())
+
+
+class TestCreateWorktree(unittest.TestCase):
+    """Test cases for create_worktree."""
+
+    @patch("oh_my_ralph.worker_pool.subprocess.run")
+    def test_new_branch_created_from_head(self, mock_run):
+        """Test a missing branch is created from HEAD."""
+        mock_run.return_value = Mock(returncode=1)
+        create_worktree("/repo", "/tmp/does-not-exist/worker-1", "ralph/worker-1")
+
+        cmd = mock_run.call_args_list[-1][0][0]
+        self.assertEqual(cmd, ["git", "worktree", "add", "-b", "ralph/worker-1", "/tmp/does-not-exist/worker-1", "HEAD"])
+
+    @patch("oh_my_ralph.worker_pool.subprocess.run")
+    def test_existing_branch_is_not_reset(self, mock_run):
+        """Test an existing worker branch is checked out, not recreated."""
+        mock_run.return_value = Mock(returncode=0)
+        create_worktree("/repo", "/tmp/does-not-exist/worker-1", "ralph/worker-1")
+
+        cmd = mock_run.call_args_list[-1][0][0]
+        self.assertEqual(cmd, ["git", "worktree", "add", "/tmp/does-not-exist/worker-1", "ralph/worker-1"])
+
+
+if __name__ == "__main__":
+    unittest.main()